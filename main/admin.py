@@ -3,7 +3,12 @@ from django.contrib import admin
 from .models import *
 
 admin.site.register(Alert)
+admin.site.register(Incident)
+admin.site.register(AlertRollup)
 admin.site.register(DisasterFeedback)
 admin.site.register(Location)
 admin.site.register(CustomUser)
 admin.site.register(AlertChoices)
+admin.site.register(BroadcastJob)
+admin.site.register(FirstAidGuide)
+admin.site.register(NotificationOutbox)
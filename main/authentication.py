@@ -0,0 +1,161 @@
+import datetime
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .models import CustomUser
+from .redis_client import get_redis
+
+# Secrets stay out of the snapshot; reading them from a cached user
+# loads them from the database like any deferred field.
+_SNAPSHOT_FIELDS = [field for field in CustomUser._meta.concrete_fields if field.name not in ("password", "otp")]
+SNAPSHOT_FIELDS = [field.attname for field in _SNAPSHOT_FIELDS]
+
+
+class TokenCache:
+    """
+    Bounded LRU of token key -> user snapshot, each kept for at most ttl
+    seconds, with an optional Redis tier shared by every process.
+
+    Deleting a token or saving its user invalidates the entry in this
+    process and in Redis; other processes drop their copy within ttl.
+    """
+
+    def __init__(self, max_entries, ttl, redis_url=None, prefix="auth:token"):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.client = get_redis(redis_url) if redis_url else None
+        self.prefix = prefix
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """A fresh user instance for the token, or None if it is not cached"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[2] < time.monotonic():
+                del self.entries[key]
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return build_user(*entry[:2])
+
+        cached = self.client.get(self._redis_key(key)) if self.client is not None else None
+        if cached is None:
+            with self.lock:
+                self.misses += 1
+            return None
+        try:
+            db, values = load_snapshot(cached)
+        except (ValueError, TypeError, KeyError):
+            with self.lock:
+                self.misses += 1
+            return None
+        self._remember(key, db, values)
+        with self.lock:
+            self.redis_hits += 1
+        return build_user(db, values)
+
+    def set(self, key, user):
+        db = user._state.db
+        values = tuple(getattr(user, attname) for attname in SNAPSHOT_FIELDS)
+        self._remember(key, db, values)
+        if self.client is not None:
+            self.client.setex(self._redis_key(key), self.ttl, dump_snapshot(db, values))
+
+    def invalidate(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+        if self.client is not None and keys:
+            self.client.delete(*(self._redis_key(key) for key in keys))
+
+    def invalidate_user(self, user_id):
+        self.invalidate(*Token.objects.filter(user_id=user_id).values_list("key", flat=True))
+
+    def metrics(self):
+        with self.lock:
+            lookups = self.hits + self.redis_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.redis_hits) / lookups if lookups else None,
+            }
+
+    def _remember(self, key, db, values):
+        with self.lock:
+            self.entries[key] = (db, values, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def _redis_key(self, key):
+        # the token itself is a credential, so Redis only sees its digest
+        return f"{self.prefix}:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def dump_snapshot(db, values):
+    """
+    The snapshot as JSON for Redis: never pickle, since whoever can write
+    to Redis could then run code in every process reading it.
+    """
+    return json.dumps({"db": db, "values": values}, default=_isoformat)
+
+
+def _isoformat(value):
+    # dates and times in full; DjangoJSONEncoder drops microseconds
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def load_snapshot(data):
+    """
+    The (db, values) a dump_snapshot payload holds, with each value
+    converted back to its field's type.
+
+    Raises:
+        ValueError: If the payload is not a snapshot of the current fields.
+    """
+    snapshot = json.loads(data)
+    db, values = snapshot["db"], snapshot["values"]
+    if not isinstance(db, str) or not isinstance(values, list) or len(values) != len(_SNAPSHOT_FIELDS):
+        raise ValueError("Not a user snapshot")
+    try:
+        return db, tuple(field.to_python(value) for field, value in zip(_SNAPSHOT_FIELDS, values))
+    except ValidationError as e:
+        raise ValueError(str(e))
+
+
+def build_user(db, values):
+    # a new instance per request, so views changing request.user cannot
+    # alter the cached snapshot
+    return CustomUser.from_db(db, SNAPSHOT_FIELDS, values)
+
+
+token_cache = TokenCache(settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_TOKEN_CACHE_TTL, settings.REDIS_URL)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that looks tokens up in token_cache before the database"""
+
+    def authenticate_credentials(self, key):
+        user = token_cache.get(key)
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user)
+            return user, token
+        return user, Token(key=key, user=user)
@@ -0,0 +1,215 @@
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .delivery import SMS_FIELDS, notify
+from .geo import cell_ranges, covering_cells, haversine_km
+from .models import BroadcastJob, CustomUser
+
+logger = logging.getLogger(__name__)
+
+# Jobs run off the request thread; each job then dispatches its recipients
+# through its own bounded pool so one broadcast cannot starve another.
+_job_executor = ThreadPoolExecutor(
+    max_workers=settings.BROADCAST_WORKERS, thread_name_prefix="broadcast"
+)
+
+
+def enqueue_broadcast(alert, message_title, message_body, radius_km=None):
+    """
+    Records a broadcast job for the alert and schedules it once the
+    surrounding transaction commits.
+
+    Args:
+        alert (Alert): The alert being broadcast.
+        message_title (str): Title of the push notification.
+        message_body (str): Body text of the notification.
+        radius_km (float, optional): Only notify users last seen this close to the alert.
+
+    Returns:
+        BroadcastJob: The persisted job, still pending.
+    """
+    job = BroadcastJob.objects.create(
+        alert=alert, message_title=message_title, message_body=message_body, radius_km=radius_km
+    )
+    transaction.on_commit(lambda: _job_executor.submit(run_broadcast, job.pk))
+    return job
+
+
+def broadcast_recipients(job):
+    """Users still to be notified for the job that route() finds a channel for, in primary key order"""
+    return (
+        CustomUser.objects.filter(is_active=True, pk__gt=job.last_recipient_id)
+        .filter(
+            (Q(fcm_token__isnull=False) & ~Q(fcm_token=""))
+            | (
+                Q(phone_number__isnull=False) & ~Q(phone_number="") & Q(notify_via_sms=True)
+                & (Q(phone_verified=True) | Q(phone_grandfathered=True))
+            )
+        )
+        .only("id", "fcm_token", *SMS_FIELDS)
+        .order_by("pk")
+    )
+
+
+def target_area(job):
+    """(latitude, longitude, radius_km) of the circle the job targets, or None if it targets everyone"""
+    location = job.alert.location
+    if job.radius_km is None or location.latitude is None or location.longitude is None:
+        return None
+    return location.latitude, location.longitude, job.radius_km
+
+
+def targeted_recipients(job):
+    """
+    The job's recipients narrowed through the geohash index to the users
+    last seen in the cells covering its circle. Users never located are
+    kept: there is no telling they are elsewhere, and every user predating
+    location tracking has no last location.
+    """
+    recipients = broadcast_recipients(job)
+    area = target_area(job)
+    if area is None:
+        return recipients
+    unlocated = (
+        Q(last_location__isnull=True)
+        | Q(last_location__latitude__isnull=True)
+        | Q(last_location__longitude__isnull=True)
+    )
+    cells = covering_cells(*area)
+    if cells is not None:
+        recipients = recipients.filter(unlocated | cell_ranges(cells, "last_location__geohash"))
+    return recipients.select_related("last_location").only(
+        "id", "fcm_token", *SMS_FIELDS,
+        "last_location__latitude", "last_location__longitude",
+    )
+
+
+def recipient_chunks(job):
+    """
+    Yields the job's remaining recipients in chunks of at most
+    BROADCAST_CHUNK_SIZE, streamed in primary key order, each with the
+    number of users read for it that turned out to be outside the job's
+    radius.
+    """
+    recipients = targeted_recipients(job)
+    area = target_area(job)
+    last_recipient_id = job.last_recipient_id
+    while True:
+        chunk = list(recipients.filter(pk__gt=last_recipient_id)[:settings.BROADCAST_CHUNK_SIZE])
+        if not chunk:
+            return
+        last_recipient_id = chunk[-1].pk
+        outside = 0
+        if area is not None:
+            located = [
+                user for user in chunk
+                if user.last_location is not None
+                and user.last_location.latitude is not None and user.last_location.longitude is not None
+            ]
+            if located:
+                latitude, longitude, radius_km = area
+                distances = haversine_km(
+                    latitude, longitude,
+                    [user.last_location.latitude for user in located],
+                    [user.last_location.longitude for user in located],
+                )
+                far = {user.pk for user, distance in zip(located, distances) if distance > radius_km}
+                chunk = [user for user in chunk if user.pk not in far]
+                outside = len(far)
+        yield chunk, outside
+
+
+def claim_job(job_id, owner):
+    """
+    Leases the job to owner for BROADCAST_LEASE_SECONDS unless it is
+    completed or another process holds an unexpired lease on it.
+
+    Returns:
+        bool: Whether owner got the job.
+    """
+    now = timezone.now()
+    return bool(
+        BroadcastJob.objects.filter(pk=job_id)
+        .exclude(status=BroadcastJob.STATUS_COMPLETED)
+        .filter(Q(leased_until__isnull=True) | Q(leased_until__lt=now))
+        .update(lease_owner=owner, leased_until=now + timedelta(seconds=settings.BROADCAST_LEASE_SECONDS))
+    )
+
+
+def run_broadcast(job_id):
+    """
+    Streams the job's recipients in chunks and notifies each chunk in
+    parallel, persisting progress after every chunk.
+
+    The job is claimed first, so a job another process is still sending
+    is left to it; progress is only written while the lease is held.
+
+    Args:
+        job_id (int): Primary key of the BroadcastJob to run.
+
+    Returns:
+        bool: Whether this call ran the job.
+    """
+    close_old_connections()
+    owner = uuid.uuid4().hex
+    held = BroadcastJob.objects.filter(pk=job_id, lease_owner=owner)
+    try:
+        if not claim_job(job_id, owner):
+            return False
+        job = BroadcastJob.objects.select_related("alert__location").get(pk=job_id)
+
+        if job.status == BroadcastJob.STATUS_PENDING:
+            # for targeted jobs, users in the covering cells; those found
+            # outside the radius are taken off as the chunks are read
+            job.total_recipients = targeted_recipients(job).count()
+            job.started_at = timezone.now()
+        held.update(
+            status=BroadcastJob.STATUS_RUNNING, total_recipients=job.total_recipients,
+            started_at=job.started_at, finished_at=None,
+        )
+
+        with ThreadPoolExecutor(
+            max_workers=settings.BROADCAST_CONCURRENCY, thread_name_prefix="broadcast-send"
+        ) as pool:
+            for chunk, outside in recipient_chunks(job):
+                sent = failed = 0
+                if chunk:
+                    # users already notified of the alert count as neither
+                    sent, failed = notify(chunk, job.message_title, job.message_body, alert=job.alert, pool=pool)
+                    job.last_recipient_id = chunk[-1].pk
+                renewed = held.update(
+                    sent_count=F("sent_count") + sent,
+                    failed_count=F("failed_count") + failed,
+                    total_recipients=F("total_recipients") - outside,
+                    last_recipient_id=job.last_recipient_id,
+                    leased_until=timezone.now() + timedelta(seconds=settings.BROADCAST_LEASE_SECONDS),
+                )
+                if not renewed:
+                    logger.warning("Broadcast %s lost its lease; leaving it to the process that took it", job_id)
+                    return True
+
+        held.update(
+            status=BroadcastJob.STATUS_COMPLETED, finished_at=timezone.now(), lease_owner="", leased_until=None
+        )
+        job.refresh_from_db()
+        logger.info(
+            "Broadcast %s completed: %s sent, %s failed, %.1f recipients/s",
+            job.pk, job.sent_count, job.failed_count, job.throughput,
+        )
+        return True
+    except Exception:
+        logger.exception("Broadcast %s failed", job_id)
+        held.update(
+            status=BroadcastJob.STATUS_FAILED, finished_at=timezone.now(), lease_owner="", leased_until=None
+        )
+        return True
+    finally:
+        close_old_connections()
+
@@ -0,0 +1,80 @@
+import hashlib
+import json
+import threading
+
+from django.conf import settings
+
+from .models import AlertChoices
+from .redis_client import get_redis
+from .serializers import AlertChoicesSerializer
+
+
+class MemoryVersion:
+    """Version counter of this process alone"""
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def get(self):
+        return self.value
+
+    def bump(self):
+        with self.lock:
+            self.value += 1
+
+
+class RedisVersion:
+    """Version counter shared by every process through Redis"""
+
+    def __init__(self, url, key="alert_choices:version"):
+        self.client = get_redis(url)
+        self.key = key
+
+    def get(self):
+        return int(self.client.get(self.key) or 0)
+
+    def bump(self):
+        self.client.incr(self.key)
+
+
+class ChoicesCache:
+    """
+    The serialized alert choices and their ETag, kept by each process and
+    rebuilt whenever the shared version has moved since they were loaded.
+    """
+
+    def __init__(self):
+        self.loaded_version = None
+        self.choices = None
+        self.etag = None
+        self.lock = threading.Lock()
+        self._version = None
+
+    @property
+    def version(self):
+        if self._version is None:
+            self._version = RedisVersion(settings.REDIS_URL) if settings.REDIS_URL else MemoryVersion()
+        return self._version
+
+    def get(self):
+        """The serialized choices and their ETag"""
+        # read before the table, so a change committed meanwhile leaves the
+        # copy tagged with the old version and reloaded on the next call
+        version = self.version.get()
+        with self.lock:
+            if self.loaded_version == version:
+                return self.choices, self.etag
+
+        choices = AlertChoicesSerializer(AlertChoices.objects.order_by("pk"), many=True).data
+        digest = hashlib.sha1(json.dumps(choices, sort_keys=True).encode()).hexdigest()
+        etag = f'"{digest[:20]}"'
+        with self.lock:
+            self.loaded_version, self.choices, self.etag = version, choices, etag
+        return choices, etag
+
+    def invalidate(self):
+        self.version.bump()
+
+
+alert_choices_cache = ChoicesCache()
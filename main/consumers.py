@@ -1,26 +1,137 @@
 from channels.generic.websocket import AsyncWebsocketConsumer
+from asgiref.sync import sync_to_async
+from collections import deque
+from django.conf import settings
+from urllib.parse import parse_qs
 import json
 
+from .llm import stream_reply
+from .streams import (
+    ALERTS_GROUP,
+    UNLOCATED_ALERTS_GROUP,
+    cell_group,
+    client_cell,
+    get_event_buffer,
+    is_relevant,
+)
+
+
 class AlertConsumer(AsyncWebsocketConsumer):
+    """
+    Streams alert events as JSON. A client reconnecting with
+    ?last_seen=<alert id> first gets every buffered event after that id,
+    or a "resync" message if the buffer no longer reaches back that far,
+    and then live events.
+
+    Clients that pass ?latitude=&longitude=, or later send
+    {"action": "subscribe", "latitude": ..., "longitude": ...}, only
+    receive alerts whose radius covers them; others receive every alert.
+    """
+
     async def connect(self):
-        await self.channel_layer.group_add(
-            "alerts",
-            self.channel_name
+        # ids of the events already sent, to drop duplicates between the
+        # replay and live events, and retried publishes; events can arrive
+        # out of id order, so a high-water mark would drop late ones
+        self.sent_ids = set()
+        self.sent_order = deque(maxlen=settings.ALERT_STREAM_BUFFER_SIZE)
+        self.latitude = self.longitude = None
+        self.groups = set()
+
+        query = parse_qs(self.scope.get("query_string", b"").decode())
+        position = self.parse_position(
+            self.query_value(query, "latitude"), self.query_value(query, "longitude")
         )
+        # join before replaying so nothing published in between is lost;
+        # duplicates are dropped in send_event
+        await self.subscribe(*position)
         await self.accept()
 
+        try:
+            last_seen = int(self.query_value(query, "last_seen"))
+        except (TypeError, ValueError):
+            return
+        events, complete = await sync_to_async(get_event_buffer().replay)(last_seen)
+        if not complete:
+            await self.send(text_data=json.dumps({"type": "resync", "last_seen": last_seen}))
+        for event in events:
+            await self.send_event(event)
+
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(
-            "alerts",
-            self.channel_name
-        )
+        for group in self.groups:
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def receive(self, text_data):
+        try:
+            data = json.loads(text_data)
+        except ValueError:
+            return
+        if isinstance(data, dict) and data.get("action") == "subscribe":
+            await self.subscribe(*self.parse_position(data.get("latitude"), data.get("longitude")))
+
+    async def subscribe(self, latitude, longitude):
+        """Moves the socket to the groups for its position"""
+        self.latitude, self.longitude = latitude, longitude
+        if latitude is None:
+            groups = {ALERTS_GROUP}
+        else:
+            groups = {cell_group(client_cell(latitude, longitude)), UNLOCATED_ALERTS_GROUP}
+
+        for group in self.groups - groups:
+            await self.channel_layer.group_discard(group, self.channel_name)
+        for group in groups - self.groups:
+            await self.channel_layer.group_add(group, self.channel_name)
+        self.groups = groups
+
+    async def alert_event(self, event):
+        await self.send_event(event["event"])
+
+    async def send_event(self, event):
+        if event["id"] in self.sent_ids:
+            return
+        if not is_relevant(event, self.latitude, self.longitude):
+            return
+        if len(self.sent_order) == self.sent_order.maxlen:
+            self.sent_ids.discard(self.sent_order[0])
+        self.sent_order.append(event["id"])
+        self.sent_ids.add(event["id"])
+        await self.send(text_data=json.dumps(event))
+
+    @staticmethod
+    def query_value(query, name):
+        values = query.get(name)
+        return values[0] if values else None
+
+    @staticmethod
+    def parse_position(latitude, longitude):
+        try:
+            latitude, longitude = float(latitude), float(longitude)
+        except (TypeError, ValueError):
+            return None, None
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return None, None
+        return latitude, longitude
+
+
+class ChatConsumer(AsyncWebsocketConsumer):
+    """
+    Chatbot over a WebSocket. Each {"message": ...} sent is answered with
+    {"type": "chunk", "text": ...} frames as the reply is generated,
+    then {"type": "done"}, or {"type": "error", "error": ...}.
+    """
 
     async def receive(self, text_data):
-        data = json.loads(text_data)
-        # Handle the received data if needed
-
-    async def alert_message(self, event):
-        message = event['message']
-        await self.send(text_data=json.dumps({
-            'message': message
-        }))
+        try:
+            message = json.loads(text_data).get("message")
+        except (ValueError, AttributeError):
+            message = None
+        if not isinstance(message, str) or not message.strip():
+            await self.send(text_data=json.dumps({"type": "error", "error": "A message is required."}))
+            return
+
+        try:
+            async for text in stream_reply(message):
+                await self.send(text_data=json.dumps({"type": "chunk", "text": text}))
+        except Exception as e:
+            await self.send(text_data=json.dumps({"type": "error", "error": str(e)}))
+            return
+        await self.send(text_data=json.dumps({"type": "done"}))
@@ -0,0 +1,53 @@
+import random
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+PRIMARY = "default"
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith("replica_")]
+
+
+def read_replica():
+    """A replica alias to read from, or the primary when none are configured"""
+    replicas = replica_aliases()
+    return random.choice(replicas) if replicas else PRIMARY
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends every write to the primary. Reads stay on the primary (or on the
+    database the related instance came from) unless a queryset opts in with
+    .using(read_replica()); replicas lag behind, so only listings that can
+    show slightly stale rows do.
+    """
+
+    def db_for_read(self, model, **hints):
+        return None
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    WAL lets readers carry on while a write is in progress, and with it
+    synchronous=NORMAL only syncs at checkpoints.
+    """
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
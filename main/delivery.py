@@ -0,0 +1,211 @@
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import NotificationOutbox
+from .push import send_multicast
+from .redis_client import get_redis
+from .sms import dispatcher as sms_dispatcher
+
+PUSH = NotificationOutbox.CHANNEL_PUSH
+SMS = NotificationOutbox.CHANNEL_SMS
+
+
+# what accepts_sms() reads, for querysets that load users with only()
+SMS_FIELDS = ("phone_number", "notify_via_sms", "phone_verified", "phone_grandfathered")
+
+
+def accepts_sms(user):
+    """
+    Whether the user can be texted: a number they have not opted out of
+    SMS for, verified or texted since before verification was required
+    """
+    return bool(user.phone_number) and user.notify_via_sms and (user.phone_verified or user.phone_grandfathered)
+
+
+def route(user):
+    """
+    The channel a user is notified on first and the one to fall back to,
+    either of which may be None.
+
+    Users with a registered device get push, with SMS kept as the fallback
+    for a push that fails or goes unacknowledged if they accept SMS. Users
+    without a device get SMS if they accept it.
+    """
+    sms = SMS if accepts_sms(user) else None
+    if user.fcm_token:
+        return PUSH, sms
+    return sms, None
+
+
+class MemoryNotifiedSet:
+    """
+    Per-process record of who was notified of the ALERT_DEDUP_ALERTS most
+    recent alerts, as one bitmap per alert indexed by user id.
+    """
+
+    def __init__(self, max_alerts):
+        self.bitmaps = OrderedDict()
+        self.max_alerts = max_alerts
+        self.lock = threading.Lock()
+
+    def add(self, alert_id, user_ids):
+        """Marks the users as notified of the alert, returning those that were not already"""
+        added = []
+        with self.lock:
+            bitmap = self.bitmaps.setdefault(alert_id, bytearray())
+            self.bitmaps.move_to_end(alert_id)
+            while len(self.bitmaps) > self.max_alerts:
+                self.bitmaps.popitem(last=False)
+            for user_id in user_ids:
+                byte, bit = divmod(user_id, 8)
+                if byte >= len(bitmap):
+                    bitmap.extend(bytes(byte + 1 - len(bitmap)))
+                if not bitmap[byte] & (1 << bit):
+                    bitmap[byte] |= 1 << bit
+                    added.append(user_id)
+        return added
+
+    def unmarked(self, alert_id, user_ids):
+        """The users not yet marked as notified of the alert"""
+        with self.lock:
+            bitmap = self.bitmaps.get(alert_id, b"")
+            return [
+                user_id for user_id in user_ids
+                if user_id // 8 >= len(bitmap) or not bitmap[user_id // 8] & (1 << user_id % 8)
+            ]
+
+
+class RedisNotifiedSet:
+    """The same bitmaps kept in Redis, shared by every process and expiring after ALERT_DEDUP_TTL"""
+
+    def __init__(self, url, ttl, key="alerts:notified"):
+        self.client = get_redis(url)
+        self.ttl = ttl
+        self.key = key
+
+    def add(self, alert_id, user_ids):
+        key = f"{self.key}:{alert_id}"
+        pipe = self.client.pipeline()
+        for user_id in user_ids:
+            pipe.setbit(key, user_id, 1)
+        pipe.expire(key, self.ttl)
+        previous = pipe.execute()[:-1]
+        return [user_id for user_id, bit in zip(user_ids, previous) if not bit]
+
+    def unmarked(self, alert_id, user_ids):
+        key = f"{self.key}:{alert_id}"
+        pipe = self.client.pipeline()
+        for user_id in user_ids:
+            pipe.getbit(key, user_id)
+        return [user_id for user_id, bit in zip(user_ids, pipe.execute()) if not bit]
+
+
+_notified = None
+_notified_lock = threading.Lock()
+
+
+def get_notified_set():
+    """The record of notified users, in Redis when REDIS_URL is set and in memory otherwise"""
+    global _notified
+    with _notified_lock:
+        if _notified is None:
+            if settings.REDIS_URL:
+                _notified = RedisNotifiedSet(settings.REDIS_URL, settings.ALERT_DEDUP_TTL)
+            else:
+                _notified = MemoryNotifiedSet(settings.ALERT_DEDUP_ALERTS)
+        return _notified
+
+
+def notify(users, message_title, message_body, alert=None, pool=None):
+    """
+    Notifies users on the channels route() picks for them.
+
+    Users already notified of the alert are skipped, and users are only
+    recorded as notified once something got through to them, so a job
+    resumed after a crash retries those it had not reached. A user whose
+    push is not delivered is texted right away if they accept SMS. When
+    PUSH_ACK_DEADLINE is set, one whose push is delivered gets an SMS held
+    back for that many seconds, which acknowledge() cancels if the app
+    confirms the alert first.
+
+    Args:
+        users (list): The recipients.
+        message_title (str): Title of the push notification.
+        message_body (str): Body text of the notification.
+        alert (Alert, optional): The alert being notified, for deduplication and acknowledgement.
+        pool (Executor, optional): Sends the push notifications on this pool, alongside the SMS.
+
+    Returns:
+        tuple: How many of the users were reached and how many could not be.
+    """
+    if alert is not None:
+        fresh = set(get_notified_set().unmarked(alert.pk, [user.pk for user in users]))
+        users = [user for user in users if user.pk in fresh]
+
+    push_users, sms_users = [], []
+    for user in users:
+        channel, _ = route(user)
+        if channel == PUSH:
+            push_users.append(user)
+        elif channel == SMS:
+            sms_users.append(user)
+
+    push_args = (
+        [user.fcm_token for user in push_users],
+        message_title,
+        message_body,
+        {"alert_id": str(alert.pk)} if alert is not None else None,
+    )
+    push_future = None
+    if push_users and pool is not None:
+        push_future = pool.submit(send_multicast, *push_args)
+
+    reached = send_sms(sms_users, message_body)
+    if push_users:
+        push_result = push_future.result() if push_future is not None else send_multicast(*push_args)
+        undelivered = set(push_result["failed_tokens"])
+        fallback_now, awaiting_ack = [], []
+        for user in push_users:
+            _, fallback = route(user)
+            if user.fcm_token not in undelivered:
+                reached.append(user)
+                if fallback and alert is not None and settings.PUSH_ACK_DEADLINE:
+                    awaiting_ack.append(user)
+            elif fallback:
+                fallback_now.append(user)
+        reached += send_sms(fallback_now, message_body)
+        if awaiting_ack:
+            schedule_fallbacks(awaiting_ack, alert, message_body)
+
+    if alert is not None and reached:
+        get_notified_set().add(alert.pk, [user.pk for user in reached])
+    return len(reached), len(users) - len(reached)
+
+
+def send_sms(users, message_body):
+    """Texts the users concurrently, returning those Twilio accepted"""
+    sent = sms_dispatcher.send_many([(user.phone_number, message_body) for user in users])
+    return [user for user, ok in zip(users, sent) if ok]
+
+
+def schedule_fallbacks(users, alert, message_body):
+    """
+    Queues an SMS to each user for PUSH_ACK_DEADLINE seconds from now,
+    for the run_outbox worker to send unless the alert is acknowledged.
+    """
+    send_at = timezone.now() + timedelta(seconds=settings.PUSH_ACK_DEADLINE)
+    return NotificationOutbox.objects.bulk_create([
+        NotificationOutbox(user=user, alert=alert, channel=SMS, body=message_body, available_at=send_at)
+        for user in users
+    ])
+
+
+def acknowledge(user, alert_id):
+    """Cancels the SMS fallbacks still waiting for the user to acknowledge the alert"""
+    return NotificationOutbox.objects.filter(
+        user=user, alert_id=alert_id, channel=SMS, status=NotificationOutbox.STATUS_PENDING
+    ).update(status=NotificationOutbox.STATUS_CANCELLED)
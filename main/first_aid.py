@@ -0,0 +1,90 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+
+from .llm import get_model
+from .models import Alert, AlertChoices, FirstAidGuide
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.FIRST_AID_WORKERS, thread_name_prefix="first-aid"
+)
+# generations in progress in this process, by (alert_type_id, locale)
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def schedule_first_aid(alert, locale):
+    """Fills the alert's first_aid_response in the background once the surrounding transaction commits"""
+    transaction.on_commit(lambda: _executor.submit(fill_first_aid, alert.pk, alert.alert_type_id, locale))
+
+
+def fill_first_aid(alert_id, alert_type_id, locale):
+    close_old_connections()
+    try:
+        text = guide_text(alert_type_id, locale)
+        # an empty response counts as missing, as it does when scheduling
+        Alert.objects.filter(
+            Q(first_aid_response__isnull=True) | Q(first_aid_response=""), pk=alert_id
+        ).update(first_aid_response=text)
+    except Exception:
+        logger.exception("Could not fill first aid guidance for alert %s", alert_id)
+    finally:
+        close_old_connections()
+
+
+def guide_text(alert_type_id, locale):
+    """
+    First-aid text for an alert type and locale.
+
+    The stored FirstAidGuide is used when there is one. Otherwise one
+    caller generates it while concurrent callers for the same key in this
+    process wait for that result; across processes the unique constraint
+    keeps the first guide saved.
+    """
+    text = FirstAidGuide.objects.filter(alert_type_id=alert_type_id, locale=locale).values_list("text", flat=True).first()
+    if text is not None:
+        return text
+
+    key = (alert_type_id, locale)
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        owner = future is None
+        if owner:
+            future = _in_flight[key] = Future()
+    if not owner:
+        return future.result()
+
+    try:
+        text = _store_guide(alert_type_id, locale, generate_guide(alert_type_id, locale))
+        future.set_result(text)
+        return text
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+
+
+def generate_guide(alert_type_id, locale):
+    emergency_name = AlertChoices.objects.get(pk=alert_type_id).emergency_name
+    prompt = (
+        f"Give short, numbered first-aid steps for people caught in a {emergency_name} emergency, "
+        f"written for the public and in the language with code '{locale}'. "
+        "Include when to call emergency services."
+    )
+    return get_model().generate_content(prompt).text
+
+
+def _store_guide(alert_type_id, locale, text):
+    # get_or_create falls back to the row another process saved first
+    guide, _ = FirstAidGuide.objects.get_or_create(
+        alert_type_id=alert_type_id, locale=locale, defaults={"text": text}
+    )
+    return guide.text
@@ -0,0 +1,202 @@
+import itertools
+import math
+
+import numpy as np
+from django.db.models import Q
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+GEOHASH_PRECISION = 12
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Encodes a point as a geohash string of the given length"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bit = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                value = (value << 1) | 1
+                lon_range[0] = mid
+            else:
+                value <<= 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                value = (value << 1) | 1
+                lat_range[0] = mid
+            else:
+                value <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(_BASE32[value])
+            bit = 0
+            value = 0
+    return "".join(chars)
+
+
+def cell_size_degrees(precision):
+    """(height, width) in degrees of a geohash cell of the given length"""
+    bits = 5 * precision
+    lat_bits = bits // 2
+    lon_bits = bits - lat_bits
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def cell_centre(latitude, longitude, precision):
+    """(latitude, longitude) of the centre of the geohash cell of the given length holding the point"""
+    height, width = cell_size_degrees(precision)
+    row = min(math.floor((latitude + 90) / height), round(180 / height) - 1)
+    column = min(math.floor((longitude + 180) / width), round(360 / width) - 1)
+    return row * height - 90 + height / 2, column * width - 180 + width / 2
+
+
+def precision_for_radius(latitude, radius_km, max_precision=9):
+    """
+    Longest geohash whose cells are at least radius_km on each side at
+    this latitude, so a circle centred in one cell stays within that cell
+    and its eight neighbours. Returns 0 when no cell is big enough.
+    """
+    # cells narrow towards the poles, so size them at the circle's
+    # poleward edge rather than at its centre
+    poleward_latitude = min(90.0, abs(latitude) + radius_km / KM_PER_DEGREE)
+    lat_scale = KM_PER_DEGREE
+    lon_scale = KM_PER_DEGREE * max(math.cos(math.radians(poleward_latitude)), 1e-6)
+    precision = 0
+    for candidate in range(1, max_precision + 1):
+        height, width = cell_size_degrees(candidate)
+        if height * lat_scale < radius_km or width * lon_scale < radius_km:
+            break
+        precision = candidate
+    return precision
+
+
+def precision_within(radius_km, max_precision=GEOHASH_PRECISION):
+    """
+    Shortest geohash whose cells are no more than radius_km across
+    anywhere on the globe, so any two points in one cell are within
+    radius_km of each other.
+    """
+    for precision in range(1, max_precision + 1):
+        height, width = cell_size_degrees(precision)
+        if math.hypot(height * KM_PER_DEGREE, width * KM_PER_DEGREE) <= radius_km:
+            return precision
+    return max_precision
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """
+    Geohash prefixes that together cover the circle of radius_km around
+    the point, or None if the circle is too large to prune by cell.
+    """
+    precision = precision_for_radius(latitude, radius_km)
+    if precision == 0:
+        return None
+    height, width = cell_size_degrees(precision)
+    cells = set()
+    for dlat in (-height, 0, height):
+        lat = latitude + dlat
+        if not -90 <= lat <= 90:
+            continue
+        for dlon in (-width, 0, width):
+            lon = (longitude + dlon + 180) % 360 - 180
+            cells.add(geohash_encode(lat, lon, precision))
+    return sorted(cells)
+
+
+def cells_covering_circle(latitude, longitude, radius_km, precision):
+    """
+    Every geohash cell of the given length that overlaps the bounding box
+    of the circle of radius_km around the point.
+    """
+    height, width = cell_size_degrees(precision)
+    dlat = radius_km / KM_PER_DEGREE
+    poleward_latitude = min(90.0, abs(latitude) + dlat)
+    dlon = min(180.0, radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(poleward_latitude)), 1e-6)))
+    lat_min, lat_max = max(-90.0, latitude - dlat), min(90.0, latitude + dlat)
+
+    # walk the centres of the cells on the grid, from the cell holding the
+    # box's south-west corner
+    lat_centres = []
+    lat = math.floor((lat_min + 90) / height) * height - 90 + height / 2
+    while lat - height / 2 <= lat_max:
+        lat_centres.append(min(lat, 90.0))
+        lat += height
+    lon_centres = []
+    lon = math.floor((longitude - dlon + 180) / width) * width - 180 + width / 2
+    while lon - width / 2 <= longitude + dlon and len(lon_centres) * width < 360:
+        lon_centres.append((lon + 180) % 360 - 180)
+        lon += width
+
+    return sorted({geohash_encode(lat, lon, precision) for lat in lat_centres for lon in lon_centres})
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """Great-circle distances in km from one point to arrays of points"""
+    lat1 = np.radians(latitude)
+    lat2 = np.radians(np.asarray(latitudes, dtype=float))
+    dlat = lat2 - lat1
+    dlon = np.radians(np.asarray(longitudes, dtype=float) - longitude)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def cell_ranges(cells, field):
+    """
+    Q matching geohashes inside any of the cells, as index range scans:
+    a prefix lookup compiles to LIKE, which SQLite cannot serve from the
+    index. "~" sorts after every geohash character.
+    """
+    cell_filter = Q()
+    for cell in cells:
+        cell_filter |= Q(**{f"{field}__gte": cell, f"{field}__lt": cell + "~"})
+    return cell_filter
+
+
+def within_radius(queryset, latitude, longitude, radius_km, location_field="location", limit=None):
+    """
+    Rows of the queryset whose location lies within radius_km of the point.
+
+    The geohash index narrows the scan to the cells covering the circle;
+    exact distances are then computed over the candidates in one pass.
+    With a limit, candidates are read in batches in the queryset's order
+    and reading stops once limit rows are within the radius.
+
+    Returns:
+        list: (pk, distance_km) pairs, in the queryset's order.
+    """
+    cells = covering_cells(latitude, longitude, radius_km)
+    if cells is not None:
+        queryset = queryset.filter(cell_ranges(cells, f"{location_field}__geohash"))
+    rows = queryset.filter(
+        **{f"{location_field}__latitude__isnull": False, f"{location_field}__longitude__isnull": False}
+    ).values_list("pk", f"{location_field}__latitude", f"{location_field}__longitude")
+    if limit is None:
+        return _hits(list(rows), latitude, longitude, radius_km)
+
+    # the cells cover about three times the circle's area
+    batch_size = max(limit * 4, 100)
+    hits = []
+    for start in itertools.count(0, batch_size):
+        batch = list(rows[start:start + batch_size])
+        hits.extend(_hits(batch, latitude, longitude, radius_km))
+        if len(hits) >= limit or len(batch) < batch_size:
+            break
+    return hits[:limit]
+
+
+def _hits(rows, latitude, longitude, radius_km):
+    if not rows:
+        return []
+    pks, latitudes, longitudes = zip(*rows)
+    distances = haversine_km(latitude, longitude, latitudes, longitudes)
+    return [(pks[i], float(distances[i])) for i in np.flatnonzero(distances <= radius_km)]
@@ -1,5 +1,6 @@
 from django.conf import settings
-from twilio.rest import Client
+
+from .sms import dispatcher
 
 
 # the message handler for sending messages to the user during registration
@@ -12,9 +13,7 @@ class MessageHandler:
         self.otp = otp
 
     def send_otp_via_message(self):
-        client = Client(settings.ACCOUNT_SID, settings.AUTH_TOKEN)
-        message = client.messages.create(
-            body=f"your otp is {self.otp}",
-            from_=f"{settings.TWILIO_PHONE_NUMBER}",
-            to=f"{settings.COUNTRY_CODE}{self.phone_number}",
+        return dispatcher.send(
+            f"{settings.COUNTRY_CODE}{self.phone_number}",
+            f"your otp is {self.otp}",
         )
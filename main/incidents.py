@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .broadcast import enqueue_broadcast
+from .geo import geohash_encode, precision_within, within_radius
+from .models import Alert, Incident, Location
+
+
+def opening_key(latitude, longitude, reported_at):
+    """
+    The (cell, window_start) an incident opened by this report is keyed
+    on. Cells are small enough that every report in one is within
+    INCIDENT_RADIUS_KM of the others; reports without coordinates share
+    the "" cell.
+    """
+    cell = ""
+    if latitude is not None and longitude is not None:
+        cell = geohash_encode(latitude, longitude, precision_within(settings.INCIDENT_RADIUS_KM))
+    seconds = int(reported_at.timestamp()) // settings.INCIDENT_WINDOW * settings.INCIDENT_WINDOW
+    return cell, datetime.fromtimestamp(seconds, tz=dt_timezone.utc)
+
+
+def assign_incident(alert):
+    """
+    Attaches a new alert to the nearest incident of its type first reported
+    within INCIDENT_RADIUS_KM and active in the last INCIDENT_WINDOW
+    seconds, or opens an incident for it. Reports without coordinates all
+    join one incident per type and window.
+
+    Candidates are narrowed by the geohash cells around the alert and by
+    time through the indexes; their distances are then checked together.
+    Opening is an insert keyed on the alert type, cell and window, so of
+    simultaneous first reports from one cell, in any process, one opens
+    the incident and the others join it.
+
+    Returns:
+        tuple: The incident and whether it was opened by this alert.
+    """
+    location = alert.location
+    reported_at = alert.date_time_of_alert
+    has_point = location.latitude is not None and location.longitude is not None
+    incident_id = None
+    if has_point:
+        candidates = Incident.objects.filter(
+            alert_type_id=alert.alert_type_id,
+            last_alert_at__gte=reported_at - timedelta(seconds=settings.INCIDENT_WINDOW),
+        )
+        hits = within_radius(candidates, location.latitude, location.longitude, settings.INCIDENT_RADIUS_KM)
+        if hits:
+            incident_id, _ = min(hits, key=lambda hit: hit[1])
+
+    created = False
+    if incident_id is None:
+        cell, window_start = opening_key(location.latitude, location.longitude, reported_at)
+        try:
+            with transaction.atomic():
+                incident = Incident.objects.create(
+                    alert_type_id=alert.alert_type_id,
+                    location=Location.objects.create(latitude=location.latitude, longitude=location.longitude)
+                    if has_point else None,
+                    first_alert_at=reported_at,
+                    last_alert_at=reported_at,
+                    cell=cell,
+                    window_start=window_start,
+                )
+            created = True
+        except IntegrityError:
+            # another report opened it first
+            incident_id = Incident.objects.filter(
+                alert_type_id=alert.alert_type_id, cell=cell, window_start=window_start
+            ).values_list("pk", flat=True).get()
+
+    if not created:
+        # reports can commit out of order; last_alert_at only moves forward
+        Incident.objects.filter(pk=incident_id).update(
+            alert_count=F("alert_count") + 1, last_alert_at=Greatest(F("last_alert_at"), reported_at)
+        )
+        incident = Incident.objects.get(pk=incident_id)
+    Alert.objects.filter(pk=alert.pk).update(incident=incident)
+    alert.incident = incident
+    return incident, created
+
+
+def broadcast_incident(incident, alert, radius_km):
+    """
+    Broadcasts the alert unless another report of its incident already
+    was; the conditional update lets exactly one report through, across
+    processes too.
+
+    Returns:
+        BroadcastJob: The new job, or None if the incident was already broadcast.
+    """
+    claimed = Incident.objects.filter(pk=incident.pk, broadcast_at__isnull=True).update(
+        broadcast_at=timezone.now()
+    )
+    if not claimed:
+        return None
+    job = enqueue_broadcast(alert, "New Alert", alert.description, radius_km=radius_km)
+    Incident.objects.filter(pk=incident.pk).update(broadcast_job=job)
+    incident.broadcast_job = job
+    return job
@@ -0,0 +1,215 @@
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+_models = {}
+_lock = threading.Lock()
+
+
+def get_model(model_name="gemini-1.5-pro"):
+    """
+    Returns a shared Gemini model client.
+
+    google.generativeai is imported and configured on the first call rather
+    than at module import, so loading the app never waits on it.
+    """
+    with _lock:
+        model = _models.get(model_name)
+        if model is None:
+            import google.generativeai as genai
+
+            if not _models:
+                genai.configure(api_key=settings.GOOGLE_API_KEY)
+            model = _models[model_name] = genai.GenerativeModel(model_name)
+        return model
+
+
+async def get_model_async(model_name="gemini-1.5-pro"):
+    """get_model for async callers; only the first, configuring call runs in a thread"""
+    model = _models.get(model_name)
+    if model is None:
+        model = await sync_to_async(get_model, thread_sensitive=False)(model_name)
+    return model
+
+
+def normalize_prompt(text):
+    """Lowercases and strips punctuation and extra whitespace"""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+def shingles(text, size=3):
+    """Character n-grams of a normalized prompt"""
+    padded = f" {text} "
+    return {padded[i:i + size] for i in range(max(len(padded) - size + 1, 1))}
+
+
+# Words that change which first aid applies while barely changing the
+# shingles: "left arm" and "left leg", "make him vomit" and "do not make
+# him vomit". Normalization splits "don't" into "don" and "t".
+NEGATION_WORDS = {
+    "no", "not", "never", "nor", "neither", "without", "cannot", "t",
+    "don", "doesn", "didn", "isn", "aren", "wasn", "weren", "won", "shouldn", "can", "couldn", "mustn",
+}
+NEGATION_PREFIXES = ("un", "non")
+BODY_WORDS = {
+    "head", "skull", "face", "eye", "eyes", "ear", "ears", "nose", "mouth", "lip", "lips", "tongue",
+    "tooth", "teeth", "jaw", "throat", "neck", "spine", "back", "chest", "rib", "ribs", "lung", "lungs",
+    "heart", "stomach", "belly", "abdomen", "pelvis", "hip", "hips", "groin", "shoulder", "shoulders",
+    "arm", "arms", "elbow", "elbows", "wrist", "wrists", "hand", "hands", "finger", "fingers", "thumb",
+    "leg", "legs", "thigh", "knee", "knees", "ankle", "ankles", "foot", "feet", "toe", "toes", "skin",
+    "left", "right", "upper", "lower", "baby", "infant", "child", "adult", "pregnant",
+}
+
+
+def guard_words(text):
+    """Negations and body, side and age words of a normalized prompt"""
+    return frozenset(
+        word for word in text.split()
+        if word in NEGATION_WORDS or word in BODY_WORDS or word.startswith(NEGATION_PREFIXES)
+    )
+
+
+class ResponseCache:
+    """
+    LRU cache of chatbot replies keyed on normalized prompt text.
+
+    Lookups first try the exact normalized prompt, then, when a similarity
+    threshold is set, the cached prompt whose character shingles overlap
+    most (Jaccard) with the new one among those with the same guard_words,
+    so a negated question or one about another body part is never
+    answered with the other's reply. An inverted shingle index keeps that
+    search to prompts sharing at least one shingle.
+    """
+
+    def __init__(self, max_entries, ttl, similarity=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.entries = OrderedDict()
+        self.index = defaultdict(set)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    def get(self, prompt):
+        key = normalize_prompt(prompt)
+        with self.lock:
+            entry = self._live_entry(key)
+            if entry is None and self.similarity:
+                key = self._most_similar(key)
+                entry = self._live_entry(key) if key else None
+                if entry is not None:
+                    self.similar_hits += 1
+            elif entry is not None:
+                self.hits += 1
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, prompt, response):
+        key = normalize_prompt(prompt)
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (response, time.monotonic() + self.ttl, shingles(key), guard_words(key))
+            for shingle in self.entries[key][2]:
+                self.index[shingle].add(key)
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+
+    def metrics(self):
+        with self.lock:
+            lookups = self.hits + self.similar_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.similar_hits) / lookups if lookups else None,
+            }
+
+    def _live_entry(self, key):
+        entry = self.entries.get(key)
+        if entry is not None and entry[1] < time.monotonic():
+            self._remove(key)
+            return None
+        return entry
+
+    def _most_similar(self, key):
+        query = shingles(key)
+        guards = guard_words(key)
+        overlaps = defaultdict(int)
+        for shingle in query:
+            for candidate in self.index.get(shingle, ()):
+                if self.entries[candidate][3] == guards:
+                    overlaps[candidate] += 1
+        best_key, best_score = None, 0.0
+        for candidate, overlap in overlaps.items():
+            score = overlap / (len(query) + len(self.entries[candidate][2]) - overlap)
+            if score > best_score:
+                best_key, best_score = candidate, score
+        return best_key if best_score >= self.similarity else None
+
+    def _remove(self, key):
+        _, _, key_shingles, _ = self.entries.pop(key)
+        for shingle in key_shingles:
+            keys = self.index[shingle]
+            keys.discard(key)
+            if not keys:
+                del self.index[shingle]
+
+
+response_cache = ResponseCache(
+    max_entries=settings.CHATBOT_CACHE_SIZE,
+    ttl=settings.CHATBOT_CACHE_TTL,
+    similarity=settings.CHATBOT_CACHE_SIMILARITY,
+)
+
+
+def generate_reply(message, model_name="gemini-1.5-pro"):
+    """Answers a chatbot message, from the cache when a close enough prompt was answered before"""
+    cached = response_cache.get(message)
+    if cached is not None:
+        return cached
+    prompt = f"User: {message}\nBot:"
+    reply = get_model(model_name).generate_content(prompt).text
+    response_cache.set(message, reply)
+    return reply
+
+
+async def generate_reply_async(message, model_name="gemini-1.5-pro"):
+    """generate_reply for async callers, awaiting Gemini instead of blocking a thread"""
+    cached = response_cache.get(message)
+    if cached is not None:
+        return cached
+    model = await get_model_async(model_name)
+    prompt = f"User: {message}\nBot:"
+    reply = (await model.generate_content_async(prompt)).text
+    response_cache.set(message, reply)
+    return reply
+
+
+async def stream_reply(message, model_name="gemini-1.5-pro"):
+    """
+    Yields a chatbot reply in chunks as Gemini generates them. A cached
+    reply is yielded whole; a completed stream is added to the cache.
+    """
+    cached = response_cache.get(message)
+    if cached is not None:
+        yield cached
+        return
+    model = await get_model_async(model_name)
+    prompt = f"User: {message}\nBot:"
+    response = await model.generate_content_async(prompt, stream=True)
+    parts = []
+    async for chunk in response:
+        parts.append(chunk.text)
+        yield chunk.text
+    response_cache.set(message, "".join(parts))
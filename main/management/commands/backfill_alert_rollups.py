@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from main.models import Alert, AlertRollup
+from main.rollups import add_counts, count_chunk
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the alert rollup table from existing alerts, read in primary key chunks and '
+        'counted per cell, hour and alert type before each chunk is written. Alerts created '
+        'while it runs are counted as usual on insert.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            deleted, _ = AlertRollup.objects.all().delete()
+            # alerts after this one are counted on insert from now on
+            last_id = Alert.objects.aggregate(last_id=Max('pk'))['last_id'] or 0
+        self.stdout.write(f'Cleared {deleted} rollup rows, counting alerts up to #{last_id}')
+
+        alerts = Alert.objects.filter(pk__lte=last_id).order_by('pk').values_list(
+            'pk', 'alert_type_id', 'date_time_of_alert', 'location__latitude', 'location__longitude'
+        )
+        after = counted = 0
+        while True:
+            chunk = list(alerts.filter(pk__gt=after)[:options['chunk_size']])
+            if not chunk:
+                break
+            after = chunk[-1][0]
+            counts, points = count_chunk(row[1:] for row in chunk)
+            with transaction.atomic():
+                add_counts(counts, points)
+            counted += sum(counts.values())
+            self.stdout.write(f'Counted {counted} alerts (up to #{after})')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Counted {counted} alerts into {AlertRollup.objects.count()} rollup rows.'
+        ))
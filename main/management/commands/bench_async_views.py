@@ -0,0 +1,146 @@
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+import pyotp
+from django.contrib.auth.hashers import make_password
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+
+from main import llm
+from main.models import Alert, AlertChoices, CustomUser, Incident, Location
+from main.sms import dispatcher as sms_dispatcher
+
+# sync and async URL of each endpoint compared
+ENDPOINTS = {
+    'chatbot': ('/chatbot/', '/async/chatbot/'),
+    'signup': ('/user/signup/', '/async/user/signup/'),
+    'verify': ('/verify_phone/', '/async/verify_phone/'),
+    'alerts': ('/alerts/', '/async/alerts/'),
+}
+USER_PREFIX = 'bench-async-'
+
+
+class StubModel:
+    """Stands in for the Gemini model, taking a fixed time to answer"""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def generate_content(self, prompt):
+        time.sleep(self.latency)
+        return StubResponse(prompt)
+
+    async def generate_content_async(self, prompt):
+        await asyncio.sleep(self.latency)
+        return StubResponse(prompt)
+
+
+class StubResponse:
+    def __init__(self, prompt):
+        self.text = f'echo: {prompt}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test the sync and async chatbot, signup, phone verification and alert creation '
+        'views through the ASGI handler and report requests/sec and latency percentiles. Gemini '
+        'is replaced by a stub of fixed latency and SMS sends by a no-op; the users and alerts '
+        'created are deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--latency-ms', type=float, default=100)
+        parser.add_argument('--endpoints', nargs='+', choices=list(ENDPOINTS), default=list(ENDPOINTS))
+
+    def handle(self, *args, **options):
+        stub = StubModel(options['latency_ms'] / 1000)
+        original_get_model = llm.get_model
+        original_send = sms_dispatcher.send
+        llm.get_model = lambda model_name='gemini-1.5-pro': stub
+        llm._models['gemini-1.5-pro'] = stub
+        sms_dispatcher.send = lambda phone_number, message: {'sid': None, 'status': 'stubbed', 'elapsed': 0}
+        try:
+            for endpoint in options['endpoints']:
+                for mode, url in zip(('sync', 'async'), ENDPOINTS[endpoint]):
+                    payloads = getattr(self, f'{endpoint}_payloads')(mode, options['requests'])
+                    try:
+                        latencies, elapsed, errors = asyncio.run(self.load(url, payloads, options['concurrency']))
+                    finally:
+                        self.clean_up()
+                    latencies.sort()
+                    self.stdout.write(
+                        f'{endpoint:>7} {mode:>5}: {len(latencies) / elapsed:8.1f} req/s, '
+                        f'p50 {statistics.median(latencies) * 1000:7.1f} ms, '
+                        f'p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:7.1f} ms, '
+                        f'{errors} errors'
+                    )
+        finally:
+            llm.get_model = original_get_model
+            llm._models.pop('gemini-1.5-pro', None)
+            sms_dispatcher.send = original_send
+
+    def chatbot_payloads(self, mode, requests):
+        # unique messages, so every request misses the reply cache
+        return [{'message': f'benchmark {uuid.uuid4().hex}'} for _ in range(requests)]
+
+    def signup_payloads(self, mode, requests):
+        return [
+            {'username': f'{USER_PREFIX}{mode}-{i}', 'phone_number': f'+23765{i:07d}', 'password': 'benchmark'}
+            for i in range(requests)
+        ]
+
+    def verify_payloads(self, mode, requests):
+        # one user per request, so the OTP attempt limiter never refuses one
+        password = make_password('benchmark')
+        users = CustomUser.objects.bulk_create(
+            CustomUser(username=f'{USER_PREFIX}{mode}-{i}', phone_number=f'+23765{i:07d}', password=password)
+            for i in range(requests)
+        )
+        return [
+            {'phone_number': user.phone_number, 'otp_code': pyotp.TOTP(user.otp, interval=300).now()}
+            for user in users
+        ]
+
+    def alerts_payloads(self, mode, requests):
+        alert_type = AlertChoices.objects.order_by('pk').first()
+        location = Location.objects.create(latitude=4.05, longitude=9.7)
+        # a first aid response is given, so no Gemini call is scheduled
+        return [
+            {'alert_type': alert_type.pk, 'location': location.pk, 'description': f'{USER_PREFIX}{i}',
+             'first_aid_response': 'benchmark'}
+            for i in range(requests)
+        ]
+
+    def clean_up(self):
+        CustomUser.objects.filter(username__startswith=USER_PREFIX).delete()
+        alerts = Alert.objects.filter(description__startswith=USER_PREFIX)
+        incidents = Incident.objects.filter(pk__in=set(alerts.values_list('incident_id', flat=True)))
+        locations = set(alerts.values_list('location_id', flat=True)) | set(incidents.values_list('location_id', flat=True))
+        incidents.delete()
+        Location.objects.filter(pk__in=locations).delete()
+
+    async def load(self, url, payloads, concurrency):
+        transport = httpx.ASGITransport(app=get_asgi_application())
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        errors = 0
+
+        async def one(client, payload):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(url, json=payload)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code not in (200, 201):
+                    errors += 1
+
+        async with httpx.AsyncClient(transport=transport, base_url='http://127.0.0.1') as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(one(client, payload) for payload in payloads))
+            elapsed = time.perf_counter() - started
+        return latencies, elapsed, errors
@@ -0,0 +1,76 @@
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, connections
+
+from main.models import Location
+
+
+class Command(BaseCommand):
+    help = (
+        'Insert rows from increasing numbers of concurrent threads, each holding its own '
+        'connection, and report writes/sec, latency percentiles and failed writes per level. '
+        'Use it to size the connection pool. The rows are deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', default='1,4,16,32', help='Comma-separated concurrency levels')
+        parser.add_argument('--writes', type=int, default=200, help='Inserts per thread')
+
+    def handle(self, *args, **options):
+        settings_dict = connection.settings_dict
+        self.stdout.write(
+            f"{connection.vendor} database {settings_dict['NAME']}, "
+            f"CONN_MAX_AGE={settings_dict['CONN_MAX_AGE']}"
+        )
+        for threads in [int(level) for level in options['threads'].split(',')]:
+            latencies, errors, elapsed, pks = self.run_level(threads, options['writes'])
+            Location.objects.filter(pk__in=pks).delete()
+            if not latencies:
+                self.stdout.write(f'{threads:>4} threads: every write failed ({errors} errors)')
+                continue
+            latencies.sort()
+            self.stdout.write(
+                f'{threads:>4} threads: {len(latencies) / elapsed:8.1f} writes/s, '
+                f'p50 {statistics.median(latencies) * 1000:7.1f} ms, '
+                f'p99 {latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000:7.1f} ms, '
+                f'{errors} errors'
+            )
+
+    def run_level(self, threads, writes):
+        barrier = threading.Barrier(threads)
+        lock = threading.Lock()
+        latencies = []
+        pks = []
+        errors = 0
+
+        def worker(index):
+            nonlocal errors
+            own_latencies, own_pks, own_errors = [], [], 0
+            try:
+                barrier.wait()
+                for i in range(writes):
+                    started = time.perf_counter()
+                    try:
+                        location = Location.objects.create(latitude=index % 90, longitude=i % 180)
+                    except DatabaseError:
+                        own_errors += 1
+                        continue
+                    own_latencies.append(time.perf_counter() - started)
+                    own_pks.append(location.pk)
+            finally:
+                connections.close_all()
+                with lock:
+                    latencies.extend(own_latencies)
+                    pks.extend(own_pks)
+                    errors += own_errors
+
+        workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return latencies, errors, time.perf_counter() - started, pks
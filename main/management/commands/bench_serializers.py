@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from main.models import Alert, AlertChoices, DisasterFeedback, Location
+from main.serializers import (
+    ALERT_READ_RELATED,
+    FEEDBACK_READ_RELATED,
+    AlertReadSerializer,
+    DisasterFeedbackReadSerializer,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Time serializing alert and feedback listings and report the queries they run. '
+        'Fixtures are rolled back afterwards; main.tests.test_listings checks that the query '
+        'count stays constant.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with transaction.atomic():
+            self.create_fixtures(rows)
+            cases = [
+                ('alerts', Alert.objects.select_related(*ALERT_READ_RELATED).order_by('-id'), AlertReadSerializer),
+                (
+                    'feedbacks',
+                    DisasterFeedback.objects.select_related(*FEEDBACK_READ_RELATED).order_by('-id'),
+                    DisasterFeedbackReadSerializer,
+                ),
+            ]
+            for name, queryset, serializer_class in cases:
+                queries, elapsed = self.measure(queryset[:rows], serializer_class)
+                self.stdout.write(
+                    f'{name}: {rows} rows in {elapsed * 1000:.1f} ms '
+                    f'({elapsed / rows * 1e6:.1f} us/row), {queries} queries'
+                )
+            transaction.set_rollback(True)
+
+    def measure(self, queryset, serializer_class):
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            serializer_class(queryset, many=True).data
+            elapsed = time.perf_counter() - started
+        return len(context), elapsed
+
+    def create_fixtures(self, rows):
+        choices = list(AlertChoices.objects.all()) or [AlertChoices.objects.create(emergency_name='Fire')]
+        locations = Location.objects.bulk_create(
+            Location(latitude=i % 180 - 90, longitude=i % 360 - 180) for i in range(rows)
+        )
+        alerts = Alert.objects.bulk_create(
+            Alert(alert_type=choices[i % len(choices)], location=location, description=f'Alert {i}')
+            for i, location in enumerate(locations)
+        )
+        DisasterFeedback.objects.bulk_create(
+            DisasterFeedback(alert=alert, description=f'Feedback {i}') for i, alert in enumerate(alerts)
+        )
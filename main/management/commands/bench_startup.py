@@ -0,0 +1,53 @@
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter so nothing is already imported. Outbound HTTP
+# is stubbed to fail, so a provider that still fetches at import time
+# breaks the benchmark instead of quietly adding network latency to it.
+IMPORT_SCRIPT = """
+import os, time
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", %(settings)r)
+import requests
+
+def offline(*args, **kwargs):
+    raise RuntimeError("outbound HTTP during import")
+
+requests.Session.request = offline
+import django
+django.setup()
+start = time.perf_counter()
+import main.views
+print(time.perf_counter() - start)
+"""
+
+
+class Command(BaseCommand):
+    help = 'Measure how long importing main.views takes in a fresh process, with outbound providers stubbed'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=10)
+
+    def handle(self, *args, **options):
+        script = IMPORT_SCRIPT % {'settings': settings.SETTINGS_MODULE}
+        timings = []
+        for _ in range(options['runs']):
+            result = subprocess.run(
+                [sys.executable, '-c', script],
+                cwd=settings.BASE_DIR,
+                capture_output=True,
+                text=True,
+            )
+            if result.returncode != 0:
+                raise CommandError(f'Importing main.views failed:\n{result.stderr}')
+            timings.append(float(result.stdout.strip().splitlines()[-1]) * 1000)
+
+        self.stdout.write(
+            f'main.views import over {len(timings)} runs: '
+            f'min {min(timings):.1f} ms, median {statistics.median(timings):.1f} ms, '
+            f'max {max(timings):.1f} ms'
+        )
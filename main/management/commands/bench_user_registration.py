@@ -0,0 +1,54 @@
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from main.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Register users one save() at a time and through bulk_create, and report users/sec '
+        'and queries per user. Every user shares one precomputed password hash so the '
+        'timings measure the database path, not PBKDF2. The users are deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--mode', choices=['save', 'bulk', 'both'], default='both')
+
+    def handle(self, *args, **options):
+        password = make_password('benchmark')
+        modes = ['save', 'bulk'] if options['mode'] == 'both' else [options['mode']]
+        for mode in modes:
+            queries = 0
+
+            def count(execute, sql, params, many, context):
+                nonlocal queries
+                queries += 1
+                return execute(sql, params, many, context)
+
+            users = (
+                CustomUser(username=f'bench-{mode}-{i}', phone_number=f'{i:09d}', password=password)
+                for i in range(options['users'])
+            )
+            # autocommit, as registrations run, so save() needs no savepoints
+            try:
+                with connection.execute_wrapper(count):
+                    started = time.perf_counter()
+                    if mode == 'save':
+                        for user in users:
+                            user.save()
+                    else:
+                        CustomUser.objects.bulk_create(users, batch_size=options['batch_size'])
+                    elapsed = time.perf_counter() - started
+            finally:
+                CustomUser.objects.filter(username__startswith=f'bench-{mode}-').delete()
+
+            self.stdout.write(
+                f"{mode:>4}: {options['users']} users in {elapsed:.1f} s "
+                f"({options['users'] / elapsed:,.0f} users/s), "
+                f"{queries / options['users']:.3f} queries/user"
+            )
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from main.first_aid import guide_text
+from main.models import AlertChoices
+
+
+class Command(BaseCommand):
+    help = 'Generate the first aid guide for every alert type ahead of time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--locale', action='append', dest='locales')
+
+    def handle(self, *args, **options):
+        locales = options['locales'] or [settings.LANGUAGE_CODE]
+        for alert_type in AlertChoices.objects.all():
+            for locale in locales:
+                guide_text(alert_type.pk, locale)
+                self.stdout.write(f'{alert_type} ({locale}): ready')
+        self.stdout.write(self.style.SUCCESS('First aid guides generated.'))
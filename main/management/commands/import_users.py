@@ -0,0 +1,148 @@
+import csv
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+
+from main.models import CustomUser
+from main.outbox import enqueue as enqueue_notifications, verification_sms
+from main.phone import normalize_phone
+
+FIELDS = ('username', 'phone_number', 'email', 'first_name', 'last_name', 'fcm_token')
+NULLABLE_FIELDS = ('phone_number', 'fcm_token')
+
+
+class Command(BaseCommand):
+    help = (
+        'Import users from a CSV or JSONL file (one user per row/line, with username and '
+        'optionally password, phone_number, email, first_name, last_name and fcm_token). '
+        'Passwords are hashed in a process pool; users, their API tokens and a verification '
+        'SMS per phone number are inserted in chunks. The codes are sent by run_outbox.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Password hashing processes')
+        parser.add_argument('--no-otp', action='store_true', help='Do not queue verification codes')
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or ('jsonl' if options['path'].endswith(('.jsonl', '.ndjson')) else 'csv')
+        self.created = self.skipped = self.queued = 0
+        seen = set()
+        seen_phones = set()
+
+        with open(options['path'], newline='', encoding='utf-8') as source, ProcessPoolExecutor(
+            max_workers=options['workers'], initializer=django.setup
+        ) as pool:
+            rows = self.read_rows(source, file_format)
+            # hash the next chunk's passwords while the current one is inserted
+            pending = deque()
+            while True:
+                batch = list(islice(rows, options['chunk_size']))
+                chunk = self.clean_chunk(batch, seen, seen_phones)
+                if chunk:
+                    passwords = [row.pop('password', None) or None for _, row in chunk]
+                    pending.append((chunk, pool.map(make_password, passwords, chunksize=64)))
+                if pending and (len(pending) > 1 or not batch):
+                    self.insert_chunk(*pending.popleft(), send_otp=not options['no_otp'])
+                if not batch and not pending:
+                    break
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {self.created} users, skipped {self.skipped}, '
+            f'queued {self.queued} verification codes.'
+        ))
+
+    def read_rows(self, source, file_format):
+        """Yields (line_number, row) pairs from the file"""
+        if file_format == 'csv':
+            reader = csv.DictReader(source)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line_number, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                raise CommandError(f'Line {line_number}: invalid JSON ({e})')
+            yield line_number, row
+
+    def clean_chunk(self, rows, seen, seen_phones):
+        """
+        Normalizes phone numbers to E.164 and drops rows without a username,
+        with an invalid number, or repeating a username or number from the
+        file or the database
+        """
+        if not rows:
+            return []
+        cleaned = []
+        for line_number, row in rows:
+            row = {key: (value.strip() if isinstance(value, str) else value) for key, value in row.items()}
+            username = row.get('username')
+            if not username or username in seen:
+                self.warn(line_number, 'missing or duplicate username')
+                continue
+            if row.get('phone_number'):
+                try:
+                    row['phone_number'] = normalize_phone(row['phone_number'])
+                except ValueError:
+                    self.warn(line_number, f"invalid phone number {row['phone_number']}")
+                    continue
+                if row['phone_number'] in seen_phones:
+                    self.warn(line_number, 'duplicate phone number')
+                    continue
+                seen_phones.add(row['phone_number'])
+            seen.add(username)
+            cleaned.append((line_number, row))
+
+        existing = set(
+            CustomUser.objects.filter(username__in=[row['username'] for _, row in cleaned])
+            .values_list('username', flat=True)
+        )
+        existing_phones = set(
+            CustomUser.objects.filter(phone_number__in=[row['phone_number'] for _, row in cleaned if row.get('phone_number')])
+            .values_list('phone_number', flat=True)
+        )
+        kept = []
+        for line_number, row in cleaned:
+            if row['username'] in existing:
+                self.warn(line_number, f"user {row['username']} already exists")
+            elif row.get('phone_number') in existing_phones:
+                self.warn(line_number, f"phone number {row['phone_number']} already belongs to a user")
+            else:
+                kept.append((line_number, row))
+        return kept
+
+    def insert_chunk(self, chunk, hashes, send_otp):
+        users = [
+            CustomUser(
+                password=password,
+                **{field: row.get(field) or (None if field in NULLABLE_FIELDS else '') for field in FIELDS},
+            )
+            for (_, row), password in zip(chunk, hashes)
+        ]
+        with transaction.atomic():
+            users = CustomUser.objects.bulk_create(users)
+            Token.objects.bulk_create([Token(user=user, key=Token.generate_key()) for user in users])
+            if send_otp:
+                # left to the run_outbox worker rather than sent from this process
+                messages = [verification_sms(user) for user in users if user.phone_number]
+                enqueue_notifications(messages, dispatch_now=False)
+                self.queued += len(messages)
+        self.created += len(users)
+        self.stdout.write(f'Imported {self.created} users')
+
+    def warn(self, line_number, reason):
+        self.skipped += 1
+        self.stderr.write(f'Line {line_number}: skipped, {reason}')
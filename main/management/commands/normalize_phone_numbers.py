@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from main.models import CustomUser
+from main.phone import normalize_phone
+
+
+class Command(BaseCommand):
+    help = (
+        'Rewrite phone numbers still stored as entered in E.164, reading those without a '
+        'country code as PHONE_DEFAULT_REGION numbers. A number already held by another '
+        'user in E.164 is left as it is and reported.'
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Default region: {settings.PHONE_DEFAULT_REGION or "none"}')
+        users = CustomUser.objects.filter(phone_number__isnull=False).exclude(phone_number='').exclude(
+            phone_number__startswith='+'
+        ).only('pk', 'phone_number')
+        normalized = unparsed = taken = 0
+        for user in users.iterator(chunk_size=1000):
+            try:
+                phone_number = normalize_phone(user.phone_number)
+            except ValueError:
+                unparsed += 1
+                continue
+            if CustomUser.objects.filter(phone_number=phone_number).exists():
+                taken += 1
+                self.stdout.write(f'User #{user.pk}: {phone_number} already belongs to another user')
+                continue
+            CustomUser.objects.filter(pk=user.pk).update(phone_number=phone_number)
+            normalized += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{normalized} numbers normalized, {unparsed} still unparseable, {taken} already taken.'
+        ))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from main.broadcast import run_broadcast
+from main.models import BroadcastJob
+
+
+class Command(BaseCommand):
+    help = (
+        'Run broadcast jobs that are pending or were interrupted before completing, '
+        'skipping those another process still holds'
+    )
+
+    def handle(self, *args, **kwargs):
+        job_ids = list(
+            BroadcastJob.objects.exclude(status=BroadcastJob.STATUS_COMPLETED)
+            .order_by('created_at')
+            .values_list('id', flat=True)
+        )
+        if not job_ids:
+            self.stdout.write(self.style.WARNING('No broadcast jobs to run.'))
+            return
+
+        for job_id in job_ids:
+            if not run_broadcast(job_id):
+                self.stdout.write(f'Broadcast {job_id}: running in another process, skipped')
+                continue
+            job = BroadcastJob.objects.get(pk=job_id)
+            self.stdout.write(
+                f'Broadcast {job.pk}: {job.status}, {job.sent_count} sent, '
+                f'{job.failed_count} failed of {job.total_recipients}'
+            )
@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from main.outbox import claim, deliver
+
+
+class Command(BaseCommand):
+    help = (
+        'Deliver pending notification outbox rows: claim a batch, send it, record the '
+        'outcomes, repeat. Run several workers to scale out; each claims different rows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.OUTBOX_BATCH_SIZE)
+        parser.add_argument('--poll-interval', type=float, default=settings.OUTBOX_POLL_INTERVAL)
+        parser.add_argument('--once', action='store_true', help='Exit once no rows are left to claim')
+
+    def handle(self, *args, **options):
+        sent = failed = 0
+        try:
+            while True:
+                close_old_connections()
+                rows = claim(batch_size=options['batch_size'])
+                if not rows:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                deliver(rows)
+                batch_sent = sum(1 for row in rows if row.status == row.STATUS_SENT)
+                sent += batch_sent
+                failed += len(rows) - batch_sent
+                self.stdout.write(f'Delivered {batch_sent} of {len(rows)} claimed rows')
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'{sent} delivered, {failed} failed or rescheduled.'))
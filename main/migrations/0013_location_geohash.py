@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:14
+
+from django.db import migrations, models
+
+from main.geo import geohash_encode
+
+
+def populate_geohash(apps, schema_editor):
+    Location = apps.get_model('main', 'Location')
+    locations = Location.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    batch = []
+    for location in locations.iterator(chunk_size=1000):
+        location.geohash = geohash_encode(location.latitude, location.longitude)
+        batch.append(location)
+        if len(batch) >= 1000:
+            Location.objects.bulk_update(batch, ['geohash'])
+            batch = []
+    if batch:
+        Location.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_broadcastjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12, null=True),
+        ),
+        migrations.RunPython(populate_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_location_geohash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='broadcastjob',
+            name='radius_km',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='last_location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='main.location'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0014_geo_targeted_broadcast'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['-date_time_of_alert', '-id'], name='alert_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['alert_type', '-date_time_of_alert', '-id'], name='alert_type_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='disasterfeedback',
+            index=models.Index(fields=['-date_time_of_feedback', '-id'], name='feedback_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='disasterfeedback',
+            index=models.Index(fields=['alert', '-date_time_of_feedback', '-id'], name='feedback_alert_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FirstAidGuide',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('locale', models.CharField(max_length=15)),
+                ('text', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('alert_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='first_aid_guides', to='main.alertchoices')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='firstaidguide',
+            constraint=models.UniqueConstraint(fields=('alert_type', 'locale'), name='unique_first_aid_guide'),
+        ),
+    ]
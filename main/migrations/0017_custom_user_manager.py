@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:29
+
+from django.db import migrations
+import main.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0016_firstaidguide'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='customuser',
+            managers=[
+                ('objects', main.models.CustomUserManager()),
+            ],
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:55
+
+import sys
+
+import phonenumbers
+from django.conf import settings
+from django.db import migrations, models
+
+
+def normalize_phone_numbers(apps, schema_editor):
+    """
+    Rewrites phone numbers in E.164, leaving unparseable ones as they are,
+    and clears the number from all but one user per number: the verified
+    one, else the most recent.
+
+    Numbers left as they are stay verifiable, since verify_phone_request
+    looks up numbers it cannot normalize as entered, but they cannot be
+    texted; without PHONE_DEFAULT_REGION every number lacking a country
+    code is one of them, so a warning counts them.
+    """
+    CustomUser = apps.get_model('main', 'CustomUser')
+    users = (
+        CustomUser.objects.filter(phone_number__isnull=False)
+        .only('pk', 'phone_number', 'phone_verified')
+        .order_by('-phone_verified', '-pk')
+    )
+    seen = set()
+    batch = []
+    unparsed = 0
+    for user in users.iterator(chunk_size=1000):
+        phone_number = user.phone_number.strip()
+        try:
+            parsed = phonenumbers.parse(phone_number, settings.PHONE_DEFAULT_REGION)
+        except phonenumbers.NumberParseException:
+            parsed = None
+        if parsed is not None and phonenumbers.is_valid_number(parsed):
+            phone_number = phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
+        elif phone_number:
+            unparsed += 1
+        if not phone_number or phone_number in seen:
+            user.phone_number = None
+            user.phone_verified = False
+        else:
+            seen.add(phone_number)
+            user.phone_number = phone_number
+        batch.append(user)
+        if len(batch) >= 1000:
+            CustomUser.objects.bulk_update(batch, ['phone_number', 'phone_verified'])
+            batch = []
+    if batch:
+        CustomUser.objects.bulk_update(batch, ['phone_number', 'phone_verified'])
+    if unparsed:
+        hint = '' if settings.PHONE_DEFAULT_REGION else '; set PHONE_DEFAULT_REGION and run manage.py normalize_phone_numbers'
+        sys.stderr.write(f'\n  Warning: {unparsed} phone numbers could not be normalized and were left as entered{hint}\n')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0020_outbox_alert_fallback'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='phone_number',
+            field=models.CharField(blank=True, max_length=16, null=True),
+        ),
+        migrations.RunPython(normalize_phone_numbers, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='customuser',
+            name='phone_number',
+            field=models.CharField(blank=True, max_length=16, null=True, unique=True),
+        ),
+    ]
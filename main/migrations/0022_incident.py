@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0021_unique_e164_phone_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Incident',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_alert_at', models.DateTimeField()),
+                ('last_alert_at', models.DateTimeField()),
+                ('alert_count', models.PositiveIntegerField(default=1)),
+                ('broadcast_at', models.DateTimeField(blank=True, null=True)),
+                ('alert_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incidents', to='main.alertchoices')),
+                ('broadcast_job', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='main.broadcastjob')),
+                ('location', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='main.location')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='incident',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='alerts', to='main.incident'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['-last_alert_at', '-id'], name='incident_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['alert_type', '-last_alert_at'], name='incident_type_recent_idx'),
+        ),
+    ]
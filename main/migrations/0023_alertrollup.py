@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0022_incident'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cell', models.CharField(max_length=12)),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('hour', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('alert_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.alertchoices')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour', 'latitude'], name='alert_rollup_hour_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='alertrollup',
+            constraint=models.UniqueConstraint(fields=('cell', 'hour', 'alert_type'), name='unique_alert_rollup'),
+        ),
+    ]
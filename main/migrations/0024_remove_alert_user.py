@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:08
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0023_alertrollup'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='alert',
+            name='user',
+        ),
+    ]
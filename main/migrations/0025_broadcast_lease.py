@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0024_remove_alert_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='broadcastjob',
+            name='lease_owner',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='broadcastjob',
+            name='leased_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+def grandfather_phone_numbers(apps, schema_editor):
+    """
+    Keeps texting the users registered before phone verification was
+    enforced for SMS: they were already being texted, and would otherwise
+    stop getting alerts until they verify. phone_verified is left alone,
+    since nobody verified these numbers.
+    """
+    CustomUser = apps.get_model('main', 'CustomUser')
+    CustomUser.objects.filter(phone_number__isnull=False, phone_verified=False).exclude(
+        phone_number=''
+    ).update(phone_grandfathered=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0025_broadcast_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='phone_grandfathered',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(grandfather_phone_numbers, migrations.RunPython.noop),
+    ]
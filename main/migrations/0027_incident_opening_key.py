@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0026_grandfather_phone_numbers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='incident',
+            name='cell',
+            field=models.CharField(blank=True, max_length=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='incident',
+            name='window_start',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='incident',
+            constraint=models.UniqueConstraint(fields=('alert_type', 'cell', 'window_start'), name='unique_incident_opening'),
+        ),
+    ]
@@ -1,29 +1,99 @@
-from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.db import IntegrityError, connections, models, router, transaction
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.conf import settings
+from django.utils import timezone
+
+from .geo import GEOHASH_PRECISION, geohash_encode
 
 
 import pyotp
 
+# times an insert is retried with fresh OTP secrets after colliding on the unique index
+OTP_SECRET_ATTEMPTS = 5
+
+
+def new_otp_secrets(count):
+    """count distinct random TOTP secrets"""
+    secrets = set()
+    while len(secrets) < count:
+        secrets.add(pyotp.random_base32())
+    return list(secrets)
+
+
+def _retry_otp_collisions(model, using, users, write):
+    """
+    Runs write() after giving the users without an OTP secret a new one.
+
+    Nothing is queried up front: the unique index on otp rejects the rare
+    duplicate, and the write is retried with new secrets if one of them
+    is already taken. Inside a transaction the write gets a savepoint so a
+    rejected attempt doesn't abort the outer transaction.
+    """
+    for attempt in range(OTP_SECRET_ATTEMPTS):
+        for user, secret in zip(users, new_otp_secrets(len(users))):
+            user.otp = secret
+        try:
+            if connections[using].in_atomic_block:
+                with transaction.atomic(using=using):
+                    return write()
+            return write()
+        except IntegrityError:
+            secrets = [user.otp for user in users]
+            if attempt == OTP_SECRET_ATTEMPTS - 1 or not model._base_manager.using(using).filter(otp__in=secrets).exists():
+                for user in users:
+                    user.otp = None
+                raise
+
+
+class CustomUserManager(UserManager):
+    def bulk_create(self, objs, *args, **kwargs):
+        """bulk_create that provisions OTP secrets, generated in one batch, for users without one"""
+        objs = list(objs)
+        missing = [user for user in objs if not user.otp]
+        if not missing:
+            return super().bulk_create(objs, *args, **kwargs)
+        using = self._db or router.db_for_write(self.model)
+        return _retry_otp_collisions(
+            self.model, using, missing, lambda: super(CustomUserManager, self).bulk_create(objs, *args, **kwargs)
+        )
+
 
 class CustomUser(AbstractUser):
     fcm_token = models.CharField(max_length=255, blank=True, null=True)
-    phone_number = models.CharField(max_length=15, blank=True, null=True)
+    # E.164 (see main.phone.normalize_phone), so each number has one spelling
+    phone_number = models.CharField(max_length=16, blank=True, null=True, unique=True)
     notify_via_sms = models.BooleanField(default=True)
     phone_verified = models.BooleanField(default=False)
+    # texted before numbers had to be verified, so still texted until they are
+    phone_grandfathered = models.BooleanField(default=False, editable=False)
     otp = models.CharField(max_length=100, null=True, blank=True, unique=True)
+    last_location = models.ForeignKey(
+        "Location", on_delete=models.SET_NULL, blank=True, null=True, related_name="+"
+    )
+
+    objects = CustomUserManager()
+
+    def save(self, *args, **kwargs):
+        if self.otp:
+            return super().save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = set(update_fields) | {"otp"}
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        _retry_otp_collisions(type(self), using, [self], lambda: super(CustomUser, self).save(*args, **kwargs))
 
     # validate opt
     def authenticate(self, otp):
         """This method authenticates the given otp"""
-        provided_otp = 0
-        try:
-            provided_otp = int(otp)
-        except:
+        # compared as zero-padded text: as an int, codes starting with 0
+        # never matched
+        provided_otp = str(otp).strip()
+        if not provided_otp.isdigit():
             return False
         # Here we are using Time Based OTP. The interval is 300 seconds.
         # otp must be provided within this interval or it's invalid
         t = pyotp.TOTP(self.otp, interval=300)
+        provided_otp = provided_otp.zfill(t.digits)
         return t.verify(provided_otp)
 
     def __str__(self):
@@ -42,26 +112,252 @@ class AlertChoices(models.Model):
 class Location(models.Model):
     longitude = models.FloatField(default=None, blank=True, null=True)
     latitude = models.FloatField(default=None, blank=True, null=True)
+    # maintained on save; range lookups on it prune radius queries to nearby cells
+    geohash = models.CharField(max_length=GEOHASH_PRECISION, blank=True, null=True, db_index=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = geohash_encode(self.latitude, self.longitude)
+        else:
+            self.geohash = None
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"latitude", "longitude"} & set(update_fields):
+            kwargs["update_fields"] = set(update_fields) | {"geohash"}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return str(self.longitude)
 
 
+class Incident(models.Model):
+    """
+    Alerts of one type reported close together in space and time, taken
+    to be reports of the same emergency (see main.incidents).
+    """
+
+    alert_type = models.ForeignKey(AlertChoices, on_delete=models.CASCADE, related_name="incidents")
+    # a copy of the first report's location; later reports join the
+    # incident if they are within INCIDENT_RADIUS_KM of it
+    location = models.ForeignKey(Location, on_delete=models.SET_NULL, blank=True, null=True, related_name="+")
+    first_alert_at = models.DateTimeField()
+    last_alert_at = models.DateTimeField()
+    alert_count = models.PositiveIntegerField(default=1)
+    # set by the one report allowed to broadcast the incident
+    broadcast_at = models.DateTimeField(blank=True, null=True)
+    broadcast_job = models.ForeignKey("BroadcastJob", on_delete=models.SET_NULL, blank=True, null=True, related_name="+")
+    # where and when the incident was opened: the geohash cell of its first
+    # report ("" for reports without coordinates) and the INCIDENT_WINDOW
+    # long period it fell in. Only one incident of a type opens per cell
+    # and period, whichever process the reports reach.
+    cell = models.CharField(max_length=GEOHASH_PRECISION, blank=True, null=True)
+    window_start = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["alert_type", "cell", "window_start"], name="unique_incident_opening"),
+        ]
+        indexes = [
+            models.Index(fields=["-last_alert_at", "-id"], name="incident_recent_idx"),
+            models.Index(fields=["alert_type", "-last_alert_at"], name="incident_type_recent_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.alert_type} ({self.alert_count} reports)"
+
+
 class Alert(models.Model):
     alert_type = models.ForeignKey(AlertChoices, on_delete=models.CASCADE, default=None)
     date_time_of_alert = models.DateTimeField(auto_now_add=True)
     location = models.ForeignKey(Location, on_delete=models.CASCADE, default=None)
     description = models.TextField()
     first_aid_response = models.TextField(blank=True, null=True)
+    incident = models.ForeignKey(Incident, on_delete=models.SET_NULL, blank=True, null=True, related_name="alerts")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-date_time_of_alert", "-id"], name="alert_recent_idx"),
+            models.Index(fields=["alert_type", "-date_time_of_alert", "-id"], name="alert_type_recent_idx"),
+        ]
 
     def __str__(self):
         return self.description
 
 
+class AlertRollup(models.Model):
+    """
+    Number of alerts of one type reported in one geohash cell (of
+    ROLLUP_CELL_PRECISION characters) during one hour, kept up to date as
+    alerts are created (see main.rollups).
+    """
+
+    cell = models.CharField(max_length=GEOHASH_PRECISION)
+    # centre of the cell, for bounding box queries
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    hour = models.DateTimeField()
+    alert_type = models.ForeignKey(AlertChoices, on_delete=models.CASCADE, related_name="+")
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["cell", "hour", "alert_type"], name="unique_alert_rollup"),
+        ]
+        indexes = [
+            models.Index(fields=["hour", "latitude"], name="alert_rollup_hour_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.cell} {self.hour:%Y-%m-%d %H:00} {self.alert_type}: {self.count}"
+
+
 class DisasterFeedback(models.Model):
     description = models.TextField()
     date_time_of_feedback = models.DateTimeField(auto_now_add=True)
     alert = models.ForeignKey(Alert, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["-date_time_of_feedback", "-id"], name="feedback_recent_idx"),
+            models.Index(fields=["alert", "-date_time_of_feedback", "-id"], name="feedback_alert_recent_idx"),
+        ]
+
     def __str__(self):
         return self.description[:30]
+
+
+class FirstAidGuide(models.Model):
+    """First-aid text generated once per alert type and locale and shared by its alerts"""
+
+    alert_type = models.ForeignKey(AlertChoices, on_delete=models.CASCADE, related_name="first_aid_guides")
+    locale = models.CharField(max_length=15)
+    text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["alert_type", "locale"], name="unique_first_aid_guide"),
+        ]
+
+    def __str__(self):
+        return f"{self.alert_type} ({self.locale})"
+
+
+class BroadcastJob(models.Model):
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_COMPLETED = "completed"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_COMPLETED, "Completed"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    alert = models.ForeignKey(Alert, on_delete=models.CASCADE, related_name="broadcast_jobs")
+    message_title = models.CharField(max_length=255)
+    message_body = models.TextField()
+    # only users last seen within this distance (km) of the alert are
+    # notified; null notifies everyone
+    radius_km = models.FloatField(blank=True, null=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    total_recipients = models.PositiveIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    # pk of the last recipient handed to the dispatch stage, so a job
+    # interrupted mid-way resumes after it instead of starting over
+    last_recipient_id = models.BigIntegerField(default=0)
+    # the process running the job holds it until its lease runs out,
+    # renewing it after every chunk; an expired lease means it died
+    lease_owner = models.CharField(max_length=32, blank=True)
+    leased_until = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    @property
+    def processed_count(self):
+        return self.sent_count + self.failed_count
+
+    @property
+    def throughput(self):
+        """Recipients processed per second since the job started"""
+        if not self.started_at:
+            return 0.0
+        end = self.finished_at or timezone.now()
+        elapsed = (end - self.started_at).total_seconds()
+        if elapsed <= 0:
+            return 0.0
+        return self.processed_count / elapsed
+
+    def __str__(self):
+        return f"Broadcast for alert {self.alert_id} ({self.status})"
+
+
+class NotificationOutbox(models.Model):
+    """
+    A notification recorded in the same transaction as the change that
+    caused it and delivered at least once after that transaction commits,
+    either right away or by the run_outbox worker.
+    """
+
+    CHANNEL_PUSH = "push"
+    CHANNEL_SMS = "sms"
+    # an alert event for the WebSocket groups; payload holds the event
+    CHANNEL_STREAM = "stream"
+    CHANNEL_CHOICES = [
+        (CHANNEL_PUSH, "Push"),
+        (CHANNEL_SMS, "SMS"),
+        (CHANNEL_STREAM, "Alert stream"),
+    ]
+
+    # verification messages carry no body; the current TOTP code is
+    # rendered when they are sent, so a delayed send is still valid
+    KIND_MESSAGE = "message"
+    KIND_VERIFICATION = "verification"
+    KIND_CHOICES = [
+        (KIND_MESSAGE, "Message"),
+        (KIND_VERIFICATION, "Verification code"),
+    ]
+
+    STATUS_PENDING = "pending"
+    STATUS_SENT = "sent"
+    STATUS_FAILED = "failed"
+    # an SMS fallback made unnecessary by the user acknowledging the alert
+    STATUS_CANCELLED = "cancelled"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_SENT, "Sent"),
+        (STATUS_FAILED, "Failed"),
+        (STATUS_CANCELLED, "Cancelled"),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, blank=True, null=True, related_name="+")
+    alert = models.ForeignKey("Alert", on_delete=models.CASCADE, blank=True, null=True, related_name="+")
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    kind = models.CharField(max_length=15, choices=KIND_CHOICES, default=KIND_MESSAGE)
+    title = models.CharField(max_length=255, blank=True)
+    body = models.TextField(blank=True)
+    payload = models.JSONField(blank=True, null=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    # not retried before this time
+    available_at = models.DateTimeField(default=timezone.now)
+    # a dispatcher holds the row until its lease runs out; an expired lease
+    # means the dispatcher died and the row can be claimed again
+    lease_owner = models.CharField(max_length=32, blank=True)
+    leased_until = models.DateTimeField(blank=True, null=True)
+    # time the last attempt spent with the provider
+    latency_ms = models.FloatField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "available_at"], name="outbox_claim_idx"),
+            models.Index(fields=["lease_owner"], name="outbox_lease_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} {self.kind} for user {self.user_id} ({self.status})"
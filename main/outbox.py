@@ -0,0 +1,295 @@
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections, connections, router, transaction
+from django.db.models import Avg, Count, Q
+from django.utils import timezone
+
+from .delivery import accepts_sms, route
+from .models import NotificationOutbox
+from .push import DELIVERED, INVALID, send_one
+from .sms import dispatcher as sms_dispatcher
+from .streams import alert_event, publish_event
+from .utils import verification_message
+
+logger = logging.getLogger(__name__)
+
+# Rows are sent right after their transaction commits on this pool; the
+# run_outbox worker picks up whatever that misses or leaves for a retry.
+_executor = ThreadPoolExecutor(
+    max_workers=settings.OUTBOX_WORKERS, thread_name_prefix="outbox"
+)
+# stream rows are published in order from the delivering thread instead
+_channel_executors = {
+    channel: ThreadPoolExecutor(max_workers=settings.OUTBOX_CONCURRENCY, thread_name_prefix=f"outbox-{channel}")
+    for channel in (NotificationOutbox.CHANNEL_PUSH, NotificationOutbox.CHANNEL_SMS)
+}
+
+
+class PermanentFailure(Exception):
+    """A delivery that retrying cannot fix, such as a missing or invalid recipient"""
+
+
+class Superseded(Exception):
+    """The row was cancelled or is no longer held by this caller, so it must not be sent"""
+
+
+def enqueue(messages, dispatch_now=True):
+    """
+    Records notifications in the outbox, to be delivered once the
+    surrounding transaction commits, so none are sent for a change that
+    is rolled back.
+
+    Args:
+        messages (list): Unsaved NotificationOutbox rows.
+        dispatch_now (bool): Send them from this process right after the
+            commit; otherwise they wait for the run_outbox worker.
+
+    Returns:
+        list: The saved rows.
+    """
+    rows = NotificationOutbox.objects.bulk_create(messages)
+    ids = [row.pk for row in rows]
+    if ids and dispatch_now:
+        transaction.on_commit(lambda: _executor.submit(dispatch, ids))
+    return rows
+
+
+def registration_messages(user):
+    """The welcome notification and verification SMS owed to a newly registered user"""
+    messages = []
+    welcome_channel, _ = route(user)
+    if welcome_channel:
+        messages.append(NotificationOutbox(
+            user=user, channel=welcome_channel, title="Welcome!", body="Thanks for registering with our app."
+        ))
+    if user.phone_number:
+        messages.append(verification_sms(user))
+    return messages
+
+
+def verification_sms(user):
+    return NotificationOutbox(user=user, channel=NotificationOutbox.CHANNEL_SMS, kind=NotificationOutbox.KIND_VERIFICATION)
+
+
+def alert_stream_message(alert, radius_km):
+    """The outbox row publishing an alert to the WebSocket clients around it"""
+    return NotificationOutbox(channel=NotificationOutbox.CHANNEL_STREAM, payload=alert_event(alert, radius_km))
+
+
+def claim(batch_size=None, ids=None):
+    """
+    Leases up to batch_size deliverable rows, or the given ones, to this
+    caller for OUTBOX_LEASE_SECONDS.
+
+    On PostgreSQL the candidates are picked with FOR UPDATE SKIP LOCKED, so
+    concurrent workers take different rows instead of queueing behind each
+    other. SQLite has no row locks but serializes writes; there the
+    conditional UPDATE alone decides which caller gets a row, outside a
+    transaction, since a WAL read upgraded to a write fails if another
+    writer committed in between.
+
+    Returns:
+        list: The claimed rows, with their users.
+    """
+    now = timezone.now()
+    owner = uuid.uuid4().hex
+    claimable = NotificationOutbox.objects.filter(
+        status=NotificationOutbox.STATUS_PENDING, available_at__lte=now
+    ).filter(Q(leased_until__isnull=True) | Q(leased_until__lt=now))
+    if ids is not None:
+        claimable = claimable.filter(pk__in=ids)
+    skip_locked = connections[router.db_for_write(NotificationOutbox)].features.has_select_for_update_skip_locked
+
+    def lease():
+        candidates = claimable.order_by("pk").values_list("pk", flat=True)
+        if skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        candidates = list(candidates[:batch_size] if batch_size else candidates)
+        if not candidates:
+            return 0
+        return claimable.filter(pk__in=candidates).update(
+            lease_owner=owner, leased_until=now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+        )
+
+    if skip_locked:
+        with transaction.atomic():
+            leased = lease()
+    else:
+        leased = lease()
+    if not leased:
+        return []
+    return list(NotificationOutbox.objects.filter(lease_owner=owner).select_related("user").order_by("pk"))
+
+
+def dispatch(ids):
+    """Delivers the given rows unless another dispatcher already holds them"""
+    close_old_connections()
+    try:
+        deliver(claim(ids=ids))
+    except Exception:
+        logger.exception("Could not dispatch outbox rows %s", ids)
+    finally:
+        close_old_connections()
+
+
+def deliver(rows):
+    """
+    Sends claimed rows and records each outcome as soon as it is known.
+
+    Push and SMS rows are sent in parallel within each channel and across
+    channels. Stream rows are published one at a time in primary key
+    order, so WebSocket clients see alerts in the order they were raised.
+
+    Every row is checked to still be pending and held by this caller right
+    before it is sent, which also renews its lease, and its outcome is
+    only written under the same condition: a row cancelled meanwhile, such
+    as an SMS fallback for an alert acknowledged in the app, is not sent,
+    and a row whose lease ran out and was claimed by another worker is
+    left to that worker instead of being sent twice.
+
+    Failed rows are retried with exponential backoff until they reach
+    OUTBOX_MAX_ATTEMPTS or fail permanently.
+    """
+    futures = [
+        _channel_executors[row.channel].submit(_deliver_on_channel, row)
+        for row in rows if row.channel != NotificationOutbox.CHANNEL_STREAM
+    ]
+    for row in rows:
+        if row.channel == NotificationOutbox.CHANNEL_STREAM:
+            _deliver_one(row)
+    for future in futures:
+        future.result()
+    return rows
+
+
+def _deliver_on_channel(row):
+    """Delivers a row on a long-lived channel thread, which manages its own connection"""
+    # as each request does, so CONN_MAX_AGE and CONN_HEALTH_CHECKS apply
+    # and a dropped connection is replaced instead of failing every later row
+    close_old_connections()
+    try:
+        _deliver_one(row)
+    finally:
+        close_old_connections()
+
+
+def _deliver_one(row):
+    try:
+        latency = send(row)
+        error = None
+    except Superseded:
+        logger.info("Outbox row %s was cancelled or taken over before it was sent", row.pk)
+        return
+    except Exception as e:
+        error, latency = e, None
+
+    now = timezone.now()
+    row.attempts += 1
+    row.latency_ms = round(latency * 1000, 1) if latency is not None else None
+    if error is None:
+        row.status = NotificationOutbox.STATUS_SENT
+        row.sent_at = now
+        row.last_error = ""
+    else:
+        row.last_error = str(error)
+        if isinstance(error, PermanentFailure) or row.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            row.status = NotificationOutbox.STATUS_FAILED
+            logger.warning("Outbox row %s failed after %s attempts: %s", row.pk, row.attempts, error)
+        else:
+            row.available_at = now + timedelta(seconds=settings.OUTBOX_RETRY_BACKOFF * 2 ** (row.attempts - 1))
+
+    written = NotificationOutbox.objects.filter(
+        pk=row.pk, lease_owner=row.lease_owner, status=NotificationOutbox.STATUS_PENDING
+    ).update(
+        status=row.status,
+        attempts=row.attempts,
+        last_error=row.last_error,
+        latency_ms=row.latency_ms,
+        available_at=row.available_at,
+        sent_at=row.sent_at,
+        lease_owner="",
+        leased_until=None,
+    )
+    if not written:
+        logger.warning("Outbox row %s was cancelled or taken over while it was being sent", row.pk)
+    row.lease_owner = ""
+    row.leased_until = None
+
+
+def hold(row):
+    """
+    Renews this caller's lease on the row.
+
+    Raises:
+        Superseded: If the row was cancelled or another worker has claimed it since.
+    """
+    renewed = NotificationOutbox.objects.filter(
+        pk=row.pk, lease_owner=row.lease_owner, status=NotificationOutbox.STATUS_PENDING
+    ).update(
+        leased_until=timezone.now() + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+    )
+    if not renewed:
+        raise Superseded(row.pk)
+
+
+def held_message(row, message):
+    """The SMS text once the row is confirmed to still be held, for sending after the rate limiter's wait"""
+    hold(row)
+    return message() if callable(message) else message
+
+
+def send(row):
+    """
+    Delivers one row through its channel; raises if it was not delivered.
+
+    Returns:
+        float: Seconds the provider took, excluding rate limiting.
+    """
+    user = row.user
+    if row.channel == NotificationOutbox.CHANNEL_STREAM:
+        hold(row)
+        started = time.monotonic()
+        publish_event(row.payload)
+        return time.monotonic() - started
+    if row.channel == NotificationOutbox.CHANNEL_PUSH:
+        if not user.fcm_token:
+            raise PermanentFailure("User has no FCM token")
+        hold(row)
+        started = time.monotonic()
+        outcome = send_one(user.fcm_token, row.title, row.body)
+        if outcome == INVALID:
+            raise PermanentFailure("FCM token is no longer valid")
+        if outcome != DELIVERED:
+            raise RuntimeError("Push notification was not delivered")
+        return time.monotonic() - started
+
+    if not user.phone_number:
+        raise PermanentFailure("User has no phone number")
+    if row.kind == NotificationOutbox.KIND_VERIFICATION:
+        # the code is read after the rate limiter's wait, so it is still current when sent
+        message = partial(verification_message, user.otp)
+    elif accepts_sms(user):
+        message = row.body
+    else:
+        raise PermanentFailure("User does not accept SMS")
+    return sms_dispatcher.send(user.phone_number, partial(held_message, row, message))["elapsed"]
+
+
+def metrics():
+    """Outbox backlog per status and channel, and recent delivery latency"""
+    counts = NotificationOutbox.objects.values("channel", "status").annotate(count=Count("id"))
+    backlog = {}
+    for row in counts:
+        backlog.setdefault(row["channel"], {})[row["status"]] = row["count"]
+    recent = NotificationOutbox.objects.filter(sent_at__gte=timezone.now() - timedelta(hours=1))
+    latency = recent.values("channel").annotate(avg_latency_ms=Avg("latency_ms"), sent=Count("id"))
+    return {
+        "backlog": backlog,
+        "last_hour": {row["channel"]: {"sent": row["sent"], "avg_latency_ms": row["avg_latency_ms"]} for row in latency},
+    }
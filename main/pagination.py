@@ -0,0 +1,29 @@
+from rest_framework.pagination import CursorPagination
+
+
+class AlertCursorPagination(CursorPagination):
+    ordering = ("-date_time_of_alert", "-id")
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+
+class IncidentCursorPagination(CursorPagination):
+    ordering = ("-last_alert_at", "-id")
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+
+class DisasterFeedbackCursorPagination(CursorPagination):
+    ordering = ("-date_time_of_feedback", "-id")
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+
+class LocationCursorPagination(CursorPagination):
+    ordering = ("-id",)
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
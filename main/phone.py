@@ -0,0 +1,155 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+import phonenumbers
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from .models import CustomUser
+from .redis_client import get_redis
+
+# Outcomes of verify_phone
+VERIFIED = "verified"
+INVALID_CODE = "invalid_code"
+UNKNOWN_NUMBER = "unknown_number"
+
+
+def normalize_phone(phone_number):
+    """
+    The number in E.164 form (+ and up to 15 digits), the form stored on
+    users and sent to Twilio. Numbers without a country code are read as
+    PHONE_DEFAULT_REGION ones.
+
+    Raises:
+        ValueError: If the number cannot be parsed or is not a valid number.
+    """
+    try:
+        parsed = phonenumbers.parse(str(phone_number), settings.PHONE_DEFAULT_REGION)
+    except phonenumbers.NumberParseException as e:
+        raise ValueError(str(e))
+    if not phonenumbers.is_valid_number(parsed):
+        raise ValueError("Not a valid phone number.")
+    return phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
+
+
+class MemoryAttemptLimiter:
+    """Per-process sliding-window log of attempts per key, for the most recent max_keys keys"""
+
+    def __init__(self, limit, window, max_keys=100000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self.attempts = OrderedDict()
+        self.lock = threading.Lock()
+
+    def hit(self, key):
+        """
+        Records an attempt for the key unless it already used up the window.
+
+        Returns:
+            float: 0 if the attempt is allowed, else seconds until it would be.
+        """
+        now = time.monotonic()
+        with self.lock:
+            log = self.attempts.setdefault(key, deque())
+            self.attempts.move_to_end(key)
+            while len(self.attempts) > self.max_keys:
+                self.attempts.popitem(last=False)
+            while log and log[0] <= now - self.window:
+                log.popleft()
+            if len(log) >= self.limit:
+                return log[0] + self.window - now
+            log.append(now)
+            return 0
+
+
+class RedisAttemptLimiter:
+    """The same sliding window kept in a Redis sorted set per key, shared by every process"""
+
+    # trims the window, then records the attempt if there is room, atomically
+    SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local window = tonumber(ARGV[2])
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+    if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[3]) then
+        local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+        return tostring(tonumber(oldest[2]) + window - now)
+    end
+    redis.call('ZADD', KEYS[1], now, ARGV[4])
+    redis.call('EXPIRE', KEYS[1], math.ceil(window))
+    return '0'
+    """
+
+    def __init__(self, url, limit, window, prefix="otp:attempts"):
+        self.client = get_redis(url)
+        self.script = self.client.register_script(self.SCRIPT)
+        self.limit = limit
+        self.window = window
+        self.prefix = prefix
+        self.counter = 0
+        self.lock = threading.Lock()
+
+    def hit(self, key):
+        now = time.time()
+        with self.lock:
+            self.counter += 1
+            member = f"{now}:{threading.get_ident()}:{self.counter}"
+        wait = self.script(keys=[f"{self.prefix}:{key}"], args=[now, self.window, self.limit, member])
+        return max(float(wait), 0)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_otp_limiter():
+    """The OTP attempt limiter, in Redis when REDIS_URL is set and in memory otherwise"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            if settings.REDIS_URL:
+                _limiter = RedisAttemptLimiter(
+                    settings.REDIS_URL, settings.OTP_ATTEMPT_LIMIT, settings.OTP_ATTEMPT_WINDOW
+                )
+            else:
+                _limiter = MemoryAttemptLimiter(settings.OTP_ATTEMPT_LIMIT, settings.OTP_ATTEMPT_WINDOW)
+        return _limiter
+
+
+def verify_phone(phone_number, otp_code):
+    """
+    Checks the code against the user holding the (normalized) number and
+    marks the number verified: one indexed read, and one UPDATE the first
+    time only.
+
+    Returns:
+        str: VERIFIED, INVALID_CODE or UNKNOWN_NUMBER.
+    """
+    user = CustomUser.objects.filter(phone_number=phone_number).only("pk", "otp", "phone_verified").first()
+    if user is None:
+        return UNKNOWN_NUMBER
+    if not user.authenticate(otp_code):
+        return INVALID_CODE
+    if not user.phone_verified:
+        CustomUser.objects.filter(pk=user.pk).update(phone_verified=True)
+        # the UPDATE skips post_save, which would otherwise refresh the cached user
+        token_cache.invalidate_user(user.pk)
+    return VERIFIED
+
+
+async def averify_phone(phone_number, otp_code):
+    """verify_phone for async views, querying through the async ORM instead of a thread"""
+    user = await CustomUser.objects.filter(phone_number=phone_number).only("pk", "otp", "phone_verified").afirst()
+    if user is None:
+        return UNKNOWN_NUMBER
+    if not user.authenticate(otp_code):
+        return INVALID_CODE
+    if not user.phone_verified:
+        await CustomUser.objects.filter(pk=user.pk).aupdate(phone_verified=True)
+        keys = [key async for key in Token.objects.filter(user_id=user.pk).values_list("key", flat=True)]
+        # may call Redis, so off the event loop
+        await sync_to_async(token_cache.invalidate, thread_sensitive=False)(*keys)
+    return VERIFIED
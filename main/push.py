@@ -0,0 +1,215 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from google.oauth2 import service_account
+from pyfcm import FCMNotification
+from pyfcm.errors import FCMNotRegisteredError, FCMServerError, InvalidDataError
+from requests.adapters import HTTPAdapter
+
+from .models import CustomUser
+
+logger = logging.getLogger(__name__)
+
+FCM_SCOPES = ["https://www.googleapis.com/auth/firebase.messaging"]
+
+# Outcomes of a single token delivery
+DELIVERED = "delivered"
+INVALID = "invalid"
+FAILED = "failed"
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.FCM_CONCURRENCY, thread_name_prefix="fcm"
+)
+
+_fcm = None
+_fcm_loaded_at = 0.0
+_fcm_lock = threading.Lock()
+_fcm_refresh_lock = threading.Lock()
+
+
+def fetch_service_account_file(url):
+    response = requests.get(url)
+    response.raise_for_status()
+    return response.json()
+
+
+def load_service_account_info():
+    """
+    Returns the FCM service account, reading it from the on-disk cache
+    while that is younger than FCM_CREDENTIALS_TTL and downloading it
+    otherwise. A stale cache is still used if the download fails.
+    """
+    cache_path = Path(settings.FCM_CREDENTIALS_CACHE)
+    cached = None
+    if cache_path.exists():
+        cached = json.loads(cache_path.read_text())
+        if time.time() - cache_path.stat().st_mtime < settings.FCM_CREDENTIALS_TTL:
+            return cached
+
+    try:
+        service_account_info = fetch_service_account_file(settings.FCM_SERVICE_ACCOUNT_URL)
+    except requests.exceptions.RequestException:
+        if cached is None:
+            raise
+        logger.warning("Could not refresh FCM credentials, using cached copy", exc_info=True)
+        return cached
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    # created owner-only, so the key is never readable by others, even briefly
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as tmp_file:
+        json.dump(service_account_info, tmp_file)
+    os.replace(tmp_path, cache_path)
+    return service_account_info
+
+
+def initialize_fcm():
+    service_account_info = load_service_account_info()
+    project_id = service_account_info.get("project_id")
+    credentials = service_account.Credentials.from_service_account_info(
+        service_account_info, scopes=FCM_SCOPES
+    )
+    # pyfcm keeps one session per thread; sharing a single adapter means
+    # all of them draw keep-alive connections from the same pool.
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.FCM_CONCURRENCY)
+    return FCMNotification(
+        service_account_file=None, credentials=credentials, project_id=project_id, adapter=adapter
+    )
+
+
+def get_fcm():
+    """
+    Returns the shared FCM client, building it on first use and once its
+    credentials expire.
+
+    The download happens outside _fcm_lock: one thread rebuilds the client
+    while the others keep sending with the expired one, and only the very
+    first build makes callers wait.
+    """
+    global _fcm, _fcm_loaded_at
+    with _fcm_lock:
+        current = _fcm
+        if current is not None and time.monotonic() - _fcm_loaded_at < settings.FCM_CREDENTIALS_TTL:
+            return current
+    if not _fcm_refresh_lock.acquire(blocking=current is None):
+        return current
+    try:
+        with _fcm_lock:
+            if _fcm is not current:
+                return _fcm
+        fcm = initialize_fcm()
+        with _fcm_lock:
+            _fcm = fcm
+            _fcm_loaded_at = time.monotonic()
+        return fcm
+    except Exception:
+        if current is None:
+            raise
+        logger.warning("Could not rebuild the FCM client, keeping the current one", exc_info=True)
+        return current
+    finally:
+        _fcm_refresh_lock.release()
+
+
+def send_multicast(registration_ids, message_title, message_body, data=None):
+    """
+    Sends a notification to many devices.
+
+    FCM's HTTP v1 API takes one token per request, so tokens are grouped
+    into batches of FCM_BATCH_SIZE whose requests are sent in parallel.
+    Transient failures are retried with exponential backoff and tokens
+    FCM reports as unregistered or invalid are cleared from their users
+    in one update per batch.
+
+    Args:
+        registration_ids (list): Device registration IDs to notify.
+        message_title (str): Title of the push notification.
+        message_body (str): Body text of the push notification.
+        data (dict, optional): String values delivered to the app with the notification.
+
+    Returns:
+        dict: Counts of delivered and failed tokens, the tokens that were
+        not delivered, and the invalid ones among them that were pruned.
+    """
+    result = {"success": 0, "failure": 0, "failed_tokens": [], "invalid_tokens": []}
+    tokens = list(dict.fromkeys(token for token in registration_ids if token))
+
+    for start in range(0, len(tokens), settings.FCM_BATCH_SIZE):
+        batch = tokens[start:start + settings.FCM_BATCH_SIZE]
+        outcomes = _executor.map(
+            lambda token: _send_with_retry(token, message_title, message_body, data), batch
+        )
+        invalid_tokens = []
+        for token, outcome in zip(batch, outcomes):
+            if outcome == DELIVERED:
+                result["success"] += 1
+            else:
+                result["failure"] += 1
+                result["failed_tokens"].append(token)
+                if outcome == INVALID:
+                    invalid_tokens.append(token)
+
+        if invalid_tokens:
+            prune_invalid_tokens(invalid_tokens)
+            result["invalid_tokens"].extend(invalid_tokens)
+
+    return result
+
+
+def send_one(token, message_title, message_body):
+    """
+    Sends a notification to a single device, with the same retries as
+    send_multicast, clearing the token if FCM reports it invalid.
+
+    Returns:
+        str: DELIVERED, INVALID or FAILED.
+    """
+    outcome = _send_with_retry(token, message_title, message_body)
+    if outcome == INVALID:
+        prune_invalid_tokens([token])
+    return outcome
+
+
+def prune_invalid_tokens(tokens):
+    """Clears the given FCM tokens from every user holding them"""
+    pruned = CustomUser.objects.filter(fcm_token__in=tokens).update(fcm_token=None)
+    logger.info("Pruned %s invalid FCM tokens", pruned)
+    return pruned
+
+
+def _send_with_retry(token, message_title, message_body, data=None):
+    for attempt in range(settings.FCM_MAX_RETRIES + 1):
+        try:
+            get_fcm().notify(
+                fcm_token=token,
+                notification_title=message_title,
+                notification_body=message_body,
+                data_payload=data,
+            )
+            return DELIVERED
+        except FCMNotRegisteredError:
+            return INVALID
+        except InvalidDataError as e:
+            # Malformed tokens come back as INVALID_ARGUMENT; any other bad
+            # request is a payload problem, not the token's fault.
+            if "registration token" in str(e):
+                return INVALID
+            logger.warning("FCM rejected message for token %s: %s", token, e)
+            return FAILED
+        except (FCMServerError, requests.exceptions.RequestException) as e:
+            if attempt == settings.FCM_MAX_RETRIES:
+                logger.warning("FCM delivery failed after %s attempts: %s", attempt + 1, e)
+                return FAILED
+            time.sleep(settings.FCM_RETRY_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5))
+        except Exception as e:
+            logger.warning("FCM delivery failed: %s", e)
+            return FAILED
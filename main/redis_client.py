@@ -0,0 +1,21 @@
+import threading
+
+import redis
+from django.conf import settings
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_redis(url=None):
+    """
+    The Redis client for the URL (REDIS_URL by default), shared by
+    everything in the process that keeps state in Redis, so they all draw
+    connections from one pool.
+    """
+    url = url or settings.REDIS_URL
+    with _clients_lock:
+        client = _clients.get(url)
+        if client is None:
+            client = _clients[url] = redis.Redis.from_url(url)
+        return client
@@ -0,0 +1,146 @@
+import math
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Min, Q, Sum
+from django.db.models.functions import Substr
+
+from .geo import cell_centre, cell_size_degrees, geohash_encode
+from .models import AlertRollup
+
+
+def rollup_key(alert_type_id, reported_at, latitude, longitude):
+    """The (cell, hour, alert_type_id) an alert is counted under, or None without coordinates"""
+    if latitude is None or longitude is None:
+        return None
+    cell = geohash_encode(latitude, longitude, settings.ROLLUP_CELL_PRECISION)
+    return cell, reported_at.replace(minute=0, second=0, microsecond=0), alert_type_id
+
+
+def record_alert(alert):
+    """Counts a newly created alert in its rollup row"""
+    location = alert.location
+    key = rollup_key(alert.alert_type_id, alert.date_time_of_alert, location.latitude, location.longitude)
+    if key is not None:
+        add_counts({key: 1}, {key[0]: (location.latitude, location.longitude)})
+
+
+def forget_alert(alert):
+    """Takes a deleted alert out of its rollup row, if it was counted in one"""
+    location = alert.location
+    key = rollup_key(alert.alert_type_id, alert.date_time_of_alert, location.latitude, location.longitude)
+    if key is not None:
+        cell, hour, alert_type_id = key
+        AlertRollup.objects.filter(cell=cell, hour=hour, alert_type_id=alert_type_id, count__gt=0).update(
+            count=F("count") - 1
+        )
+
+
+def add_counts(counts, points):
+    """
+    Adds counts to their rollup rows, creating the missing ones.
+
+    Nothing is read first: each key is an UPDATE, and only a key that
+    matched no row is inserted, retried as an UPDATE if a concurrent
+    writer inserted it in between.
+
+    Args:
+        counts (dict): Alerts to add per (cell, hour, alert_type_id).
+        points (dict): A point inside each cell, by cell.
+    """
+    for (cell, hour, alert_type_id), count in counts.items():
+        rows = AlertRollup.objects.filter(cell=cell, hour=hour, alert_type_id=alert_type_id)
+        if rows.update(count=F("count") + count):
+            continue
+        latitude, longitude = cell_centre(*points[cell], settings.ROLLUP_CELL_PRECISION)
+        try:
+            with transaction.atomic():
+                AlertRollup.objects.create(
+                    cell=cell, hour=hour, alert_type_id=alert_type_id,
+                    latitude=latitude, longitude=longitude, count=count,
+                )
+        except IntegrityError:
+            rows.update(count=F("count") + count)
+
+
+def count_chunk(rows):
+    """
+    Counts (alert_type_id, date_time_of_alert, latitude, longitude) rows
+    per rollup key.
+
+    Returns:
+        tuple: The counts by key, and a point inside each cell.
+    """
+    counts = Counter()
+    points = {}
+    for alert_type_id, reported_at, latitude, longitude in rows:
+        key = rollup_key(alert_type_id, reported_at, latitude, longitude)
+        if key is not None:
+            counts[key] += 1
+            points.setdefault(key[0], (latitude, longitude))
+    return counts, points
+
+
+def tile_precision(min_latitude, min_longitude, max_latitude, max_longitude):
+    """
+    Longest geohash, up to ROLLUP_CELL_PRECISION, at which the bounding
+    box overlaps at most ALERT_TILE_MAX_CELLS cells (1 if none is short
+    enough).
+    """
+    lat_span = max_latitude - min_latitude
+    lon_span = max_longitude - min_longitude
+    if lon_span < 0:
+        # the box crosses the antimeridian
+        lon_span += 360
+    for precision in range(settings.ROLLUP_CELL_PRECISION, 0, -1):
+        height, width = cell_size_degrees(precision)
+        rows = min(math.floor(lat_span / height) + 2, round(180 / height))
+        columns = min(math.floor(lon_span / width) + 2, round(360 / width))
+        if rows * columns <= settings.ALERT_TILE_MAX_CELLS:
+            return precision
+    return 1
+
+
+def tile_counts(queryset, min_latitude, min_longitude, max_latitude, max_longitude, since, until, precision):
+    """
+    Alert counts per cell of the given geohash length (at most
+    ROLLUP_CELL_PRECISION) within the bounding box and time range, read
+    from the rollup rows alone; hours are whole, so since is rounded down
+    to the hour and until is exclusive.
+
+    Returns:
+        list: One dict per cell, with its centre, total and count per alert type.
+    """
+    rows = queryset.filter(
+        hour__gte=since.replace(minute=0, second=0, microsecond=0),
+        hour__lt=until,
+        latitude__gte=min_latitude,
+        latitude__lte=max_latitude,
+        count__gt=0,
+    )
+    if min_longitude <= max_longitude:
+        rows = rows.filter(longitude__gte=min_longitude, longitude__lte=max_longitude)
+    else:
+        # the box crosses the antimeridian
+        rows = rows.filter(Q(longitude__gte=min_longitude) | Q(longitude__lte=max_longitude))
+
+    cells = {}
+    # any rollup row's centre lies inside the coarser cell it is summed into
+    totals = rows.values(prefix=Substr("cell", 1, precision), alert=F("alert_type")).annotate(
+        total=Sum("count"), latitude=Min("latitude"), longitude=Min("longitude")
+    ).order_by("prefix")
+    for row in totals:
+        cell = cells.get(row["prefix"])
+        if cell is None:
+            latitude, longitude = cell_centre(row["latitude"], row["longitude"], precision)
+            cell = cells[row["prefix"]] = {
+                "cell": row["prefix"],
+                "latitude": latitude,
+                "longitude": longitude,
+                "count": 0,
+                "alert_types": {},
+            }
+        cell["count"] += row["total"]
+        cell["alert_types"][row["alert"]] = row["total"]
+    return list(cells.values())
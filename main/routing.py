@@ -1,6 +1,9 @@
 from django.urls import path
 from . import consumers
 
-urlpatterns = [
+websocket_urlpatterns = [
     path('ws/alerts/', consumers.AlertConsumer.as_asgi()),
-]
\ No newline at end of file
+    path('ws/chatbot/', consumers.ChatConsumer.as_asgi()),
+]
+
+urlpatterns = websocket_urlpatterns
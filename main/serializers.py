@@ -1,36 +1,120 @@
 from rest_framework import serializers
-from .models import Alert, DisasterFeedback, Location, CustomUser, AlertChoices
-from rest_framework.validators import ValidationError
+from .models import Alert, DisasterFeedback, Location, CustomUser, AlertChoices, BroadcastJob, Incident
+from rest_framework.validators import UniqueValidator, ValidationError
 from rest_framework.authtoken.models import Token
-from django.contrib.auth import authenticate, get_user_model
-import openai
 from django.conf import settings
-import google.generativeai as genai
+from django.contrib.auth import authenticate, get_user_model
+from django.db import transaction
+from .outbox import enqueue as enqueue_notifications, registration_messages
+from .phone import normalize_phone
+from datetime import timedelta
 import markdown
 import textwrap
 
-genai.configure(api_key=settings.GOOGLE_API_KEY)
-
 def to_markdown(text):
     text = text.replace('•', '  *')
     return markdown.markdown(textwrap.indent(text, '> ', predicate=lambda _: True))
 
 class AlertSerializer(serializers.ModelSerializer):
-    
+    # km around the alert to broadcast to; defaults to BROADCAST_RADIUS_KM
+    broadcast_radius = serializers.FloatField(write_only=True, required=False, min_value=0.01, max_value=500)
+
     class Meta:
         model = Alert
-        fields = ["alert_type", "description", "location", "first_aid_response"]
+        fields = ["id", "alert_type", "description", "location", "date_time_of_alert", "first_aid_response", "incident", "broadcast_radius"]
+        read_only_fields = ["incident"]
 
     
+class AlertListFilterSerializer(serializers.Serializer):
+    alert_type = serializers.IntegerField(required=False)
+    incident = serializers.IntegerField(required=False)
+    since = serializers.DateTimeField(required=False)  # exclusive, for incremental sync
+    until = serializers.DateTimeField(required=False)
+
+class IncidentListFilterSerializer(serializers.Serializer):
+    alert_type = serializers.IntegerField(required=False)
+    since = serializers.DateTimeField(required=False)  # exclusive, on last_alert_at, for incremental sync
+    active = serializers.BooleanField(default=False)  # only incidents reported within INCIDENT_WINDOW
+
+class DisasterFeedbackListFilterSerializer(serializers.Serializer):
+    alert = serializers.IntegerField(required=False)
+    since = serializers.DateTimeField(required=False)  # exclusive, for incremental sync
+    until = serializers.DateTimeField(required=False)
+
+class NearbyAlertsQuerySerializer(serializers.Serializer):
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+    radius = serializers.FloatField(min_value=0.01, max_value=500, default=10)  # km
+    limit = serializers.IntegerField(min_value=1, max_value=500, default=100)
+
+class AlertTileQuerySerializer(serializers.Serializer):
+    min_latitude = serializers.FloatField(min_value=-90, max_value=90)
+    min_longitude = serializers.FloatField(min_value=-180, max_value=180)
+    max_latitude = serializers.FloatField(min_value=-90, max_value=90)
+    max_longitude = serializers.FloatField(min_value=-180, max_value=180)  # below min_longitude across the antimeridian
+    since = serializers.DateTimeField()
+    until = serializers.DateTimeField()  # exclusive
+    alert_type = serializers.IntegerField(required=False)
+
+    def validate(self, data):
+        if data["min_latitude"] > data["max_latitude"]:
+            raise ValidationError("min_latitude must not exceed max_latitude.")
+        if data["since"] >= data["until"]:
+            raise ValidationError("since must be before until.")
+        if data["until"] - data["since"] > timedelta(days=settings.ALERT_TILE_MAX_DAYS):
+            raise ValidationError(f"since and until must be at most {settings.ALERT_TILE_MAX_DAYS} days apart.")
+        return data
+
+class NearbyAlertSerializer(serializers.ModelSerializer):
+    latitude = serializers.FloatField(source="location.latitude")
+    longitude = serializers.FloatField(source="location.longitude")
+    distance_km = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Alert
+        fields = [
+            "id",
+            "alert_type",
+            "description",
+            "date_time_of_alert",
+            "latitude",
+            "longitude",
+            "distance_km",
+            "first_aid_response",
+        ]
+
+    def get_distance_km(self, obj):
+        return round(self.context["distances"][obj.pk], 3)
+
+class BroadcastJobSerializer(serializers.ModelSerializer):
+    processed_count = serializers.IntegerField(read_only=True)
+    throughput = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = BroadcastJob
+        fields = [
+            "id",
+            "alert",
+            "status",
+            "total_recipients",
+            "sent_count",
+            "failed_count",
+            "processed_count",
+            "throughput",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+
 class DisasterFeedbackSerializer(serializers.ModelSerializer):
     class Meta:
         model = DisasterFeedback
-        fields = ["description", "date_time_of_feedback", "alert"]
+        fields = ["id", "description", "date_time_of_feedback", "alert"]
 
 class LocationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Location
-        fields = ["longitude", "latitude"]
+        fields = ["id", "longitude", "latitude"]
 
     def create(self, validated_data):
         return Location.objects.create(**validated_data)
@@ -40,35 +124,96 @@ class AlertChoicesSerializer(serializers.ModelSerializer):
         model = AlertChoices
         fields = ["id", "emergency_name"]
 
+# Read-only representations with related rows nested. Querysets fed to
+# them must select_related the nested relations (see ALERT_READ_RELATED
+# and FEEDBACK_READ_RELATED) or every row costs extra queries.
+
+ALERT_READ_RELATED = ["alert_type", "location"]
+FEEDBACK_READ_RELATED = ["alert__alert_type", "alert__location"]
+INCIDENT_READ_RELATED = ["alert_type", "location"]
+
+class AlertReadSerializer(serializers.ModelSerializer):
+    alert_type = AlertChoicesSerializer(read_only=True)
+    location = LocationSerializer(read_only=True)
+
+    class Meta:
+        model = Alert
+        fields = ["id", "alert_type", "description", "location", "date_time_of_alert", "first_aid_response", "incident"]
+        read_only_fields = fields
+
+class IncidentSerializer(serializers.ModelSerializer):
+    alert_type = AlertChoicesSerializer(read_only=True)
+    location = LocationSerializer(read_only=True)
+
+    class Meta:
+        model = Incident
+        fields = ["id", "alert_type", "location", "first_alert_at", "last_alert_at", "alert_count", "broadcast_job"]
+        read_only_fields = fields
+
+class DisasterFeedbackReadSerializer(serializers.ModelSerializer):
+    alert = AlertReadSerializer(read_only=True)
+
+    class Meta:
+        model = DisasterFeedback
+        fields = ["id", "description", "date_time_of_feedback", "alert"]
+        read_only_fields = fields
+
 CustomUser = get_user_model()
 
+PHONE_NUMBER_TAKEN = "A user with this phone number already exists."
+
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
-    phone_number = serializers.CharField(max_length=15, required=True)  # Phone number is required
+    phone_number = serializers.CharField(max_length=32, required=True)  # Phone number is required
     fcm_token = serializers.CharField(max_length=255, required=False, allow_blank=True)
 
     class Meta:
         model = CustomUser
         fields = ["username", "phone_number", "password", "fcm_token"]
 
-    def validate(self, attrs):
-        if CustomUser.objects.filter(username=attrs["username"]).exists():
-            raise ValidationError("Username Already Taken")
-        return super().validate(attrs)
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.context.get("defer_unique_checks"):
+            # checked by ataken() instead, for async views
+            fields["username"].validators = [
+                validator for validator in fields["username"].validators if not isinstance(validator, UniqueValidator)
+            ]
+        return fields
+
+    def validate_phone_number(self, value):
+        try:
+            phone_number = normalize_phone(value)
+        except ValueError:
+            raise ValidationError("Enter a valid phone number, including the country code.")
+        if not self.context.get("defer_unique_checks") and CustomUser.objects.filter(phone_number=phone_number).exists():
+            raise ValidationError(PHONE_NUMBER_TAKEN)
+        return phone_number
+
+    async def ataken(self):
+        """
+        The errors for a validated username or phone number already taken,
+        checked through the async ORM when the serializer was created with
+        defer_unique_checks.
+        """
+        errors = {}
+        data = self.validated_data
+        if await CustomUser.objects.filter(username=data["username"]).aexists():
+            errors["username"] = [CustomUser._meta.get_field("username").error_messages["unique"]]
+        if await CustomUser.objects.filter(phone_number=data["phone_number"]).aexists():
+            errors["phone_number"] = [PHONE_NUMBER_TAKEN]
+        return errors
 
     def create(self, validated_data):
         password = validated_data.pop("password")
-        fcm_token = validated_data.pop("fcm_token", None)
+        validated_data["fcm_token"] = validated_data.get("fcm_token") or None
 
         user = CustomUser(**validated_data)
         user.set_password(password)
-        user.save()
-
-        Token.objects.create(user=user)
-
-        if fcm_token:
-            user.fcm_token = fcm_token
+        # the welcome push and OTP are sent from the outbox after commit
+        with transaction.atomic():
             user.save()
+            Token.objects.create(user=user)
+            enqueue_notifications(registration_messages(user))
 
         return user
 
@@ -1,33 +1,11 @@
-from django.db.models.signals import pre_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
 from django.dispatch import receiver
-from .models import CustomUser  
-from django.db.models.signals import post_migrate
-from django.dispatch import receiver
-from .models import AlertChoices
-import pyotp
-
-
-def is_unique(otp):
-    try:
-        CustomUser.objects.get(otp=otp)
-    except CustomUser.DoesNotExist:
-        return True
-    return False
-
-
-def generate_otp():
-    """User otp key generator"""
-    otp = pyotp.random_base32()
-    if is_unique(otp):
-        return otp
-    generate_otp()
-
-
-@receiver(pre_save, sender=CustomUser)
-def create_key(sender, instance, **kwargs):
-    """This creates the key for users that don't have keys"""
-    if not instance.otp:
-        instance.otp = generate_otp()
+from rest_framework.authtoken.models import Token
+from .authentication import token_cache
+from .choices import alert_choices_cache
+from .models import Alert, AlertChoices, CustomUser
+from .rollups import forget_alert, record_alert
 
 
 @receiver(post_migrate)
@@ -41,4 +19,38 @@ def create_default_alert_choices(sender, **kwargs):
             "Medical Emergency"
         ]
         for choice in default_choices:
-            AlertChoices.objects.get_or_create(emergency_name=choice)
\ No newline at end of file
+            AlertChoices.objects.get_or_create(emergency_name=choice)
+
+
+@receiver(post_save, sender=AlertChoices)
+@receiver(post_delete, sender=AlertChoices)
+def invalidate_alert_choices(sender, **kwargs):
+    # after the commit, or another process could reload the old rows
+    # under the new version and keep serving them
+    transaction.on_commit(alert_choices_cache.invalidate)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    # the key is the primary key, which the delete clears from the instance
+    key = instance.key
+    transaction.on_commit(lambda: token_cache.invalidate(key))
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    # covers deactivation and any other change to the cached snapshot
+    if not created:
+        transaction.on_commit(lambda: token_cache.invalidate_user(instance.pk))
+
+
+@receiver(post_save, sender=Alert)
+def count_new_alert(sender, instance, created, **kwargs):
+    if created:
+        record_alert(instance)
+
+
+@receiver(post_delete, sender=Alert)
+def uncount_deleted_alert(sender, instance, **kwargs):
+    # also runs for alerts deleted along with their location or alert type
+    forget_alert(instance)
@@ -0,0 +1,217 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from twilio.http.http_client import TwilioHttpClient
+from twilio.rest import Client
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Blocking token bucket refilled at `rate` tokens per second"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """Takes a token if one is available; otherwise returns the seconds until one will be"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            wait = self.reserve()
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+class RedisTokenBucket(TokenBucket):
+    """
+    The same token bucket kept in a Redis hash, so every process sending
+    from the sender number shares its rate
+    """
+
+    # refills from the time elapsed on the Redis clock, then takes a token
+    # if there is one, atomically
+    SCRIPT = """
+    local rate = tonumber(ARGV[1])
+    local capacity = tonumber(ARGV[2])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+    local tokens = tonumber(state[1]) or capacity
+    local updated_at = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self, url, rate, capacity, key="sms:bucket"):
+        self.client = get_redis(url)
+        self.script = self.client.register_script(self.SCRIPT)
+        self.rate = rate
+        self.capacity = capacity
+        self.key = key
+
+    def reserve(self):
+        return max(float(self.script(keys=[self.key], args=[self.rate, self.capacity])), 0)
+
+
+class SMSDispatcher:
+    """
+    Sends SMS through one shared Twilio client.
+
+    The client keeps a pooled HTTP session, so sends after the first reuse
+    open TLS connections. Sends run on a bounded thread pool and all of them,
+    synchronous or queued, draw from a token bucket sized to the sender
+    number's throughput, kept in Redis when REDIS_URL is set so the limit
+    holds however many processes send.
+    """
+
+    def __init__(self, concurrency, rate, burst, redis_url=None):
+        self.concurrency = concurrency
+        self.bucket = RedisTokenBucket(redis_url, rate, burst) if redis_url else TokenBucket(rate, burst)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="sms")
+        self.lock = threading.Lock()
+        self._client = None
+        self.queue_depth = 0
+        self.sent = 0
+        self.failed = 0
+        self.latencies = deque(maxlen=1000)
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self.lock:
+                if self._client is None:
+                    http_client = TwilioHttpClient(pool_connections=True)
+                    http_client.session.mount(
+                        "https://", HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+                    )
+                    self._client = Client(
+                        settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN, http_client=http_client
+                    )
+        return self._client
+
+    def send(self, phone_number, message):
+        """
+        Sends one SMS, waiting for the rate limiter first.
+
+        Args:
+            phone_number (str): The recipient's phone number.
+            message (str or callable): The SMS message to send, or a function
+                returning it, called once the rate limiter lets the send
+                through (for time-based codes that would expire in a queue).
+
+        Returns:
+            dict: The message SID and status reported by Twilio, and the
+            seconds the Twilio request took (elapsed).
+
+        Raises:
+            TwilioException: If Twilio rejects the message.
+        """
+        self.bucket.acquire()
+        if callable(message):
+            message = message()
+        started = time.monotonic()
+        try:
+            message_response = self.client.messages.create(
+                body=message,
+                from_=settings.TWILIO_PHONE_NUMBER,
+                to=phone_number,
+            )
+        except Exception:
+            with self.lock:
+                self.failed += 1
+            raise
+        elapsed = self._record_sent(started)
+        return {"sid": message_response.sid, "status": message_response.status, "elapsed": elapsed}
+
+    def submit(self, phone_number, message):
+        """Queues an SMS on the dispatcher's pool and returns its future"""
+        with self.lock:
+            self.queue_depth += 1
+        future = self.executor.submit(self.send, phone_number, message)
+        future.add_done_callback(self._dequeued)
+        return future
+
+    def send_many(self, messages):
+        """
+        Sends many SMS concurrently.
+
+        Args:
+            messages (list): (phone_number, message) pairs.
+
+        Returns:
+            list: One boolean per pair, True if Twilio accepted the message.
+        """
+        futures = [self.submit(phone_number, message) for phone_number, message in messages]
+        results = []
+        for (phone_number, _), future in zip(messages, futures):
+            try:
+                future.result()
+                results.append(True)
+            except Exception as e:
+                logger.warning("Failed to send SMS to %s: %s", phone_number, e)
+                results.append(False)
+        return results
+
+    def metrics(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            return {
+                "queue_depth": self.queue_depth,
+                "sent": self.sent,
+                "failed": self.failed,
+                "latency_avg_ms": _ms(sum(latencies) / len(latencies)) if latencies else None,
+                "latency_p95_ms": _ms(latencies[int((len(latencies) - 1) * 0.95)]) if latencies else None,
+                "latency_max_ms": _ms(latencies[-1]) if latencies else None,
+            }
+
+    def _record_sent(self, started):
+        elapsed = time.monotonic() - started
+        with self.lock:
+            self.sent += 1
+            self.latencies.append(elapsed)
+        return elapsed
+
+    def _dequeued(self, future):
+        with self.lock:
+            self.queue_depth -= 1
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+dispatcher = SMSDispatcher(
+    concurrency=settings.SMS_CONCURRENCY,
+    rate=settings.SMS_RATE_LIMIT,
+    burst=settings.SMS_BURST,
+    redis_url=settings.REDIS_URL,
+)
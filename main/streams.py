@@ -0,0 +1,142 @@
+import json
+import threading
+from collections import deque
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .geo import cells_covering_circle, geohash_encode, haversine_km
+from .redis_client import get_redis
+
+# Clients that have not shared a position get every alert; positioned
+# clients get alerts for their own cell plus alerts without coordinates
+# or covering too many cells to send to one by one.
+ALERTS_GROUP = "alerts"
+UNLOCATED_ALERTS_GROUP = "alerts.unlocated"
+
+
+def cell_group(cell):
+    return f"alerts.{cell}"
+
+
+def client_cell(latitude, longitude):
+    return geohash_encode(latitude, longitude, settings.ALERT_STREAM_CELL_PRECISION)
+
+
+def alert_groups(event):
+    """
+    Groups an alert event is sent to: the cells its radius covers, or
+    every positioned client if there are more than ALERT_STREAM_MAX_CELLS
+    of them, since each group is a separate send.
+    """
+    if event["latitude"] is None or event["longitude"] is None:
+        return [ALERTS_GROUP, UNLOCATED_ALERTS_GROUP]
+    cells = cells_covering_circle(
+        event["latitude"], event["longitude"], event["radius_km"], settings.ALERT_STREAM_CELL_PRECISION
+    )
+    if len(cells) > settings.ALERT_STREAM_MAX_CELLS:
+        return [ALERTS_GROUP, UNLOCATED_ALERTS_GROUP]
+    return [ALERTS_GROUP] + [cell_group(cell) for cell in cells]
+
+
+def is_relevant(event, latitude, longitude):
+    """Whether a client at the position should see the event"""
+    if latitude is None or event["latitude"] is None or event["longitude"] is None:
+        return True
+    distance = haversine_km(latitude, longitude, [event["latitude"]], [event["longitude"]])[0]
+    return distance <= event["radius_km"]
+
+
+def alert_event(alert, radius_km):
+    """The JSON-ready event streamed to WebSocket clients for an alert"""
+    location = alert.location
+    return {
+        "type": "alert",
+        "id": alert.pk,
+        "alert_type": alert.alert_type_id,
+        "description": alert.description,
+        "latitude": location.latitude,
+        "longitude": location.longitude,
+        "radius_km": radius_km,
+        "timestamp": alert.date_time_of_alert.isoformat(),
+    }
+
+
+class MemoryEventBuffer:
+    """Per-process ring buffer of the most recent alert events"""
+
+    def __init__(self, size):
+        self.events = deque(maxlen=size)
+        self.floor = None
+        self.lock = threading.Lock()
+
+    def append(self, event):
+        with self.lock:
+            if len(self.events) == self.events.maxlen:
+                self.floor = self.events[0]["id"]
+            self.events.append(event)
+
+    def replay(self, last_seen):
+        with self.lock:
+            events = [event for event in self.events if event["id"] > last_seen]
+            return events, self.floor is None or last_seen >= self.floor
+
+
+class RedisEventBuffer:
+    """Ring buffer of alert events shared by every process through Redis"""
+
+    def __init__(self, url, size, key="alerts:stream"):
+        self.client = get_redis(url)
+        self.size = size
+        self.key = key
+        self.floor_key = f"{key}:floor"
+
+    def append(self, event):
+        pipe = self.client.pipeline()
+        pipe.zadd(self.key, {json.dumps(event): event["id"]})
+        pipe.zcard(self.key)
+        _, count = pipe.execute()
+        overflow = count - self.size
+        if overflow > 0:
+            evicted = self.client.zrange(self.key, 0, overflow - 1, withscores=True)
+            pipe = self.client.pipeline()
+            pipe.zremrangebyrank(self.key, 0, overflow - 1)
+            pipe.set(self.floor_key, int(evicted[-1][1]))
+            pipe.execute()
+
+    def replay(self, last_seen):
+        pipe = self.client.pipeline()
+        pipe.zrangebyscore(self.key, f"({last_seen}", "+inf")
+        pipe.get(self.floor_key)
+        members, floor = pipe.execute()
+        events = [json.loads(member) for member in members]
+        return events, floor is None or last_seen >= int(floor)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_event_buffer():
+    """The alert event buffer, in Redis when REDIS_URL is set and in memory otherwise"""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            if settings.REDIS_URL:
+                _buffer = RedisEventBuffer(settings.REDIS_URL, settings.ALERT_STREAM_BUFFER_SIZE)
+            else:
+                _buffer = MemoryEventBuffer(settings.ALERT_STREAM_BUFFER_SIZE)
+        return _buffer
+
+
+def publish_event(event):
+    """Buffers and sends an event built by alert_event"""
+    get_event_buffer().append(event)
+    async_to_sync(_send_to_groups)(alert_groups(event), {"type": "alert.event", "event": event})
+
+
+async def _send_to_groups(groups, message):
+    channel_layer = get_channel_layer()
+    for group in groups:
+        await channel_layer.group_send(group, message)
@@ -0,0 +1,75 @@
+import json
+import pickle
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from main.authentication import TokenCache, token_cache
+from main.models import CustomUser
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+class TokenCacheTests(APITestCase):
+    """Cached tokens skip the token and user lookup until the token or its user changes"""
+
+    def setUp(self):
+        token_cache.entries.clear()
+        self.user = CustomUser.objects.create_user(username="reader", password="pass")
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def acknowledge(self):
+        return self.client.post("/alerts/1/ack/")
+
+    def test_cached_token_skips_lookup(self):
+        self.assertEqual(self.acknowledge().status_code, 200)
+        # only the view's own UPDATE
+        with self.assertNumQueries(1):
+            self.assertEqual(self.acknowledge().status_code, 200)
+
+    def test_deactivated_user_is_rejected(self):
+        self.acknowledge()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.acknowledge().status_code, 401)
+
+    def test_deleted_token_is_rejected(self):
+        self.acknowledge()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        self.assertEqual(self.acknowledge().status_code, 401)
+
+    def test_redis_snapshot_is_json(self):
+        cache = TokenCache(max_entries=10, ttl=60)
+        cache.client = FakeRedis()
+        self.user.refresh_from_db()
+        cache.set(self.token.key, self.user)
+
+        payload = json.loads(next(iter(cache.client.data.values())))
+        self.assertNotIn(self.user.password, json.dumps(payload))
+        cache.entries.clear()
+        user = cache.get(self.token.key)
+        self.assertEqual((user.pk, user.username, user.date_joined), (self.user.pk, "reader", self.user.date_joined))
+        self.assertEqual(cache.redis_hits, 1)
+
+    def test_non_json_redis_payload_is_a_miss(self):
+        cache = TokenCache(max_entries=10, ttl=60)
+        cache.client = FakeRedis()
+        cache.client.data[cache._redis_key(self.token.key)] = pickle.dumps(("default", ()))
+        self.assertIsNone(cache.get(self.token.key))
+        self.assertEqual(cache.misses, 1)
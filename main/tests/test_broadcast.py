@@ -0,0 +1,122 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from main.broadcast import recipient_chunks, run_broadcast
+from main.models import Alert, AlertChoices, BroadcastJob, CustomUser, Location
+
+
+@mock.patch("main.broadcast.notify", return_value=(1, 0))
+class RunBroadcastTests(APITestCase):
+    """A job is only run by the process holding its lease"""
+
+    def setUp(self):
+        CustomUser.objects.create_user(username="reader", password="pass", fcm_token="token")
+        alert = Alert.objects.create(
+            alert_type=AlertChoices.objects.get(emergency_name="Fire"),
+            location=Location.objects.create(latitude=4.0, longitude=9.7),
+            description="Smoke",
+        )
+        self.job = BroadcastJob.objects.create(alert=alert, message_title="New Alert", message_body="Smoke")
+
+    def test_runs_pending_job(self, notify):
+        self.assertTrue(run_broadcast(self.job.pk))
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, BroadcastJob.STATUS_COMPLETED)
+        self.assertEqual(self.job.sent_count, 1)
+        self.assertEqual(self.job.lease_owner, "")
+        self.assertIsNone(self.job.leased_until)
+
+    def test_skips_job_leased_by_another_process(self, notify):
+        BroadcastJob.objects.filter(pk=self.job.pk).update(
+            status=BroadcastJob.STATUS_RUNNING,
+            lease_owner="other",
+            leased_until=timezone.now() + timedelta(minutes=5),
+        )
+        self.assertFalse(run_broadcast(self.job.pk))
+        notify.assert_not_called()
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, BroadcastJob.STATUS_RUNNING)
+        self.assertEqual(self.job.lease_owner, "other")
+
+    def test_takes_over_expired_lease(self, notify):
+        BroadcastJob.objects.filter(pk=self.job.pk).update(
+            status=BroadcastJob.STATUS_RUNNING,
+            lease_owner="other",
+            leased_until=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertTrue(run_broadcast(self.job.pk))
+        notify.assert_called_once()
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, BroadcastJob.STATUS_COMPLETED)
+
+    def test_skips_completed_job(self, notify):
+        BroadcastJob.objects.filter(pk=self.job.pk).update(status=BroadcastJob.STATUS_COMPLETED)
+        self.assertFalse(run_broadcast(self.job.pk))
+        notify.assert_not_called()
+
+    def test_stops_when_lease_is_lost(self, notify):
+        def steal(*args, **kwargs):
+            BroadcastJob.objects.filter(pk=self.job.pk).update(lease_owner="other")
+            return 1, 0
+
+        notify.side_effect = steal
+        self.assertTrue(run_broadcast(self.job.pk))
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, BroadcastJob.STATUS_RUNNING)
+        self.assertEqual(self.job.sent_count, 0)
+
+
+class RecipientTargetingTests(APITestCase):
+    """Radius broadcasts reach users last seen nearby and users never located"""
+
+    def setUp(self):
+        alert = Alert.objects.create(
+            alert_type=AlertChoices.objects.get(emergency_name="Fire"),
+            location=Location.objects.create(latitude=4.0, longitude=9.7),
+            description="Smoke",
+        )
+        self.job = BroadcastJob.objects.create(
+            alert=alert, message_title="New Alert", message_body="Smoke", radius_km=10
+        )
+
+    def create_user(self, username, latitude=None, longitude=None):
+        location = None
+        if latitude is not None:
+            location = Location.objects.create(latitude=latitude, longitude=longitude)
+        return CustomUser.objects.create_user(
+            username=username, password="pass", fcm_token=f"token-{username}", last_location=location
+        )
+
+    def test_targets_nearby_and_unlocated_users(self):
+        near = self.create_user("near", 4.05, 9.7)
+        unlocated = self.create_user("unlocated")
+        self.create_user("far", 4.5, 9.7)
+
+        chunks = list(recipient_chunks(self.job))
+        self.assertEqual([user.pk for chunk, _ in chunks for user in chunk], [near.pk, unlocated.pk])
+
+    @override_settings(BROADCAST_CHUNK_SIZE=2)
+    def test_drops_users_outside_radius_within_covering_cells(self):
+        # about 15 km east: in a neighbouring cell, but outside the circle
+        outside = self.create_user("outside", 4.0, 9.835)
+        near = self.create_user("near", 4.0, 9.71)
+        last = self.create_user("last")
+
+        chunks = list(recipient_chunks(self.job))
+        self.assertEqual([[user.pk for user in chunk] for chunk, _ in chunks], [[near.pk], [last.pk]])
+        self.assertEqual([skipped for _, skipped in chunks], [1, 0])
+        self.assertNotIn(outside.pk, [user.pk for chunk, _ in chunks for user in chunk])
+
+    @mock.patch("main.broadcast.notify", side_effect=lambda users, *args, **kwargs: (len(users), 0))
+    def test_total_counts_only_users_within_radius(self, notify):
+        self.create_user("outside", 4.0, 9.835)
+        self.create_user("near", 4.0, 9.71)
+        self.create_user("unlocated")
+
+        run_broadcast(self.job.pk)
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.total_recipients, self.job.sent_count), (2, 2))
@@ -0,0 +1,121 @@
+import json
+from unittest import mock
+
+from channels.testing import WebsocketCommunicator
+from django.test import SimpleTestCase, override_settings
+
+from main.consumers import ChatConsumer
+from main.llm import ResponseCache
+
+
+class StubChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubStream:
+    """An async stream of chunks, raising error after them if given"""
+
+    def __init__(self, texts, error=None):
+        self.texts = texts
+        self.error = error
+
+    async def __aiter__(self):
+        for text in self.texts:
+            yield StubChunk(text)
+        if self.error is not None:
+            raise self.error
+
+
+class StubModel:
+    def __init__(self, stream):
+        self.stream = stream
+        self.calls = []
+
+    async def generate_content_async(self, prompt, stream=False):
+        self.calls.append((prompt, stream))
+        return self.stream
+
+
+class ChatStreamTestCase(SimpleTestCase):
+    def use_model(self, texts, error=None):
+        model = StubModel(StubStream(texts, error))
+
+        async def get_model_async(model_name="gemini-1.5-pro"):
+            return model
+
+        for patcher in (
+            mock.patch("main.llm.get_model_async", get_model_async),
+            mock.patch("main.llm.response_cache", ResponseCache(max_entries=10, ttl=60, similarity=0)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return model
+
+
+class ChatbotStreamViewTests(ChatStreamTestCase):
+    """The reply is relayed as Server-Sent Events, ending in a done or error event"""
+
+    async def events(self, message):
+        response = await self.async_client.post(
+            "/chatbot/stream/", {"message": message}, content_type="application/json"
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        return "".join([chunk.decode() async for chunk in response.streaming_content])
+
+    async def test_streams_chunks_then_done(self):
+        model = self.use_model(["Cool ", "the burn"])
+        body = await self.events("How do I treat a burn?")
+        self.assertEqual(body, (
+            'data: {"text": "Cool "}\n\n'
+            'data: {"text": "the burn"}\n\n'
+            "event: done\ndata: {}\n\n"
+        ))
+        self.assertEqual(model.calls, [("User: How do I treat a burn?\nBot:", True)])
+
+    async def test_failure_ends_with_error_event(self):
+        self.use_model(["Cool "], RuntimeError("quota exceeded"))
+        body = await self.events("How do I treat a burn?")
+        self.assertEqual(body, (
+            'data: {"text": "Cool "}\n\n'
+            'event: error\ndata: {"error": "quota exceeded"}\n\n'
+        ))
+
+    async def test_rejects_missing_message(self):
+        response = await self.async_client.post("/chatbot/stream/", {}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class ChatConsumerTests(ChatStreamTestCase):
+    """Each message is answered with chunk frames, then a done or error frame"""
+
+    async def frames(self, *messages, count):
+        communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), "/ws/chatbot/")
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        for message in messages:
+            await communicator.send_to(text_data=message)
+        frames = [json.loads(await communicator.receive_from()) for _ in range(count)]
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+        return frames
+
+    async def test_streams_chunks_then_done(self):
+        self.use_model(["Cool ", "the burn"])
+        frames = await self.frames(json.dumps({"message": "How do I treat a burn?"}), count=3)
+        self.assertEqual(frames, [
+            {"type": "chunk", "text": "Cool "},
+            {"type": "chunk", "text": "the burn"},
+            {"type": "done"},
+        ])
+
+    async def test_failure_sends_error_frame(self):
+        self.use_model([], RuntimeError("quota exceeded"))
+        frames = await self.frames(json.dumps({"message": "How do I treat a burn?"}), count=1)
+        self.assertEqual(frames, [{"type": "error", "error": "quota exceeded"}])
+
+    async def test_rejects_frames_without_message(self):
+        self.use_model(["unused"])
+        frames = await self.frames("not json", json.dumps({"message": "  "}), count=2)
+        self.assertEqual(frames, [{"type": "error", "error": "A message is required."}] * 2)
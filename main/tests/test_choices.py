@@ -0,0 +1,27 @@
+from rest_framework.test import APITestCase
+
+from main.models import AlertChoices
+
+
+class AlertChoicesCacheTests(APITestCase):
+    """Alert choices are served from a cache, and revalidated through their ETag"""
+
+    def test_etag_changes_when_choices_change(self):
+        response = self.client.get("/emergency/choices/")
+        etag = response["ETag"]
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/emergency/choices/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AlertChoices.objects.create(emergency_name="Landslide")
+        response = self.client.get("/emergency/choices/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertIn("Landslide", [choice["emergency_name"] for choice in response.data])
+
+    def test_wildcard_matches_any_version(self):
+        etag = self.client.get("/emergency/choices/")["ETag"]
+        response = self.client.get("/emergency/choices/", HTTP_IF_NONE_MATCH="*")
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(self.client.get("/emergency/choices/", HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
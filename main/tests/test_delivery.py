@@ -0,0 +1,114 @@
+import importlib
+from unittest import mock
+
+from django.apps import apps
+from django.test import TransactionTestCase, override_settings
+from rest_framework.test import APITestCase
+
+from main.delivery import MemoryNotifiedSet, accepts_sms, acknowledge, notify
+from main.models import Alert, AlertChoices, CustomUser, Location, NotificationOutbox
+from main.outbox import claim, deliver
+
+
+def create_alert():
+    return Alert.objects.create(
+        alert_type=AlertChoices.objects.get(emergency_name="Fire"),
+        location=Location.objects.create(latitude=4.0, longitude=9.7),
+        description="Smoke",
+    )
+
+
+class NotifyTests(APITestCase):
+    """Users are notified of an alert once, and fall back to SMS when push does not get through"""
+
+    def setUp(self):
+        patcher = mock.patch("main.delivery._notified", MemoryNotifiedSet(100))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.alert = create_alert()
+        self.texted = CustomUser.objects.create_user(
+            username="texted", password="pass", phone_number="+237650000001", phone_verified=True
+        )
+        self.pushed = CustomUser.objects.create_user(
+            username="pushed", password="pass", fcm_token="token", phone_number="+237650000002", phone_verified=True
+        )
+
+    @mock.patch("main.delivery.sms_dispatcher.send_many", side_effect=lambda messages: [True] * len(messages))
+    @mock.patch("main.delivery.send_multicast", return_value={"failed_tokens": []})
+    def test_notifies_each_user_once(self, send_multicast, send_many):
+        self.assertEqual(notify([self.texted, self.pushed], "Fire", "Smoke", alert=self.alert), (2, 0))
+        self.assertEqual(notify([self.texted, self.pushed], "Fire", "Smoke", alert=self.alert), (0, 0))
+        self.assertEqual([call.args[0] for call in send_many.call_args_list if call.args[0]], [[("+237650000001", "Smoke")]])
+        send_multicast.assert_called_once()
+
+    @mock.patch("main.delivery.sms_dispatcher.send_many", side_effect=lambda messages: [False] * len(messages))
+    def test_unreached_users_are_retried(self, send_many):
+        self.assertEqual(notify([self.texted], "Fire", "Smoke", alert=self.alert), (0, 1))
+        send_many.side_effect = lambda messages: [True] * len(messages)
+        self.assertEqual(notify([self.texted], "Fire", "Smoke", alert=self.alert), (1, 0))
+
+    @mock.patch("main.delivery.sms_dispatcher.send_many", side_effect=lambda messages: [True] * len(messages))
+    @mock.patch("main.delivery.send_multicast", return_value={"failed_tokens": ["token"]})
+    def test_failed_push_falls_back_to_sms_at_once(self, send_multicast, send_many):
+        self.assertEqual(notify([self.pushed], "Fire", "Smoke", alert=self.alert), (1, 0))
+        send_many.assert_called_with([("+237650000002", "Smoke")])
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    @mock.patch("main.delivery.send_multicast", return_value={"failed_tokens": []})
+    def test_delivered_push_gets_no_fallback_by_default(self, send_multicast):
+        self.assertEqual(notify([self.pushed], "Fire", "Smoke", alert=self.alert), (1, 0))
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    @override_settings(PUSH_ACK_DEADLINE=120)
+    @mock.patch("main.delivery.send_multicast", return_value={"failed_tokens": []})
+    def test_delivered_push_holds_back_sms_until_acknowledged(self, send_multicast):
+        notify([self.pushed], "Fire", "Smoke", alert=self.alert)
+        fallback = NotificationOutbox.objects.get()
+        self.assertEqual((fallback.user, fallback.channel), (self.pushed, NotificationOutbox.CHANNEL_SMS))
+
+        self.client.force_authenticate(self.pushed)
+        response = self.client.post(f"/alerts/{self.alert.pk}/ack/")
+        self.assertEqual(response.data, {"cancelled_fallbacks": 1})
+        fallback.refresh_from_db()
+        self.assertEqual(fallback.status, NotificationOutbox.STATUS_CANCELLED)
+
+    def test_unverified_numbers_are_not_texted(self):
+        CustomUser.objects.filter(pk=self.texted.pk).update(phone_verified=False)
+        self.texted.refresh_from_db()
+        self.assertEqual(notify([self.texted], "Fire", "Smoke", alert=self.alert), (0, 1))
+
+
+class AcknowledgedFallbackTests(TransactionTestCase):
+    def test_fallback_acknowledged_after_claim_is_not_sent(self):
+        user = CustomUser.objects.create_user(
+            username="pushed", password="pass", fcm_token="token", phone_number="+237650000002", phone_verified=True
+        )
+        alert = create_alert()
+        fallback = NotificationOutbox.objects.create(
+            user=user, alert=alert, channel=NotificationOutbox.CHANNEL_SMS, body="Smoke"
+        )
+        rows = claim()
+        acknowledge(user, alert.pk)
+
+        with mock.patch("main.sms.dispatcher._client") as client:
+            deliver(rows)
+        client.messages.create.assert_not_called()
+        fallback.refresh_from_db()
+        self.assertEqual((fallback.status, fallback.attempts), (NotificationOutbox.STATUS_CANCELLED, 0))
+
+
+class GrandfatherPhoneNumbersTests(APITestCase):
+    def test_existing_numbers_keep_being_texted_unverified(self):
+        migration = importlib.import_module("main.migrations.0026_grandfather_phone_numbers")
+        existing = CustomUser.objects.create_user(username="existing", password="pass", phone_number="+237650000001")
+        CustomUser.objects.create_user(username="no-number", password="pass")
+
+        migration.grandfather_phone_numbers(apps, None)
+        existing.refresh_from_db()
+        self.assertFalse(existing.phone_verified)
+        self.assertTrue(existing.phone_grandfathered)
+        self.assertTrue(accepts_sms(existing))
+        self.assertEqual(CustomUser.objects.filter(phone_grandfathered=True).count(), 1)
+
+        new = CustomUser.objects.create_user(username="new", password="pass", phone_number="+237650000002")
+        self.assertFalse(accepts_sms(new))
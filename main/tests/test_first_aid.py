@@ -0,0 +1,30 @@
+from unittest import mock
+
+from rest_framework.test import APITestCase
+
+from main.first_aid import fill_first_aid
+from main.models import Alert, AlertChoices, Location
+
+
+@mock.patch("main.first_aid.guide_text", return_value="Stay low")
+class FillFirstAidTests(APITestCase):
+    def create_alert(self, first_aid_response):
+        return Alert.objects.create(
+            alert_type=AlertChoices.objects.get(emergency_name="Fire"),
+            location=Location.objects.create(latitude=4.0, longitude=9.7),
+            description="Smoke",
+            first_aid_response=first_aid_response,
+        )
+
+    def test_fills_missing_and_empty_responses(self, guide_text):
+        for first_aid_response in (None, ""):
+            alert = self.create_alert(first_aid_response)
+            fill_first_aid(alert.pk, alert.alert_type_id, "en")
+            alert.refresh_from_db()
+            self.assertEqual(alert.first_aid_response, "Stay low")
+
+    def test_keeps_existing_response(self, guide_text):
+        alert = self.create_alert("Leave the building")
+        fill_first_aid(alert.pk, alert.alert_type_id, "en")
+        alert.refresh_from_db()
+        self.assertEqual(alert.first_aid_response, "Leave the building")
@@ -0,0 +1,69 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from main.geo import within_radius
+from main.models import Alert, AlertChoices, Location
+
+
+class WithinRadiusTests(APITestCase):
+    """Radius queries prune by geohash range and then check exact distances"""
+
+    def setUp(self):
+        self.fire = AlertChoices.objects.get(emergency_name="Fire")
+
+    def create_alert(self, latitude, longitude):
+        return Alert.objects.create(
+            alert_type=self.fire,
+            location=Location.objects.create(latitude=latitude, longitude=longitude),
+            description="Smoke",
+        )
+
+    def test_finds_points_within_radius(self):
+        near = self.create_alert(4.05, 9.7)  # about 5.6 km north
+        far = self.create_alert(4.2, 9.7)  # about 22 km north
+        self.create_alert(None, None)
+
+        hits = dict(within_radius(Alert.objects.all(), 4.0, 9.7, 10))
+        self.assertEqual(set(hits), {near.pk})
+        self.assertAlmostEqual(hits[near.pk], 5.56, places=1)
+        self.assertIn(far.pk, dict(within_radius(Alert.objects.all(), 4.0, 9.7, 30)))
+
+    def test_finds_points_across_cell_edges(self):
+        # either side of the equator and of the prime meridian
+        hits = [self.create_alert(latitude, longitude) for latitude in (-0.01, 0.01) for longitude in (-0.01, 0.01)]
+        found = within_radius(Alert.objects.all(), 0.0, 0.0, 5)
+        self.assertEqual({pk for pk, _ in found}, {alert.pk for alert in hits})
+
+    def test_prunes_with_range_lookups(self):
+        self.create_alert(4.0, 9.7)
+        with CaptureQueriesContext(connection) as context:
+            within_radius(Alert.objects.all(), 4.0, 9.7, 10)
+        sql = context.captured_queries[0]["sql"]
+        self.assertNotIn("LIKE", sql)
+        self.assertIn('"main_location"."geohash" >=', sql)
+
+    def test_limit_keeps_queryset_order(self):
+        alerts = [self.create_alert(4.0 + i / 1000, 9.7) for i in range(5)]
+        self.create_alert(5.0, 9.7)
+        hits = within_radius(Alert.objects.order_by("-id"), 4.0, 9.7, 10, limit=3)
+        self.assertEqual([pk for pk, _ in hits], [alert.pk for alert in reversed(alerts)][:3])
+
+
+class NearbyAlertsViewTests(APITestCase):
+    def test_returns_nearest_recent_alerts_up_to_limit(self):
+        fire = AlertChoices.objects.get(emergency_name="Fire")
+        alerts = [
+            Alert.objects.create(
+                alert_type=fire, location=Location.objects.create(latitude=4.0, longitude=9.7), description="Smoke"
+            )
+            for _ in range(3)
+        ]
+        Alert.objects.create(
+            alert_type=fire, location=Location.objects.create(latitude=6.0, longitude=9.7), description="Far"
+        )
+
+        response = self.client.get("/alerts/nearby/", {"latitude": 4.0, "longitude": 9.7, "radius": 5, "limit": 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([alert["id"] for alert in response.data], [alerts[2].pk, alerts[1].pk])
+        self.assertEqual(response.data[0]["distance_km"], 0.0)
@@ -0,0 +1,69 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from main.models import CustomUser, NotificationOutbox
+
+
+class ImportUsersTests(APITestCase):
+    """import_users skips duplicates, normalizes numbers and queues codes only for numbers"""
+
+    def setUp(self):
+        CustomUser.objects.create_user(username="existing", password="pass", phone_number="+237650000009")
+
+    def write(self, suffix, content):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, "w", encoding="utf-8") as source:
+            source.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def import_users(self, path):
+        stdout, stderr = StringIO(), StringIO()
+        call_command("import_users", path, workers=1, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def assert_imported(self, stdout, stderr):
+        self.assertIn("Imported 2 users, skipped 4, queued 1 verification codes.", stdout)
+        self.assertEqual(stderr.count("skipped"), 4)
+        self.assertEqual(
+            set(CustomUser.objects.exclude(username="existing").values_list("username", "phone_number")),
+            {("amina", "+237650000001"), ("bello", None)},
+        )
+        self.assertEqual(Token.objects.filter(user__username__in=["amina", "bello"]).count(), 2)
+        self.assertEqual(
+            list(NotificationOutbox.objects.values_list("user__username", "channel", "kind")),
+            [("amina", NotificationOutbox.CHANNEL_SMS, NotificationOutbox.KIND_VERIFICATION)],
+        )
+        amina = CustomUser.objects.get(username="amina")
+        self.assertTrue(amina.check_password("secret"))
+        self.assertFalse(CustomUser.objects.get(username="bello").has_usable_password())
+
+    def test_imports_csv(self):
+        path = self.write(".csv", "\n".join([
+            "username,password,phone_number",
+            "amina,secret,+237 6 50 00 00 01",
+            "bello,,",
+            "amina,secret,+237650000002",  # username repeated in the file
+            "chidi,secret,237650000001x",  # invalid number
+            "dayo,secret,+237650000001",  # number repeated in the file
+            "existing,secret,",  # username in the database
+        ]) + "\n")
+        self.assert_imported(*self.import_users(path))
+
+    def test_imports_jsonl(self):
+        rows = [
+            {"username": "amina", "password": "secret", "phone_number": "+237 650 000 001"},
+            {"username": "bello"},
+            {"username": "amina", "password": "secret"},
+            {"username": "chidi", "password": "secret", "phone_number": "+237 650 000 009"},  # number in the database
+            {"username": "existing"},
+            {"password": "secret"},  # no username
+        ]
+        path = self.write(".jsonl", "\n".join(json.dumps(row) for row in rows) + "\n")
+        self.assert_imported(*self.import_users(path))
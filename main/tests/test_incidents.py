@@ -0,0 +1,80 @@
+from datetime import timedelta
+from unittest import mock
+
+from rest_framework.test import APITestCase
+
+from main.incidents import assign_incident
+from main.models import Alert, AlertChoices, BroadcastJob, Incident, Location
+
+
+class AssignIncidentTests(APITestCase):
+    """Reports of one type close together in space and time share an incident"""
+
+    def setUp(self):
+        self.fire = AlertChoices.objects.get(emergency_name="Fire")
+
+    def report(self, latitude=4.0, longitude=9.7, alert_type=None):
+        alert = Alert.objects.create(
+            alert_type=alert_type or self.fire,
+            location=Location.objects.create(latitude=latitude, longitude=longitude),
+            description="Smoke",
+        )
+        return assign_incident(alert)
+
+    def test_nearby_reports_join_the_first(self):
+        first, opened = self.report()
+        second, joined = self.report(4.005, 9.705)
+        self.assertTrue(opened)
+        self.assertFalse(joined)
+        self.assertEqual(second.pk, first.pk)
+        self.assertEqual(second.alert_count, 2)
+
+    def test_late_report_does_not_move_last_alert_back(self):
+        first, _ = self.report()
+        later = first.last_alert_at
+        alert = Alert.objects.create(
+            alert_type=self.fire, location=Location.objects.create(latitude=4.0, longitude=9.7), description="Smoke"
+        )
+        Alert.objects.filter(pk=alert.pk).update(date_time_of_alert=later - timedelta(minutes=5))
+        alert.refresh_from_db()
+        incident, joined = assign_incident(alert)
+        self.assertFalse(joined)
+        self.assertEqual((incident.pk, incident.alert_count, incident.last_alert_at), (first.pk, 2, later))
+
+    def test_distant_or_different_reports_open_their_own(self):
+        first, _ = self.report()
+        distant, opened = self.report(4.5, 9.7)
+        self.assertTrue(opened)
+        flood, opened = self.report(alert_type=AlertChoices.objects.get(emergency_name="Flood"))
+        self.assertTrue(opened)
+        self.assertEqual(len({first.pk, distant.pk, flood.pk}), 3)
+
+    def test_unlocated_reports_share_one_incident(self):
+        first, opened = self.report(None, None)
+        second, joined = self.report(None, None)
+        self.assertTrue(opened)
+        self.assertFalse(joined)
+        self.assertEqual(second.pk, first.pk)
+        self.assertIsNone(second.location)
+        self.assertEqual(Incident.objects.count(), 1)
+
+    def test_report_racing_another_process_joins_its_incident(self):
+        first, _ = self.report()
+        # the other process's incident was not committed yet when this
+        # report looked for candidates
+        with mock.patch("main.incidents.within_radius", return_value=[]):
+            second, created = self.report(4.0001, 9.7001)
+        self.assertFalse(created)
+        self.assertEqual(second.pk, first.pk)
+        self.assertEqual(second.alert_count, 2)
+        self.assertEqual(Alert.objects.filter(incident=first).count(), 2)
+
+    def test_incident_is_broadcast_once(self):
+        location = Location.objects.create(latitude=4.0, longitude=9.7)
+        payload = {"alert_type": self.fire.pk, "description": "Smoke", "location": location.pk, "broadcast_to_all": True}
+        responses = [self.client.post("/alerts/", payload, format="json") for _ in range(2)]
+        self.assertEqual([response.status_code for response in responses], [201, 201])
+        self.assertEqual(responses[0].data["incident"], responses[1].data["incident"])
+        self.assertIsNotNone(responses[0].data["broadcast_job"])
+        self.assertEqual(responses[0].data["broadcast_job"], responses[1].data["broadcast_job"])
+        self.assertEqual(BroadcastJob.objects.count(), 1)
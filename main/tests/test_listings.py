@@ -0,0 +1,83 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from main.incidents import assign_incident
+from main.models import Alert, AlertChoices, CustomUser, DisasterFeedback, Location
+
+
+class ListingQueryCountTests(APITestCase):
+    """Listings nest related rows through select_related, so a page costs the same queries at any size"""
+
+    def create_alerts(self, count):
+        alert_type = AlertChoices.objects.get(emergency_name="Fire")
+        locations = Location.objects.bulk_create(Location(latitude=4.0, longitude=9.7) for _ in range(count))
+        alerts = Alert.objects.bulk_create(
+            Alert(alert_type=alert_type, location=location, description="Smoke") for location in locations
+        )
+        DisasterFeedback.objects.bulk_create(DisasterFeedback(alert=alert, description="Seen") for alert in alerts)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_alert_listing(self):
+        self.create_alerts(2)
+        queries = self.count_queries("/alerts/?page_size=2")
+        self.create_alerts(40)
+        with self.assertNumQueries(queries):
+            response = self.client.get("/alerts/?page_size=40")
+        self.assertEqual(len(response.data["results"]), 40)
+        self.assertEqual(response.data["results"][0]["alert_type"]["emergency_name"], "Fire")
+
+    def test_feedback_listing(self):
+        self.create_alerts(2)
+        queries = self.count_queries("/resilix/disaster/feedbacks/?page_size=2")
+        self.create_alerts(40)
+        with self.assertNumQueries(queries):
+            response = self.client.get("/resilix/disaster/feedbacks/?page_size=40")
+        self.assertEqual(len(response.data["results"]), 40)
+        self.assertEqual(response.data["results"][0]["alert"]["location"]["latitude"], 4.0)
+
+
+class AlertListFilterTests(APITestCase):
+    """The DRF and async alert listings filter the same way"""
+
+    def test_filters_match_across_views(self):
+        fire = AlertChoices.objects.get(emergency_name="Fire")
+        flood = AlertChoices.objects.get(emergency_name="Flood")
+        location = Location.objects.create(latitude=4.0, longitude=9.7)
+        Alert.objects.bulk_create(
+            Alert(alert_type=alert_type, location=location, description="Report")
+            for alert_type in (fire, flood, fire)
+        )
+
+        for url in ("/alerts/", "/async/alerts/"):
+            with self.subTest(url=url):
+                response = self.client.get(url, {"alert_type": fire.pk})
+                self.assertEqual(response.status_code, 200)
+                results = response.json()["results"]
+                self.assertEqual(len(results), 2)
+                self.assertTrue(all(alert["alert_type"]["id"] == fire.pk for alert in results))
+                self.assertEqual(self.client.get(url, {"since": "not a date"}).status_code, 400)
+
+
+class LocationListTests(APITestCase):
+    """The public location listing only serves where alerts were reported"""
+
+    def test_user_positions_are_not_listed(self):
+        user = CustomUser.objects.create_user(username="reader", password="pass")
+        self.client.force_authenticate(user)
+        response = self.client.post("/user/location/", {"latitude": 3.87, "longitude": 11.52}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.client.force_authenticate(None)
+
+        reported = Location.objects.create(latitude=4.0, longitude=9.7)
+        alert = Alert.objects.create(alert_type=AlertChoices.objects.get(emergency_name="Fire"), location=reported)
+        assign_incident(alert)
+
+        response = self.client.get("/resilix/locations/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([location["id"] for location in response.data["results"]], [reported.pk])
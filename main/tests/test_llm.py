@@ -0,0 +1,42 @@
+from django.test import SimpleTestCase
+
+from main.llm import ResponseCache
+
+
+class ResponseCacheTests(SimpleTestCase):
+    """Similar prompts may only share a reply when they ask for the same first aid"""
+
+    def cache(self, similarity=0.85):
+        return ResponseCache(max_entries=100, ttl=60, similarity=similarity)
+
+    def test_exact_match_only_without_similarity(self):
+        cache = self.cache(similarity=0)
+        cache.set("How do I treat a burn?", "Cool it")
+        self.assertEqual(cache.get("how do I treat a  burn"), "Cool it")
+        self.assertIsNone(cache.get("How do I treat a burn??? please"))
+
+    def test_reuses_reply_for_rephrased_prompt(self):
+        cache = self.cache()
+        cache.set("how do i treat a burn on the left arm", "Cool it")
+        self.assertEqual(cache.get("how do i treat a burn on the left arm?!"), "Cool it")
+        self.assertEqual(cache.get("how do I treat burn on the left arm"), "Cool it")
+
+    def test_rejects_prompts_differing_in_meaning(self):
+        pairs = [
+            ("what to do if a person is conscious after a fall", "what to do if a person is unconscious after a fall"),
+            ("should i make him vomit after poisoning", "should i not make him vomit after poisoning"),
+            ("should i make him vomit after poisoning", "shouldn't i make him vomit after poisoning"),
+            ("how do i treat a burn on the left arm", "how do i treat a burn on the left leg"),
+            ("how do i treat a burn on the left arm", "how do i treat a burn on the right arm"),
+            ("how to do cpr on an adult", "how to do cpr on a child"),
+        ]
+        for cached, asked in pairs:
+            with self.subTest(asked=asked):
+                cache = self.cache(similarity=0.5)
+                cache.set(cached, "reply")
+                self.assertIsNone(cache.get(asked))
+
+    def test_expired_entry_misses(self):
+        cache = ResponseCache(max_entries=100, ttl=-1, similarity=0.85)
+        cache.set("how do i treat a burn", "Cool it")
+        self.assertIsNone(cache.get("how do i treat a burn"))
@@ -0,0 +1,47 @@
+from unittest import mock
+
+import pyotp
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from main.models import CustomUser
+
+
+class OTPSecretProvisioningTests(APITestCase):
+    """Users get a unique OTP secret on insert, with no lookup beforehand"""
+
+    def test_save_provisions_secret_without_lookup(self):
+        with CaptureQueriesContext(connection) as context:
+            user = CustomUser(username="reader")
+            user.save()
+        statements = [query["sql"].split()[0] for query in context]
+        self.assertEqual(statements.count("INSERT"), 1)
+        self.assertNotIn("SELECT", statements)
+        self.assertEqual(len(user.otp), 32)
+
+    def test_bulk_create_provisions_distinct_secrets(self):
+        users = CustomUser.objects.bulk_create(CustomUser(username=f"user{i}") for i in range(50))
+        self.assertEqual(len({user.otp for user in users}), 50)
+        self.assertEqual(CustomUser.objects.filter(otp__isnull=True).count(), 0)
+
+    def test_colliding_secret_is_replaced(self):
+        taken = CustomUser.objects.create_user(username="first", password="pass").otp
+        with mock.patch("main.models.new_otp_secrets", side_effect=[[taken], ["A" * 32]]):
+            user = CustomUser.objects.create_user(username="second", password="pass")
+        self.assertEqual(user.otp, "A" * 32)
+
+    def test_other_integrity_errors_are_not_retried(self):
+        CustomUser.objects.create_user(username="reader", password="pass")
+        with mock.patch("main.models.new_otp_secrets", wraps=lambda count: [pyotp.random_base32()]) as secrets:
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                CustomUser.objects.create_user(username="reader", password="pass")
+        self.assertEqual(secrets.call_count, 1)
+
+    def test_code_with_leading_zero_is_accepted(self):
+        user = CustomUser.objects.create_user(username="reader", password="pass")
+        with mock.patch("pyotp.TOTP.now", return_value="012345"), \
+                mock.patch("pyotp.TOTP.verify", side_effect=lambda otp: otp == "012345"):
+            self.assertTrue(user.authenticate("12345"))
+            self.assertTrue(user.authenticate(" 012345 "))
+            self.assertFalse(user.authenticate("12a45"))
@@ -0,0 +1,131 @@
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from main.models import CustomUser, NotificationOutbox
+from main.outbox import claim, deliver
+
+
+@override_settings(OUTBOX_RETRY_BACKOFF=30, OUTBOX_MAX_ATTEMPTS=3)
+class OutboxDeliveryTests(TransactionTestCase):
+    """Rows are claimed under a lease, sent once by its holder and retried with backoff"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="reader", password="pass", phone_number="+237650000000", phone_verified=True
+        )
+
+    def sms(self, **kwargs):
+        return NotificationOutbox.objects.create(
+            user=self.user, channel=NotificationOutbox.CHANNEL_SMS, body="Flood warning", **kwargs
+        )
+
+    def test_claimed_rows_are_not_claimed_again(self):
+        row = self.sms()
+        self.assertEqual([claimed.pk for claimed in claim()], [row.pk])
+        self.assertEqual(claim(), [])
+
+        NotificationOutbox.objects.filter(pk=row.pk).update(leased_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual([claimed.pk for claimed in claim()], [row.pk])
+
+    def test_rows_not_yet_available_are_not_claimed(self):
+        self.sms(available_at=timezone.now() + timedelta(minutes=1))
+        self.assertEqual(claim(), [])
+
+    @mock.patch("main.outbox.sms_dispatcher.send", return_value={"sid": "SM1", "status": "queued", "elapsed": 0.25})
+    def test_sent_row_records_provider_latency_and_releases_lease(self, send):
+        row = self.sms()
+        deliver(claim())
+        row.refresh_from_db()
+        self.assertEqual(row.status, NotificationOutbox.STATUS_SENT)
+        self.assertEqual(row.attempts, 1)
+        self.assertEqual(row.latency_ms, 250.0)
+        self.assertEqual((row.lease_owner, row.leased_until), ("", None))
+
+    @mock.patch("main.outbox.sms_dispatcher.send", side_effect=RuntimeError("Twilio is down"))
+    def test_failed_row_is_retried_with_backoff_then_failed(self, send):
+        row = self.sms()
+        before = timezone.now()
+        deliver(claim())
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts, row.last_error), (NotificationOutbox.STATUS_PENDING, 1, "Twilio is down"))
+        self.assertGreaterEqual(row.available_at, before + timedelta(seconds=30))
+        self.assertEqual(claim(), [])
+
+        NotificationOutbox.objects.filter(pk=row.pk).update(attempts=2, available_at=timezone.now())
+        deliver(claim())
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), (NotificationOutbox.STATUS_FAILED, 3))
+
+    def test_row_taken_over_before_sending_is_not_sent(self):
+        row = self.sms()
+        rows = claim()
+        NotificationOutbox.objects.filter(pk=row.pk).update(lease_owner="other")
+
+        with mock.patch("main.sms.dispatcher._client") as client:
+            deliver(rows)
+        client.messages.create.assert_not_called()
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts, row.lease_owner), (NotificationOutbox.STATUS_PENDING, 0, "other"))
+
+    def test_outcome_is_not_written_over_a_new_lease(self):
+        row = self.sms()
+
+        def taken_over(phone_number, message):
+            message()
+            NotificationOutbox.objects.filter(pk=row.pk).update(lease_owner="other")
+            return {"sid": "SM1", "status": "queued", "elapsed": 0.1}
+
+        with mock.patch("main.outbox.sms_dispatcher.send", side_effect=taken_over):
+            deliver(claim())
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.lease_owner), (NotificationOutbox.STATUS_PENDING, "other"))
+
+    def test_verification_code_is_read_after_rate_limit(self):
+        NotificationOutbox.objects.create(
+            user=self.user, channel=NotificationOutbox.CHANNEL_SMS, kind=NotificationOutbox.KIND_VERIFICATION
+        )
+        sent = []
+
+        def send(phone_number, message):
+            self.assertTrue(callable(message))
+            verification_message.assert_not_called()
+            sent.append((phone_number, message()))
+            return {"elapsed": 0.1}
+
+        with mock.patch("main.outbox.sms_dispatcher.send", side_effect=send), \
+                mock.patch("main.outbox.verification_message", return_value="Your code is 01234") as verification_message:
+            deliver(claim())
+        self.assertEqual(sent, [("+237650000000", "Your code is 01234")])
+
+    @mock.patch("main.outbox.publish_event")
+    def test_stream_rows_are_published_in_order(self, publish_event):
+        rows = NotificationOutbox.objects.bulk_create(
+            NotificationOutbox(channel=NotificationOutbox.CHANNEL_STREAM, payload={"id": i}) for i in range(5)
+        )
+        deliver(claim())
+        self.assertEqual([call.args[0]["id"] for call in publish_event.call_args_list], list(range(5)))
+        self.assertEqual(
+            set(NotificationOutbox.objects.filter(pk__in=[row.pk for row in rows]).values_list("status", flat=True)),
+            {NotificationOutbox.STATUS_SENT},
+        )
+
+    def test_channel_threads_refresh_their_connection_around_each_row(self):
+        self.sms()
+        events = []
+
+        def record(event):
+            def side_effect(*args, **kwargs):
+                events.append((event, threading.current_thread().name))
+                return {"elapsed": 0.1}
+            return side_effect
+
+        with mock.patch("main.outbox.close_old_connections", side_effect=record("close")), \
+                mock.patch("main.outbox.sms_dispatcher.send", side_effect=record("send")):
+            deliver(claim())
+        self.assertEqual([event for event, _ in events], ["close", "send", "close"])
+        self.assertTrue(all(thread.startswith("outbox-sms") for _, thread in events))
+        self.assertEqual(NotificationOutbox.objects.get().status, NotificationOutbox.STATUS_SENT)
@@ -0,0 +1,67 @@
+from unittest import mock
+
+import pyotp
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from main.authentication import token_cache
+from main.models import CustomUser
+from main.phone import MemoryAttemptLimiter
+
+
+def current_code(user):
+    return pyotp.TOTP(user.otp, interval=300).now()
+
+
+class VerifyPhoneTests(APITestCase):
+    """Verification matches normalized numbers and limits attempts per number"""
+
+    def setUp(self):
+        patcher = mock.patch("main.phone._limiter", MemoryAttemptLimiter(limit=3, window=900))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = CustomUser.objects.create_user(username="reader", password="pass", phone_number="+237650000001")
+
+    def verify(self, phone_number, otp_code, url="/verify_phone/"):
+        return self.client.post(url, {"phone_number": phone_number, "otp_code": otp_code}, format="json")
+
+    def test_verifies_number_in_any_spelling(self):
+        for url in ("/verify_phone/", "/async/verify_phone/"):
+            with self.subTest(url=url):
+                CustomUser.objects.filter(pk=self.user.pk).update(phone_verified=False)
+                response = self.verify("+237 6 50 00 00 01", current_code(self.user), url)
+                self.assertEqual(response.status_code, 200)
+                self.user.refresh_from_db()
+                self.assertTrue(self.user.phone_verified)
+
+    def test_rejects_wrong_code_and_unknown_number(self):
+        code = current_code(self.user)
+        wrong = str((int(code) + 1) % 10 ** len(code)).zfill(len(code))
+        for url in ("/verify_phone/", "/async/verify_phone/"):
+            with self.subTest(url=url):
+                self.assertEqual(self.verify("+237650000001", wrong, url).status_code, 400)
+                self.assertEqual(self.verify("+237650000009", code, url).status_code, 404)
+                self.assertEqual(self.verify("", code, url).status_code, 400)
+                self.user.refresh_from_db()
+                self.assertFalse(self.user.phone_verified)
+
+    def test_limits_attempts_per_number(self):
+        for _ in range(3):
+            self.assertEqual(self.verify("+237650000001", "000000x").status_code, 400)
+        response = self.verify("+237 650 000 001", current_code(self.user))
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
+        # other numbers keep their own allowance
+        self.assertEqual(self.verify("+237650000009", "123456").status_code, 404)
+
+    def test_verifies_number_stored_as_entered(self):
+        # a number migration 0021 could not normalize without a default region
+        CustomUser.objects.filter(pk=self.user.pk).update(phone_number="650000001")
+        self.assertEqual(self.verify("650000001", current_code(self.user)).status_code, 200)
+        self.assertEqual(self.verify("650000002", current_code(self.user)).status_code, 400)
+
+    def test_async_verification_refreshes_cached_token(self):
+        token = Token.objects.create(user=self.user)
+        token_cache.entries[token.key] = object()
+        self.assertEqual(self.verify("+237650000001", current_code(self.user), "/async/verify_phone/").status_code, 200)
+        self.assertNotIn(token.key, token_cache.entries)
@@ -0,0 +1,70 @@
+from unittest import mock
+
+from django.test import override_settings
+from pyfcm.errors import FCMNotRegisteredError, FCMServerError
+from rest_framework.test import APITestCase
+
+from main.models import CustomUser
+from main.push import DELIVERED, INVALID, prune_invalid_tokens, send_multicast, send_one
+
+
+@override_settings(FCM_BATCH_SIZE=2, FCM_MAX_RETRIES=2, FCM_RETRY_BACKOFF=0.5)
+class SendMulticastTests(APITestCase):
+    """Tokens are sent in batches, transient failures retried and invalid tokens pruned"""
+
+    def setUp(self):
+        self.fcm = mock.Mock()
+        patcher = mock.patch("main.push.get_fcm", return_value=self.fcm)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch("main.push.time.sleep")
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fail_for(self, errors):
+        """Makes notify raise the next error queued for the token, if any"""
+        def notify(fcm_token, **kwargs):
+            if errors.get(fcm_token):
+                raise errors[fcm_token].pop(0)
+        self.fcm.notify.side_effect = notify
+
+    def test_batches_and_prunes_invalid_tokens(self):
+        users = [
+            CustomUser.objects.create_user(username=f"user{i}", password="pass", fcm_token=f"token{i}")
+            for i in range(5)
+        ]
+        self.fail_for({"token1": [FCMNotRegisteredError("gone")], "token4": [FCMNotRegisteredError("gone")]})
+
+        with mock.patch("main.push.prune_invalid_tokens", wraps=prune_invalid_tokens) as prune:
+            result = send_multicast([user.fcm_token for user in users] + ["token0", ""], "Fire", "Smoke")
+
+        self.assertEqual(self.fcm.notify.call_count, 5)
+        # one update per batch of two with an invalid token in it
+        self.assertEqual([call.args[0] for call in prune.call_args_list], [["token1"], ["token4"]])
+        self.assertEqual((result["success"], result["failure"]), (3, 2))
+        self.assertEqual(result["invalid_tokens"], ["token1", "token4"])
+        self.assertEqual(
+            list(CustomUser.objects.filter(fcm_token__isnull=True).values_list("username", flat=True).order_by("pk")),
+            ["user1", "user4"],
+        )
+
+    def test_retries_server_errors_with_backoff(self):
+        self.fail_for({"token": [FCMServerError("unavailable"), FCMServerError("unavailable")]})
+        self.assertEqual(send_one("token", "Fire", "Smoke"), DELIVERED)
+        self.assertEqual(self.fcm.notify.call_count, 3)
+        self.assertEqual(self.sleep.call_count, 2)
+        first, second = (call.args[0] for call in self.sleep.call_args_list)
+        self.assertTrue(0.25 <= first <= 0.75 and 0.5 <= second <= 1.5)
+
+    def test_gives_up_after_max_retries(self):
+        self.fail_for({"token": [FCMServerError("unavailable")] * 5})
+        result = send_multicast(["token"], "Fire", "Smoke")
+        self.assertEqual(self.fcm.notify.call_count, 3)
+        self.assertEqual((result["failure"], result["failed_tokens"], result["invalid_tokens"]), (1, ["token"], []))
+
+    def test_send_one_prunes_invalid_token(self):
+        user = CustomUser.objects.create_user(username="reader", password="pass", fcm_token="token")
+        self.fail_for({"token": [FCMNotRegisteredError("gone")]})
+        self.assertEqual(send_one("token", "Fire", "Smoke"), INVALID)
+        user.refresh_from_db()
+        self.assertIsNone(user.fcm_token)
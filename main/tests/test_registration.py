@@ -0,0 +1,76 @@
+from unittest import mock
+
+from django.db import DatabaseError
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from main.models import CustomUser, NotificationOutbox
+from main.outbox import enqueue
+
+SIGNUP_URLS = ("/user/signup/", "/async/user/signup/")
+
+
+class RegistrationTests(APITestCase):
+    """The DRF and async signups accept and reject the same registrations"""
+
+    def signup(self, url, username="reader", phone_number="+237 6 50 00 00 01"):
+        return self.client.post(
+            url, {"username": username, "phone_number": phone_number, "password": "pass"}, format="json"
+        )
+
+    def test_registers_normalized_number(self):
+        for index, url in enumerate(SIGNUP_URLS):
+            with self.subTest(url=url):
+                response = self.signup(url, f"reader{index}", f"+237 6 50 00 00 0{index}")
+                self.assertEqual(response.status_code, 201)
+                self.assertEqual(CustomUser.objects.get(username=f"reader{index}").phone_number, f"+23765000000{index}")
+
+    def test_rejects_taken_username_and_number(self):
+        CustomUser.objects.create_user(username="reader", password="pass", phone_number="+237650000001")
+        for url in SIGNUP_URLS:
+            with self.subTest(url=url):
+                response = self.signup(url)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(set(response.json()), {"username", "phone_number"})
+                self.assertEqual(self.signup(url, "other", "not a number").status_code, 400)
+        self.assertEqual(CustomUser.objects.count(), 1)
+
+
+class RegistrationOutboxTests(APITestCase):
+    """Registration writes the user, its token and its notifications together"""
+
+    def signup(self):
+        return self.client.post(
+            "/user/signup/",
+            {"username": "reader", "phone_number": "+237650000001", "password": "pass", "fcm_token": "token"},
+            format="json",
+        )
+
+    def test_queues_welcome_push_and_verification_sms(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(self.signup().status_code, 201)
+        user = CustomUser.objects.get(username="reader")
+        self.assertTrue(Token.objects.filter(user=user).exists())
+        self.assertEqual(
+            sorted(NotificationOutbox.objects.filter(user=user).values_list("channel", "kind")),
+            [
+                (NotificationOutbox.CHANNEL_PUSH, NotificationOutbox.KIND_MESSAGE),
+                (NotificationOutbox.CHANNEL_SMS, NotificationOutbox.KIND_VERIFICATION),
+            ],
+        )
+        # dispatched only once the registration commits
+        self.assertEqual(len(callbacks), 1)
+
+    def test_failed_registration_queues_nothing(self):
+        def enqueue_then_fail(messages):
+            enqueue(messages)
+            raise DatabaseError("connection lost")
+
+        self.client.raise_request_exception = False
+        with self.captureOnCommitCallbacks() as callbacks, \
+                mock.patch("main.serializers.enqueue_notifications", side_effect=enqueue_then_fail):
+            self.assertEqual(self.signup().status_code, 500)
+        self.assertFalse(CustomUser.objects.exists())
+        self.assertFalse(Token.objects.exists())
+        self.assertFalse(NotificationOutbox.objects.exists())
+        self.assertEqual(callbacks, [])
@@ -0,0 +1,90 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from main.models import Alert, AlertChoices, AlertRollup, Location
+
+
+class AlertRollupTests(APITestCase):
+    """Rollup rows follow alerts as they are created and deleted"""
+
+    def setUp(self):
+        self.fire = AlertChoices.objects.get(emergency_name="Fire")
+
+    def report(self, latitude=4.0, longitude=9.7, alert_type=None):
+        return Alert.objects.create(
+            alert_type=alert_type or self.fire,
+            location=Location.objects.create(latitude=latitude, longitude=longitude),
+            description="Smoke",
+        )
+
+    def counts(self):
+        return sorted(AlertRollup.objects.values_list("alert_type__emergency_name", "count"))
+
+    def test_created_alerts_are_counted(self):
+        self.report()
+        self.report(4.001, 9.701)
+        self.report(alert_type=AlertChoices.objects.get(emergency_name="Flood"))
+        self.report(None, None)
+        self.assertEqual(self.counts(), [("Fire", 2), ("Flood", 1)])
+
+    def test_deleted_alerts_are_uncounted(self):
+        first = self.report()
+        second = self.report()
+        first.delete()
+        self.assertEqual(self.counts(), [("Fire", 1)])
+        # deleted along with their location
+        second.location.delete()
+        self.assertEqual(self.counts(), [("Fire", 0)])
+
+    def test_backfill_matches_counts_on_insert(self):
+        for latitude in (4.0, 4.001, 5.0):
+            self.report(latitude)
+        counted = sorted(AlertRollup.objects.values_list("cell", "hour", "alert_type", "count"))
+        call_command("backfill_alert_rollups", stdout=StringIO())
+        self.assertEqual(sorted(AlertRollup.objects.values_list("cell", "hour", "alert_type", "count")), counted)
+
+
+class AlertTilesViewTests(APITestCase):
+    def setUp(self):
+        fire = AlertChoices.objects.get(emergency_name="Fire")
+        for latitude, longitude in ((4.0, 9.7), (4.001, 9.701), (4.5, 9.7), (-4.0, -60.0)):
+            Alert.objects.create(
+                alert_type=fire, location=Location.objects.create(latitude=latitude, longitude=longitude)
+            )
+        self.fire = fire
+        now = timezone.now()
+        self.window = {"since": (now - timedelta(hours=1)).isoformat(), "until": (now + timedelta(hours=1)).isoformat()}
+
+    def tiles(self, **params):
+        return self.client.get("/alerts/tiles/", params | self.window)
+
+    def test_counts_cells_in_the_box(self):
+        response = self.tiles(min_latitude=3, min_longitude=9, max_latitude=5, max_longitude=10)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["precision"], 5)
+        cells = sorted(response.data["cells"], key=lambda cell: cell["count"])
+        self.assertEqual([cell["count"] for cell in cells], [1, 2])
+        self.assertEqual(cells[1]["alert_types"], {self.fire.pk: 2})
+
+    @override_settings(ALERT_TILE_MAX_CELLS=100)
+    def test_wide_boxes_are_counted_in_coarser_cells(self):
+        response = self.tiles(min_latitude=-90, min_longitude=-180, max_latitude=90, max_longitude=180)
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(response.data["precision"], 5)
+        self.assertEqual(sum(cell["count"] for cell in response.data["cells"]), 4)
+        for cell in response.data["cells"]:
+            self.assertEqual(len(cell["cell"]), response.data["precision"])
+
+    @override_settings(ALERT_TILE_MAX_DAYS=7)
+    def test_long_time_ranges_are_rejected(self):
+        now = timezone.now()
+        response = self.client.get("/alerts/tiles/", {
+            "min_latitude": 3, "min_longitude": 9, "max_latitude": 5, "max_longitude": 10,
+            "since": (now - timedelta(days=8)).isoformat(), "until": now.isoformat(),
+        })
+        self.assertEqual(response.status_code, 400)
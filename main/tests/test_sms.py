@@ -0,0 +1,82 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+from twilio.base.exceptions import TwilioRestException
+
+from main.sms import SMSDispatcher, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        for name in ("monotonic", "sleep"):
+            patcher = mock.patch(f"main.sms.time.{name}", side_effect=getattr(self.clock, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_allows_a_burst_then_the_rate(self):
+        bucket = TokenBucket(rate=2, capacity=3)
+        self.assertEqual([bucket.reserve() for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(bucket.reserve(), 0.5)
+        self.clock.now += 0.5
+        self.assertEqual(bucket.reserve(), 0)
+        # refills stop at the capacity
+        self.clock.now += 60
+        self.assertEqual([bucket.reserve() for _ in range(3)], [0, 0, 0])
+        self.assertGreater(bucket.reserve(), 0)
+
+    def test_acquire_waits_for_a_token(self):
+        bucket = TokenBucket(rate=4, capacity=1)
+        started = self.clock.now
+        for _ in range(5):
+            bucket.acquire()
+        self.assertAlmostEqual(self.clock.now - started, 1.0)
+
+
+class SMSDispatcherTests(SimpleTestCase):
+    def setUp(self):
+        self.dispatcher = SMSDispatcher(concurrency=4, rate=1000, burst=1000)
+        self.dispatcher._client = mock.Mock()
+        self.addCleanup(self.dispatcher.executor.shutdown)
+
+    def test_send_many_reports_each_result(self):
+        def create(body, from_, to):
+            if to == "+237650000002":
+                raise TwilioRestException(400, "https://api.twilio.com", "Invalid number")
+            return mock.Mock(sid=f"SM{to[-1]}", status="queued")
+
+        self.dispatcher._client.messages.create.side_effect = create
+        results = self.dispatcher.send_many([
+            ("+237650000001", "Flood"), ("+237650000002", "Flood"), ("+237650000003", lambda: "Fire"),
+        ])
+        self.assertEqual(results, [True, False, True])
+        bodies = sorted(call.kwargs["body"] for call in self.dispatcher._client.messages.create.call_args_list)
+        self.assertEqual(bodies, ["Fire", "Flood", "Flood"])
+
+        # the done callbacks that count down queue_depth run on the pool
+        self.dispatcher.executor.shutdown(wait=True)
+        metrics = self.dispatcher.metrics()
+        self.assertEqual((metrics["sent"], metrics["failed"], metrics["queue_depth"]), (2, 1, 0))
+        self.assertIsNotNone(metrics["latency_p95_ms"])
+
+    def test_queue_depth_counts_unfinished_sends(self):
+        release = threading.Event()
+        self.dispatcher._client.messages.create.side_effect = lambda **kwargs: release.wait() and mock.Mock()
+        futures = [self.dispatcher.submit(f"+23765000000{i}", "Flood") for i in range(6)]
+        self.assertEqual(self.dispatcher.metrics()["queue_depth"], 6)
+        release.set()
+        self.dispatcher.executor.shutdown(wait=True)
+        self.assertEqual(self.dispatcher.metrics()["queue_depth"], 0)
+        self.assertEqual(self.dispatcher.metrics()["sent"], 6)
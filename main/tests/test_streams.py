@@ -0,0 +1,90 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APITestCase
+
+from main.consumers import AlertConsumer
+from main.streams import ALERTS_GROUP, UNLOCATED_ALERTS_GROUP, MemoryEventBuffer, alert_groups
+
+
+def event(radius_km, latitude=4.0, longitude=9.7):
+    return {"id": 1, "latitude": latitude, "longitude": longitude, "radius_km": radius_km}
+
+
+class AlertGroupsTests(APITestCase):
+    def test_small_radius_goes_to_covering_cells(self):
+        groups = alert_groups(event(10))
+        self.assertEqual(groups[0], ALERTS_GROUP)
+        self.assertNotIn(UNLOCATED_ALERTS_GROUP, groups)
+        self.assertTrue(all(group.startswith("alerts.") for group in groups[1:]))
+        self.assertLessEqual(len(groups) - 1, 9)
+
+    @override_settings(ALERT_STREAM_MAX_CELLS=64)
+    def test_wide_radius_goes_to_every_positioned_client(self):
+        self.assertEqual(alert_groups(event(500)), [ALERTS_GROUP, UNLOCATED_ALERTS_GROUP])
+
+    def test_unlocated_alert_goes_to_everyone(self):
+        self.assertEqual(alert_groups(event(10, None, None)), [ALERTS_GROUP, UNLOCATED_ALERTS_GROUP])
+
+    def test_broadcast_radius_is_capped(self):
+        response = self.client.post(
+            "/alerts/", {"alert_type": 1, "description": "Smoke", "broadcast_radius": 2000}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("broadcast_radius", response.data)
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class AlertConsumerTests(SimpleTestCase):
+    def test_delivers_late_events_once(self):
+        async def scenario():
+            communicator = WebsocketCommunicator(AlertConsumer.as_asgi(), "/ws/alerts/")
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            channel_layer = get_channel_layer()
+            for alert_id in (2, 1, 2):
+                await channel_layer.group_send(
+                    ALERTS_GROUP, {"type": "alert.event", "event": event(10) | {"id": alert_id}}
+                )
+            received = [(await communicator.receive_json_from())["id"] for _ in range(2)]
+            self.assertTrue(await communicator.receive_nothing())
+            await communicator.disconnect()
+            return received
+
+        self.assertEqual(async_to_sync(scenario)(), [2, 1])
+
+    def connect_and_receive(self, path, count):
+        async def scenario():
+            communicator = WebsocketCommunicator(AlertConsumer.as_asgi(), path)
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            received = [await communicator.receive_json_from() for _ in range(count)]
+            self.assertTrue(await communicator.receive_nothing())
+            await communicator.disconnect()
+            return received
+
+        return async_to_sync(scenario)()
+
+    def use_buffer(self, size, alert_ids):
+        buffer = MemoryEventBuffer(size)
+        for alert_id in alert_ids:
+            buffer.append(event(10) | {"id": alert_id})
+        patcher = mock.patch("main.streams._buffer", buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_replays_events_after_last_seen(self):
+        self.use_buffer(5, range(1, 5))
+        received = self.connect_and_receive("/ws/alerts/?last_seen=2", 2)
+        self.assertEqual([message["id"] for message in received], [3, 4])
+
+    def test_asks_to_resync_once_buffer_rolled_past_last_seen(self):
+        self.use_buffer(3, range(1, 7))
+        received = self.connect_and_receive("/ws/alerts/?last_seen=2", 4)
+        self.assertEqual(received[0], {"type": "resync", "last_seen": 2})
+        self.assertEqual([message["id"] for message in received[1:]], [4, 5, 6])
+        # a cursor the buffer still reaches needs no resync
+        self.assertEqual([message["id"] for message in self.connect_and_receive("/ws/alerts/?last_seen=3", 3)], [4, 5, 6])
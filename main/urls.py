@@ -7,16 +7,48 @@ from .views import (
     UserRegistration,
     UserLogin,
     AlertListCreateView,
-    ChatbotAPIView
+    AlertAcknowledgeView,
+    ChatbotAPIView,
+    BroadcastJobDetailView,
+    IncidentListView,
+    IncidentDetailView,
+    NearbyAlertsView,
+    AlertTilesView,
+    UserLocationView,
+    SMSMetricsView,
+    OutboxMetricsView,
+    ChatbotCacheMetricsView,
+    TokenCacheMetricsView,
+    ChatbotStreamView,
+    AsyncChatbotView,
+    AsyncUserRegistration,
+    AsyncVerifyPhoneView,
+    AsyncAlertListCreateView,
 )
 
 urlpatterns = [
     path("user/signup/", UserRegistration.as_view(), name="user-registration"),
+    path("user/location/", UserLocationView.as_view(), name="user-location"),
     path("login/", UserLogin.as_view(), name="login"),
+    path("login/metrics/", TokenCacheMetricsView.as_view(), name="token-cache-metrics"),
     path("resilix/disaster/feedbacks/", ListDisasterFeedback.as_view(), name="feedbacks"),
     path("resilix/locations/", ListLocations.as_view(), name="locations"),
     path("emergency/choices/", EmergencyAlertChoicesView.as_view(), name="create-emergency"),
     path("alerts/", AlertListCreateView.as_view(), name="alert-list-create"),
+    path("alerts/nearby/", NearbyAlertsView.as_view(), name="alerts-nearby"),
+    path("alerts/tiles/", AlertTilesView.as_view(), name="alert-tiles"),
+    path("alerts/<int:pk>/ack/", AlertAcknowledgeView.as_view(), name="alert-acknowledge"),
+    path("incidents/", IncidentListView.as_view(), name="incident-list"),
+    path("incidents/<int:pk>/", IncidentDetailView.as_view(), name="incident-detail"),
+    path("alerts/broadcasts/<int:pk>/", BroadcastJobDetailView.as_view(), name="broadcast-job-detail"),
     path("verify_phone/", VerifyPhoneView.as_view(), name="verify-phone"),
+    path("notifications/sms/metrics/", SMSMetricsView.as_view(), name="sms-metrics"),
+    path("notifications/outbox/metrics/", OutboxMetricsView.as_view(), name="outbox-metrics"),
     path("chatbot/", ChatbotAPIView.as_view(), name="chatbot-api"),
+    path("chatbot/stream/", ChatbotStreamView.as_view(), name="chatbot-stream"),
+    path("chatbot/metrics/", ChatbotCacheMetricsView.as_view(), name="chatbot-metrics"),
+    path("async/user/signup/", AsyncUserRegistration.as_view(), name="async-user-registration"),
+    path("async/verify_phone/", AsyncVerifyPhoneView.as_view(), name="async-verify-phone"),
+    path("async/alerts/", AsyncAlertListCreateView.as_view(), name="async-alert-list-create"),
+    path("async/chatbot/", AsyncChatbotView.as_view(), name="async-chatbot-api"),
 ]
@@ -1,31 +1,8 @@
-from pyfcm import FCMNotification
-from django.conf import settings
-from twilio.rest import Client
-from twilio.base.exceptions import TwilioException
+import pyotp
 
-def send_push_notification(registration_ids, message_title, message_body):
-    """
-    Sends a push notification to the given registration IDs using FCM.
+from .delivery import notify
+from .sms import dispatcher
 
-    Args:
-        registration_ids (list): List of device registration IDs to send the notification to.
-        message_title (str): Title of the push notification.
-        message_body (str): Body text of the push notification.
-
-    Returns:
-        dict: Result of the notification request.
-    """
-    try:
-        push_service = FCMNotification(api_key=settings.FCM_SERVER_KEY)
-        result = push_service.notify_multiple_devices(
-            registration_ids=registration_ids,
-            message_title=message_title,
-            message_body=message_body
-        )
-        return result
-    except Exception as e:
-        print(f"Error sending push notification: {str(e)}")
-        return {"success": 0, "error": str(e)}
 
 def send_sms_notification(phone_number, message):
     """
@@ -38,14 +15,27 @@ def send_sms_notification(phone_number, message):
     Returns:
         dict: Result of the SMS request.
     """
-    try:
-        client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-        message_response = client.messages.create(
-            body=message,
-            from_=settings.TWILIO_PHONE_NUMBER,
-            to=phone_number,
-        )
-        return {"sid": message_response.sid, "status": message_response.status}
-    except TwilioException as e:
-        print(f"Error sending SMS notification: {str(e)}")
-        return {"success": 0, "error": str(e)}
+    return dispatcher.send(phone_number, message)
+
+
+def verification_message(otp_secret):
+    """The SMS carrying the user's current 5-minute verification code"""
+    return "Your verification code is " + pyotp.TOTP(otp_secret, interval=300).now()
+
+
+def send_notifications(user, message_title, message_body, alert=None):
+    """
+    Notifies a single user on the channels their preferences allow, by
+    push with an SMS fallback or by SMS alone.
+
+    Args:
+        user (CustomUser): The recipient.
+        message_title (str): Title of the push notification.
+        message_body (str): Body text of the notification.
+        alert (Alert, optional): The alert being notified; the user is not notified of it twice.
+
+    Returns:
+        bool: True if the user was reached.
+    """
+    reached, _ = notify([user], message_title, message_body, alert=alert)
+    return reached == 1
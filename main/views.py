@@ -1,18 +1,21 @@
-import os
 import json
-import requests
-from pyfcm import FCMNotification
+import math
+from datetime import timedelta
 from django.conf import settings
-from twilio.rest import Client
-import pyotp
+from django.db.models import Exists, OuterRef
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.utils.http import parse_etags
+from django.utils.translation import get_language_from_request
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework.views import APIView
+from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework import status, generics
-from rest_framework.decorators import authentication_classes, permission_classes
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from asgiref.sync import sync_to_async
 from .serializers import (
     AlertSerializer,
     DisasterFeedbackSerializer,
@@ -21,70 +24,109 @@ from .serializers import (
     UserLoginSerializer,
     AlertChoicesSerializer,
     ChatMessageSerializer,
+    BroadcastJobSerializer,
+    NearbyAlertsQuerySerializer,
+    AlertTileQuerySerializer,
+    NearbyAlertSerializer,
+    AlertListFilterSerializer,
+    DisasterFeedbackListFilterSerializer,
+    AlertReadSerializer,
+    DisasterFeedbackReadSerializer,
+    IncidentSerializer,
+    IncidentListFilterSerializer,
+    ALERT_READ_RELATED,
+    FEEDBACK_READ_RELATED,
+    INCIDENT_READ_RELATED,
 )
-from .models import Alert, DisasterFeedback, Location, AlertChoices, CustomUser
+from .models import Alert, AlertRollup, CustomUser, DisasterFeedback, Location, BroadcastJob, Incident
 from rest_framework.authtoken.models import Token
-from .serializers import ChatMessageSerializer
-import google.generativeai as genai
-from django.conf import settings
-
-genai.configure(api_key=settings.GOOGLE_API_KEY)
-
-def fetch_service_account_file(url):
-    response = requests.get(url)
-    response.raise_for_status()  
-    return response.json()
-
-def initialize_fcm():
-    service_account_url = settings.FCM_SERVICE_ACCOUNT_URL  
-    service_account_info = fetch_service_account_file(service_account_url)
-    project_id = service_account_info.get("project_id")
-    return FCMNotification(service_account_file=None, credentials=service_account_info, project_id=project_id)
-
-fcm = initialize_fcm()
-
-def send_push_notification(registration_ids, message_title, message_body):
-    if registration_ids:
-        result = fcm.notify_multiple_devices(
-            registration_ids=registration_ids,
-            message_title=message_title,
-            message_body=message_body
+from .db import read_replica
+from .geo import within_radius
+from .rollups import tile_counts, tile_precision
+from .phone import INVALID_CODE, UNKNOWN_NUMBER, averify_phone, get_otp_limiter, normalize_phone, verify_phone
+from .pagination import (
+    AlertCursorPagination,
+    DisasterFeedbackCursorPagination,
+    IncidentCursorPagination,
+    LocationCursorPagination,
+)
+from .llm import generate_reply, generate_reply_async, response_cache, stream_reply
+from .authentication import token_cache
+from .incidents import assign_incident, broadcast_incident
+from .choices import alert_choices_cache
+from .delivery import acknowledge
+from .first_aid import schedule_first_aid
+from .sms import dispatcher as sms_dispatcher
+from .outbox import alert_stream_message, enqueue as enqueue_notifications, metrics as outbox_metrics
+
+def read_json(request):
+    """The request's JSON body as a dict, or None if it is not valid JSON"""
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+def verification_number(phone_number, otp_code):
+    """
+    The number a verification request is for, as stored, and whether it
+    was normalized; or the response rejecting the request before any query.
+
+    Returns:
+        tuple: The number, whether it was normalized, and None or the rejection.
+    """
+    if not phone_number or not otp_code:
+        return None, False, ({"detail": "Phone number and OTP code are required."}, status.HTTP_400_BAD_REQUEST, {})
+    try:
+        return normalize_phone(phone_number), True, None
+    except ValueError:
+        # numbers that could not be normalized when they were stored (see
+        # migration 0021) are kept as entered, so look those up as entered
+        phone_number = str(phone_number).strip()
+        if not phone_number or len(phone_number) > CustomUser._meta.get_field("phone_number").max_length:
+            return None, False, ({"detail": "Invalid phone number."}, status.HTTP_400_BAD_REQUEST, {})
+        return phone_number, False, None
+
+def verification_response(outcome, normalized, wait):
+    """The response to a verification attempt, or to one refused by the OTP attempt limiter"""
+    if wait:
+        return (
+            {"detail": "Too many verification attempts. Try again later."},
+            status.HTTP_429_TOO_MANY_REQUESTS,
+            {"Retry-After": str(math.ceil(wait))},
         )
-        return result
-    return None
-
-def send_sms_notification(phone_number, message):
-    client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-    client.messages.create(
-        body=message,
-        from_=settings.TWILIO_PHONE_NUMBER,
-        to=phone_number,
-    )
-
-def send_notifications(user, message_title, message_body):
-    fcm_token = user.fcm_token
-    phone_number = user.phone_number
-    
-    if fcm_token:
-        send_push_notification([fcm_token], message_title, message_body)
-    else:
-        if phone_number:
-            send_sms_notification(phone_number, message_body)
-
-def send_sms_code(user):
-    time_otp = pyotp.TOTP(user.otp, interval=300)
-    otp_code = time_otp.now()
-    user_phone_number = user.phone_number
-
-    send_sms_notification(user_phone_number, "Your verification code is " + otp_code)
-
-def verify_phone(user, sms_code):
-    code = int(sms_code)
-    if user.authenticate(code):
-        user.phone_number_verified = True
-        user.save()
-        return True
-    return False
+    if outcome == UNKNOWN_NUMBER and not normalized:
+        return {"detail": "Invalid phone number."}, status.HTTP_400_BAD_REQUEST, {}
+    if outcome == UNKNOWN_NUMBER:
+        return {"detail": "User with this phone number does not exist."}, status.HTTP_404_NOT_FOUND, {}
+    if outcome == INVALID_CODE:
+        return {"detail": "Invalid OTP code."}, status.HTTP_400_BAD_REQUEST, {}
+    return {"message": "Phone number verified successfully."}, status.HTTP_200_OK, {}
+
+def verify_phone_request(phone_number, otp_code):
+    """
+    Verifies a phone number, rejecting it before any query once the number
+    has used up its OTP attempts.
+
+    Returns:
+        tuple: Response body, status code and extra headers.
+    """
+    phone_number, normalized, rejection = verification_number(phone_number, otp_code)
+    if rejection:
+        return rejection
+    wait = get_otp_limiter().hit(phone_number)
+    outcome = None if wait else verify_phone(phone_number, otp_code)
+    return verification_response(outcome, normalized, wait)
+
+async def averify_phone_request(phone_number, otp_code):
+    """verify_phone_request for async views, with the lookup and update awaited"""
+    phone_number, normalized, rejection = verification_number(phone_number, otp_code)
+    if rejection:
+        return rejection
+    # may call Redis, so off the event loop
+    wait = await sync_to_async(get_otp_limiter().hit, thread_sensitive=False)(phone_number)
+    outcome = None if wait else await averify_phone(phone_number, otp_code)
+    return verification_response(outcome, normalized, wait)
 
 class UserRegistration(generics.GenericAPIView):
     serializer_class = UserRegistrationSerializer
@@ -94,18 +136,7 @@ class UserRegistration(generics.GenericAPIView):
         serializer = self.serializer_class(data=data)
 
         if serializer.is_valid():
-            user = serializer.save()
-            send_notifications(user, "Welcome!", "Thanks for registering with our app.")
-            
-            try:
-                send_sms_code(user)
-            except Exception as e:
-                # Log the error message if needed
-                # logger.error(f"Failed to send SMS: {e}")
-                return Response({
-                    "message": "Registration successful, but failed to send SMS. Please verify your account manually."
-                }, status=status.HTTP_201_CREATED)
-                
+            serializer.save()
             return Response({
                 "message": "Registration successful. Please verify your account using the OTP sent to your phone number."
             }, status=status.HTTP_201_CREATED)
@@ -113,35 +144,10 @@ class UserRegistration(generics.GenericAPIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 class VerifyPhoneView(APIView):
     def post(self, request):
-        phone_number = request.data.get('phone_number')
-        otp_code = request.data.get('otp_code')
-
-        print(f"phone_number: {phone_number}, otp_code: {otp_code}")
-
-        if not phone_number or not otp_code:
-            return Response(
-                {"detail": "Phone number and OTP code are required."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        try:
-            user = CustomUser.objects.get(phone_number=phone_number)
-        except CustomUser.DoesNotExist:
-            return Response(
-                {"detail": "User with this phone number does not exist."},
-                status=status.HTTP_404_NOT_FOUND
-            )
-        
-        if verify_phone(user, otp_code):
-            return Response(
-                {"message": "Phone number verified successfully."},
-                status=status.HTTP_200_OK
-            )
-        else:
-            return Response(
-                {"detail": "Invalid OTP code."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        body, status_code, headers = verify_phone_request(
+            request.data.get('phone_number'), request.data.get('otp_code')
+        )
+        return Response(body, status=status_code, headers=headers)
 
 class UserLogin(APIView):
     def post(self, request):
@@ -159,9 +165,22 @@ class UserLogin(APIView):
 
 class ListDisasterFeedback(APIView):
     def get(self, request):
-        disaster_feedback = DisasterFeedback.objects.all()
-        serializer = DisasterFeedbackSerializer(disaster_feedback, many=True)
-        return Response(serializer.data)
+        filters = DisasterFeedbackListFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        params = filters.validated_data
+
+        disaster_feedback = DisasterFeedback.objects.using(read_replica()).select_related(*FEEDBACK_READ_RELATED)
+        if "alert" in params:
+            disaster_feedback = disaster_feedback.filter(alert_id=params["alert"])
+        if "since" in params:
+            disaster_feedback = disaster_feedback.filter(date_time_of_feedback__gt=params["since"])
+        if "until" in params:
+            disaster_feedback = disaster_feedback.filter(date_time_of_feedback__lte=params["until"])
+
+        paginator = DisasterFeedbackCursorPagination()
+        page = paginator.paginate_queryset(disaster_feedback, request, view=self)
+        serializer = DisasterFeedbackReadSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     def post(self, request):
         serializer = DisasterFeedbackSerializer(data=request.data)
@@ -172,9 +191,15 @@ class ListDisasterFeedback(APIView):
 
 class ListLocations(APIView):
     def get(self, request):
-        locations = Location.objects.all()
-        serializer = LocationSerializer(locations, many=True)
-        return Response(serializer.data)
+        # only where alerts were reported: users' last known positions and
+        # the copies incidents keep are Location rows too, and not public
+        locations = Location.objects.using(read_replica()).filter(
+            Exists(Alert.objects.filter(location=OuterRef("pk")))
+        )
+        paginator = LocationCursorPagination()
+        page = paginator.paginate_queryset(locations, request, view=self)
+        serializer = LocationSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     def post(self, request):
         serializer = LocationSerializer(data=request.data)
@@ -183,11 +208,27 @@ class ListLocations(APIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class UserLocationView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        user = request.user
+        serializer = LocationSerializer(user.last_location, data=request.data)
+        if serializer.is_valid():
+            location = serializer.save()
+            if user.last_location_id != location.pk:
+                user.last_location = location
+                user.save(update_fields=["last_location"])
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
 class EmergencyAlertChoicesView(APIView):
     def get(self, request):
-        emergency_choices = AlertChoices.objects.all()
-        serializer = AlertChoicesSerializer(emergency_choices, many=True)
-        return Response(serializer.data)
+        choices, etag = alert_choices_cache.get()
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match and (if_none_match.strip() == "*" or etag in parse_etags(if_none_match)):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        return Response(choices, headers={"ETag": etag})
 
     def post(self, request):
         serializer = AlertChoicesSerializer(data=request.data)
@@ -196,39 +237,163 @@ class EmergencyAlertChoicesView(APIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+def filter_alerts(queryset, params):
+    """Applies validated AlertListFilterSerializer params to an alert queryset"""
+    if "alert_type" in params:
+        queryset = queryset.filter(alert_type_id=params["alert_type"])
+    if "incident" in params:
+        queryset = queryset.filter(incident_id=params["incident"])
+    if "since" in params:
+        queryset = queryset.filter(date_time_of_alert__gt=params["since"])
+    if "until" in params:
+        queryset = queryset.filter(date_time_of_alert__lte=params["until"])
+    return queryset
+
+
+def save_alert(request, data, serializer):
+    """
+    Saves a validated AlertSerializer, at the reporter's location if one
+    was sent, then schedules its first aid, attaches it to an incident
+    and, if asked to, broadcasts it.
+
+    Returns:
+        tuple: The alert and its incident.
+    """
+    user_location_data = data.get("user_location", None)
+    if user_location_data:
+        location_serializer = LocationSerializer(data=user_location_data)
+        if location_serializer.is_valid():
+            serializer.validated_data["location"] = location_serializer.save()
+
+    broadcast_radius = serializer.validated_data.pop("broadcast_radius", settings.BROADCAST_RADIUS_KM)
+    alert_instance = serializer.save()
+    if not alert_instance.first_aid_response:
+        schedule_first_aid(alert_instance, get_language_from_request(request))
+
+    incident, _ = assign_incident(alert_instance)
+    if data.get("broadcast_to_all", False):
+        enqueue_notifications([alert_stream_message(alert_instance, broadcast_radius)])
+        broadcast_incident(incident, alert_instance, broadcast_radius)
+    return alert_instance, incident
+
 class AlertListCreateView(generics.ListCreateAPIView):
     queryset = Alert.objects.all()
     serializer_class = AlertSerializer
+    pagination_class = AlertCursorPagination
+
+    def get_serializer_class(self):
+        if self.request.method == "GET":
+            return AlertReadSerializer
+        return AlertSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method != "GET":
+            return queryset
+
+        filters = AlertListFilterSerializer(data=self.request.query_params)
+        filters.is_valid(raise_exception=True)
+        return filter_alerts(queryset.using(read_replica()).select_related(*ALERT_READ_RELATED), filters.validated_data)
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        if request.data.get("broadcast_to_all", False):
+            # the incident's broadcast, whichever report of it started it
+            response.data["broadcast_job"] = self.incident.broadcast_job_id
+        return response
 
     def perform_create(self, serializer):
-        user_location_data = self.request.data.get("user_location", None)
-
-        if user_location_data:
-            location_serializer = LocationSerializer(data=user_location_data)
-            if location_serializer.is_valid():
-                location_instance = location_serializer.save()
-                serializer.validated_data["location"] = location_instance
-
-        alert_instance = serializer.save()
-        alert_instance.save()
-
-        if self.request.data.get("broadcast_to_all", False):
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                "alerts",
-                {
-                    "type": "alert",
-                    "message": f"New alert: {alert_instance.description}"
-                }
+        alert_instance, self.incident = save_alert(self.request, self.request.data, serializer)
+        return alert_instance
+
+class NearbyAlertsView(APIView):
+    def get(self, request):
+        query = NearbyAlertsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        candidates = Alert.objects.order_by("-date_time_of_alert", "-id")
+        hits = within_radius(
+            candidates, params["latitude"], params["longitude"], params["radius"], limit=params["limit"]
+        )
+        distances = dict(hits)
+        alerts = Alert.objects.filter(pk__in=distances).select_related("location").order_by("-date_time_of_alert", "-id")
+        serializer = NearbyAlertSerializer(alerts, many=True, context={"distances": distances})
+        return Response(serializer.data)
+
+class AlertAcknowledgeView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        cancelled = acknowledge(request.user, pk)
+        return Response({"cancelled_fallbacks": cancelled}, status=status.HTTP_200_OK)
+
+class AlertTilesView(APIView):
+    def get(self, request):
+        query = AlertTileQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        rollups = AlertRollup.objects.using(read_replica())
+        if "alert_type" in params:
+            rollups = rollups.filter(alert_type_id=params["alert_type"])
+        box = params["min_latitude"], params["min_longitude"], params["max_latitude"], params["max_longitude"]
+        precision = tile_precision(*box)
+        cells = tile_counts(rollups, *box, params["since"], params["until"], precision)
+        return Response({"precision": precision, "cells": cells})
+
+class IncidentListView(APIView):
+    def get(self, request):
+        filters = IncidentListFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        params = filters.validated_data
+
+        incidents = Incident.objects.using(read_replica()).select_related(*INCIDENT_READ_RELATED)
+        if "alert_type" in params:
+            incidents = incidents.filter(alert_type_id=params["alert_type"])
+        if "since" in params:
+            incidents = incidents.filter(last_alert_at__gt=params["since"])
+        if params["active"]:
+            incidents = incidents.filter(
+                last_alert_at__gte=timezone.now() - timedelta(seconds=settings.INCIDENT_WINDOW)
             )
 
-            users = CustomUser.objects.all()
-            for user in users:
-                message_title = "New Alert"
-                message_body = alert_instance.description
-                send_sms_notification("+237653603453", message_body)
+        paginator = IncidentCursorPagination()
+        page = paginator.paginate_queryset(incidents, request, view=self)
+        serializer = IncidentSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
-        return alert_instance
+class IncidentDetailView(generics.RetrieveAPIView):
+    queryset = Incident.objects.select_related(*INCIDENT_READ_RELATED)
+    serializer_class = IncidentSerializer
+
+class BroadcastJobDetailView(generics.RetrieveAPIView):
+    queryset = BroadcastJob.objects.all()
+    serializer_class = BroadcastJobSerializer
+
+class SMSMetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(sms_dispatcher.metrics())
+
+class OutboxMetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(outbox_metrics())
+
+class TokenCacheMetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(token_cache.metrics())
+
+class ChatbotCacheMetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(response_cache.metrics())
 
 class ChatbotAPIView(APIView):
     def post(self, request, *args, **kwargs):
@@ -236,13 +401,127 @@ class ChatbotAPIView(APIView):
         if serializer.is_valid():
             user_message = serializer.validated_data['message']
             try:
-                model = genai.GenerativeModel('gemini-1.5-pro')
-                prompt = f"User: {user_message}\nBot:"
-
-                response = model.generate_content(prompt)
-                bot_response = response.text
+                bot_response = generate_reply(user_message)
                 return Response({'response': bot_response}, status=status.HTTP_200_OK)
             except Exception as e:
                 return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+
+@method_decorator(csrf_exempt, name="dispatch")
+class ChatbotStreamView(View):
+    """Relays the chatbot reply as Server-Sent Events while it is generated"""
+
+    async def post(self, request, *args, **kwargs):
+        data = read_json(request)
+        if data is None:
+            return JsonResponse({"detail": "Invalid JSON."}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = ChatMessageSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(
+            self.events(serializer.validated_data["message"]), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    async def events(self, message):
+        try:
+            async for text in stream_reply(message):
+                yield f"data: {json.dumps({'text': text})}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+            return
+        yield "event: done\ndata: {}\n\n"
+
+
+# Async counterparts of the views above, for deployments served over ASGI.
+# Gemini calls are awaited on the event loop instead of holding a worker
+# thread each; serializer validation and writes that go through DRF still
+# run in a thread, and notifications leave through the outbox.
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncChatbotView(View):
+    async def post(self, request, *args, **kwargs):
+        data = read_json(request)
+        if data is None:
+            return JsonResponse({"detail": "Invalid JSON."}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = ChatMessageSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            bot_response = await generate_reply_async(serializer.validated_data["message"])
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return JsonResponse({"response": bot_response}, status=status.HTTP_200_OK)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncUserRegistration(View):
+    async def post(self, request, *args, **kwargs):
+        data = read_json(request)
+        if data is None:
+            return JsonResponse({"detail": "Invalid JSON."}, status=status.HTTP_400_BAD_REQUEST)
+        # validation is then free of queries, and the uniqueness checks are awaited
+        serializer = UserRegistrationSerializer(data=data, context={"defer_unique_checks": True})
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        taken = await serializer.ataken()
+        if taken:
+            return JsonResponse(taken, status=status.HTTP_400_BAD_REQUEST)
+        # the user, token and outbox rows are written in one transaction,
+        # which the async ORM cannot hold
+        await sync_to_async(serializer.save)()
+        return JsonResponse({
+            "message": "Registration successful. Please verify your account using the OTP sent to your phone number."
+        }, status=status.HTTP_201_CREATED)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncVerifyPhoneView(View):
+    async def post(self, request, *args, **kwargs):
+        data = read_json(request)
+        if data is None:
+            return JsonResponse({"detail": "Invalid JSON."}, status=status.HTTP_400_BAD_REQUEST)
+        body, status_code, headers = await averify_phone_request(data.get("phone_number"), data.get("otp_code"))
+        return JsonResponse(body, status=status_code, headers=headers)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncAlertListCreateView(View):
+    async def get(self, request, *args, **kwargs):
+        return await sync_to_async(self.list_page)(request)
+
+    async def post(self, request, *args, **kwargs):
+        data = read_json(request)
+        if data is None:
+            return JsonResponse({"detail": "Invalid JSON."}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = AlertSerializer(data=data)
+        if not await sync_to_async(serializer.is_valid)():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        response_data = await sync_to_async(self.create_alert)(request, data, serializer)
+        return JsonResponse(response_data, status=status.HTTP_201_CREATED)
+
+    def list_page(self, request):
+        # CursorPagination evaluates the queryset synchronously, so the
+        # listing runs in a thread as a whole
+        drf_request = Request(request)
+        filters = AlertListFilterSerializer(data=drf_request.query_params)
+        if not filters.is_valid():
+            return JsonResponse(filters.errors, status=status.HTTP_400_BAD_REQUEST)
+        queryset = filter_alerts(
+            Alert.objects.using(read_replica()).select_related(*ALERT_READ_RELATED), filters.validated_data
+        )
+        paginator = AlertCursorPagination()
+        page = paginator.paginate_queryset(queryset, drf_request, view=self)
+        serializer = AlertReadSerializer(page, many=True)
+        return JsonResponse(paginator.get_paginated_response(serializer.data).data)
+
+    def create_alert(self, request, data, serializer):
+        _, incident = save_alert(request, data, serializer)
+        response_data = serializer.data
+        if data.get("broadcast_to_all", False):
+            response_data["broadcast_job"] = incident.broadcast_job_id
+        return response_data
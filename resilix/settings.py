@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 from dotenv import load_dotenv
+import tempfile
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -55,18 +56,20 @@ AUTH_USER_MODEL = "main.CustomUser"
 
 
 
+REDIS_URL = os.getenv('REDIS_URL')
+
 CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels_redis.core.RedisChannelLayer',
         'CONFIG': {
-            "hosts": [(os.getenv('REDIS_URL'))],
+            "hosts": [REDIS_URL],
         },
     },
 }
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "main.authentication.CachedTokenAuthentication",
     ],
 }
 
@@ -106,12 +109,40 @@ WSGI_APPLICATION = "resilix.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# PostgreSQL when POSTGRES_DB is set, with one read replica alias per host
+# in POSTGRES_REPLICA_HOSTS. Connections are kept open for DB_CONN_MAX_AGE
+# seconds and reused across requests; to pool them across workers, run
+# PgBouncer in front and set POSTGRES_PGBOUNCER=1 (transaction pooling
+# does not allow server-side cursors).
+# Without it the app falls back to a local SQLite file, switched to WAL
+# journaling in main.db so reads don't wait on the writer.
+if os.getenv("POSTGRES_DB"):
+    _postgres = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.getenv("POSTGRES_DB"),
+        "USER": os.getenv("POSTGRES_USER", "postgres"),
+        "PASSWORD": os.getenv("POSTGRES_PASSWORD", ""),
+        "PORT": os.getenv("POSTGRES_PORT", "5432"),
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": True,
+        "DISABLE_SERVER_SIDE_CURSORS": os.getenv("POSTGRES_PGBOUNCER") == "1",
+        "OPTIONS": {"connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", 5))},
+    }
+    DATABASES = {"default": {**_postgres, "HOST": os.getenv("POSTGRES_HOST", "localhost")}}
+    _replica_hosts = [host.strip() for host in os.getenv("POSTGRES_REPLICA_HOSTS", "").split(",") if host.strip()]
+    for _index, _host in enumerate(_replica_hosts):
+        DATABASES[f"replica_{_index}"] = {**_postgres, "HOST": _host, "TEST": {"MIRROR": "default"}}
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "db.sqlite3",
+            # seconds a write waits for the file lock before failing
+            "OPTIONS": {"timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT", 20))},
+        }
     }
-}
+
+DATABASE_ROUTERS = ["main.db.PrimaryReplicaRouter"]
 
 
 # Password validation
@@ -170,3 +201,109 @@ FCM_SERVER_KEY = os.getenv("FCM_SERVER_KEY")
 
 
 FCM_SERVICE_ACCOUNT_URL = 'https://pub-f7a72219e0eb4c759086aa8a4e6bf726.r2.dev/resilix-6611b-firebase-adminsdk-djxzd-7777a6512c.json'
+
+
+# Broadcast fan-out: number of jobs run concurrently per process, recipients
+# loaded per chunk, and parallel sends per job
+BROADCAST_WORKERS = int(os.getenv("BROADCAST_WORKERS", 2))
+BROADCAST_CHUNK_SIZE = int(os.getenv("BROADCAST_CHUNK_SIZE", 500))
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", 32))
+# Seconds a running job is held by its process between chunks; must exceed
+# the time one chunk takes to send, or another process takes the job over
+BROADCAST_LEASE_SECONDS = int(os.getenv("BROADCAST_LEASE_SECONDS", 600))
+# Broadcasts reach users last seen within this many km of the alert
+BROADCAST_RADIUS_KM = float(os.getenv("BROADCAST_RADIUS_KM", 25))
+
+# FCM delivery: tokens per batch, parallel requests, and retry policy for
+# transient failures (backoff in seconds, doubled on each attempt)
+FCM_BATCH_SIZE = int(os.getenv("FCM_BATCH_SIZE", 500))
+FCM_CONCURRENCY = int(os.getenv("FCM_CONCURRENCY", 50))
+FCM_MAX_RETRIES = int(os.getenv("FCM_MAX_RETRIES", 3))
+FCM_RETRY_BACKOFF = float(os.getenv("FCM_RETRY_BACKOFF", 0.5))
+
+# SMS dispatch: parallel sends, and the sustained messages per second (with
+# burst allowance) the Twilio sender number is allowed
+SMS_CONCURRENCY = int(os.getenv("SMS_CONCURRENCY", 8))
+SMS_RATE_LIMIT = float(os.getenv("SMS_RATE_LIMIT", 1))
+SMS_BURST = int(os.getenv("SMS_BURST", 5))
+
+# The FCM service account is downloaded on first push and cached on disk,
+# then refreshed once older than the TTL (seconds)
+FCM_CREDENTIALS_CACHE = os.getenv(
+    "FCM_CREDENTIALS_CACHE",
+    os.path.join(tempfile.gettempdir(), "resilix-fcm-service-account.json"),
+)
+FCM_CREDENTIALS_TTL = int(os.getenv("FCM_CREDENTIALS_TTL", 24 * 60 * 60))
+
+# Recent alert events kept for WebSocket clients resuming after a reconnect
+ALERT_STREAM_BUFFER_SIZE = int(os.getenv("ALERT_STREAM_BUFFER_SIZE", 1000))
+# Geohash length of the WebSocket subscription cells (4 is about 39 x 20 km)
+ALERT_STREAM_CELL_PRECISION = int(os.getenv("ALERT_STREAM_CELL_PRECISION", 4))
+# Alerts whose radius covers more cells than this go to every positioned
+# client instead, each of which checks the distance itself
+ALERT_STREAM_MAX_CELLS = int(os.getenv("ALERT_STREAM_MAX_CELLS", 64))
+
+# Chatbot reply cache: entries kept, seconds each stays valid, and the
+# shingle similarity (0-1) at which a different prompt reuses a reply.
+# The default 0 limits hits to identical prompts after normalization;
+# similar prompts can still ask for different first aid, so only opt in
+# knowingly (see main.llm.guard_words)
+CHATBOT_CACHE_SIZE = int(os.getenv("CHATBOT_CACHE_SIZE", 1000))
+CHATBOT_CACHE_TTL = int(os.getenv("CHATBOT_CACHE_TTL", 6 * 60 * 60))
+CHATBOT_CACHE_SIMILARITY = float(os.getenv("CHATBOT_CACHE_SIMILARITY", 0))
+
+# Background threads generating first-aid guidance for new alert types
+FIRST_AID_WORKERS = int(os.getenv("FIRST_AID_WORKERS", 2))
+
+# Threads delivering notification outbox rows after their transaction commits
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", 4))
+
+# run_outbox worker: rows claimed per batch, parallel sends per channel,
+# seconds a claim is held (renewed as each row is sent), and retry policy
+# (backoff in seconds, doubled on each attempt)
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 100))
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", 16))
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", 120))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 5))
+OUTBOX_RETRY_BACKOFF = float(os.getenv("OUTBOX_RETRY_BACKOFF", 30))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", 1))
+
+# Alert notification routing: seconds a delivered push has to be
+# acknowledged before the SMS fallback goes out (0, the default, sends no
+# fallback for delivered pushes: only clients that call /alerts/<id>/ack/
+# can cancel it), and how long (Redis) or for how many of the latest
+# alerts (in memory) notified users are remembered so nobody is notified
+# of an alert twice
+PUSH_ACK_DEADLINE = int(os.getenv("PUSH_ACK_DEADLINE", 0))
+ALERT_DEDUP_TTL = int(os.getenv("ALERT_DEDUP_TTL", 24 * 60 * 60))
+ALERT_DEDUP_ALERTS = int(os.getenv("ALERT_DEDUP_ALERTS", 256))
+
+# API token lookups cached per process (and in Redis when REDIS_URL is
+# set): entries kept and seconds each stays valid, which bounds how long
+# another process may still accept a deleted token or deactivated user
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 10000))
+AUTH_TOKEN_CACHE_TTL = int(os.getenv("AUTH_TOKEN_CACHE_TTL", 60))
+
+# Region assumed for phone numbers given without a country code, as an
+# ISO 3166 code such as "CM"; unset, numbers must start with +country code
+PHONE_DEFAULT_REGION = os.getenv("PHONE_DEFAULT_REGION") or None
+
+# OTP verification attempts allowed per phone number within a sliding
+# window of this many seconds
+OTP_ATTEMPT_LIMIT = int(os.getenv("OTP_ATTEMPT_LIMIT", 5))
+OTP_ATTEMPT_WINDOW = int(os.getenv("OTP_ATTEMPT_WINDOW", 15 * 60))
+
+# New alerts join an incident of the same type first reported within
+# INCIDENT_RADIUS_KM and last reported within INCIDENT_WINDOW seconds;
+# each incident is broadcast once
+INCIDENT_RADIUS_KM = float(os.getenv("INCIDENT_RADIUS_KM", 2))
+INCIDENT_WINDOW = int(os.getenv("INCIDENT_WINDOW", 3 * 60 * 60))
+
+# Geohash length of the cells alerts are counted in for the heatmap tiles
+# (5 is about 4.9 x 4.9 km)
+ROLLUP_CELL_PRECISION = int(os.getenv("ROLLUP_CELL_PRECISION", 5))
+
+# Longest time range a tile request may cover, and most cells it may
+# return; wider boxes are counted in coarser cells
+ALERT_TILE_MAX_DAYS = int(os.getenv("ALERT_TILE_MAX_DAYS", 31))
+ALERT_TILE_MAX_CELLS = int(os.getenv("ALERT_TILE_MAX_CELLS", 2000))